@@ -0,0 +1,129 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class AnswerCache:
+    """LRU + TTL cache of /ask answers.
+
+    The exact layer is keyed by the normalized question text, the tool
+    filter and the retrieval mode. When `similarity_threshold` is set, a second layer also matches
+    a new question against cached ones by query-embedding cosine similarity,
+    so rephrasings of a popular question hit too. Entries must be dropped
+    with clear() whenever the corpus changes; sync() does so when the
+    corpus version moves on. Safe to share between request handlers and
+    the threads they run searches on.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600.0,
+                 similarity_threshold: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Tuple[str, Tuple[str, ...], str], dict]" = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.similarity_threshold is not None
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        """Lowercase, collapse whitespace and drop trailing punctuation"""
+        return re.sub(r"\s+", " ", question).strip().lower().rstrip("?!. ")
+
+    def _key(self, question: str, tools: Optional[List[str]], mode: str) -> Tuple[str, Tuple[str, ...], str]:
+        return self.normalize(question), tuple(sorted(tools or ())), mode
+
+    def _expired(self, entry: dict) -> bool:
+        return time.monotonic() - entry["created"] > self.ttl
+
+    def get(self, question: str, tools: Optional[List[str]] = None, mode: str = "") -> Optional[dict]:
+        """Exact-match lookup; counts a miss only if the semantic layer is off"""
+        key = self._key(question, tools, mode)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and self._expired(entry):
+                del self._entries[key]
+                entry = None
+            if entry:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry["answer"]
+            if not self.semantic_enabled:
+                self.misses += 1
+            return None
+
+    def get_similar(self, embedding, tools: Optional[List[str]] = None, mode: str = "") -> Optional[dict]:
+        """Near-duplicate lookup by cosine similarity of query embeddings"""
+        if not self.semantic_enabled:
+            return None
+        query = self._unit(embedding)
+        tools_key = tuple(sorted(tools or ()))
+        best_key, best_score = None, self.similarity_threshold
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if self._expired(entry):
+                    del self._entries[key]
+                    continue
+                if key[1:] != (tools_key, mode) or entry["embedding"] is None:
+                    continue
+                score = float(np.dot(query, entry["embedding"]))
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.semantic_hits += 1
+            return self._entries[best_key]["answer"]
+
+    def put(self, question: str, tools: Optional[List[str]], answer: dict, embedding=None, mode: str = ""):
+        key = self._key(question, tools, mode)
+        entry = {
+            "answer": answer,
+            "created": time.monotonic(),
+            "embedding": self._unit(embedding) if embedding is not None else None,
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def sync(self, version) -> bool:
+        """Drop every entry if `version` differs from the last one seen; returns whether it did"""
+        with self._lock:
+            if version == self._version:
+                return False
+            self._version = version
+            self._entries.clear()
+            return True
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "semantic_enabled": self.semantic_enabled,
+            }
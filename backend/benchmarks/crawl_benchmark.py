@@ -0,0 +1,126 @@
+"""Compare the serial crawl loop with UniversalScraper's concurrent crawler.
+
+Starts one local HTTP server per fake tool (each on its own port, so each is
+its own host for rate limiting), serves synthetic doc pages with an
+artificial response latency, and times both crawlers over the same pages.
+
+    cd backend && python benchmarks/crawl_benchmark.py --hosts 5 --pages 8
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrape import UniversalScraper  # noqa: E402
+from tools import ToolConfig, ToolType  # noqa: E402
+
+PAGE_TEMPLATE = """<html><head><title>{title}</title></head><body>
+<nav>Docs navigation</nav>
+<article><h1>{title}</h1>
+<p>{body}</p>
+</article>
+<footer>Footer</footer>
+</body></html>"""
+
+
+def make_handler(latency: float):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            title = f"Fixture page {self.path}"
+            body = " ".join(f"Paragraph text for {self.path} sentence {i}." for i in range(40))
+            payload = PAGE_TEMPLATE.format(title=title, body=body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return FixtureHandler
+
+
+def start_servers(count: int, latency: float):
+    servers = []
+    for _ in range(count):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(latency))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers
+
+
+def fixture_configs(servers, pages: int, delay: float, max_concurrency: int):
+    configs = {}
+    for i, server in enumerate(servers):
+        host, port = server.server_address
+        configs[f"fixture{i}"] = ToolConfig(
+            name=f"Fixture {i}",
+            tool_type=ToolType.JS_FRAMEWORK,
+            base_url=f"http://{host}:{port}",
+            scrape_paths=[f"/docs/page-{n}" for n in range(pages)],
+            selectors={"content": "article", "title": "h1", "exclude": "nav, footer"},
+            delay=delay,
+            max_concurrency=max_concurrency,
+            max_depth=0,  # fixed page set, so both crawlers fetch the same pages
+        )
+    return configs
+
+
+def serial_crawl(scraper: UniversalScraper, configs):
+    """The original crawl loop: one page at a time, sleeping after every page"""
+    chunks = []
+    for tool_name, config in configs.items():
+        for path in config.scrape_paths:
+            chunks.extend(scraper._scrape_page(urljoin(config.base_url, path), config, tool_name))
+            time.sleep(config.delay)
+    return chunks
+
+
+def concurrent_crawl(scraper: UniversalScraper, configs):
+    chunks = []
+    for tool_chunks in scraper.crawl(configs).values():
+        chunks.extend(tool_chunks)
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=5, help="number of fixture hosts (tools)")
+    parser.add_argument("--pages", type=int, default=8, help="pages per host")
+    parser.add_argument("--latency", type=float, default=0.1, help="server response latency in seconds")
+    parser.add_argument("--delay", type=float, default=0.25, help="per-host delay between requests")
+    parser.add_argument("--max-concurrency", type=int, default=2, help="per-host in-flight cap")
+    args = parser.parse_args()
+
+    servers = start_servers(args.hosts, args.latency)
+    configs = fixture_configs(servers, args.pages, args.delay, args.max_concurrency)
+
+    results = {"config": vars(args)}
+    for label, crawl in (("serial", serial_crawl), ("concurrent", concurrent_crawl)):
+        scraper = UniversalScraper()
+        start = time.perf_counter()
+        chunks = crawl(scraper, configs)
+        elapsed = time.perf_counter() - start
+        results[label] = {
+            "seconds": round(elapsed, 3),
+            "pages": args.hosts * args.pages,
+            "chunks": len(chunks),
+            "pages_per_second": round(args.hosts * args.pages / elapsed, 2),
+        }
+
+    results["speedup"] = round(results["serial"]["seconds"] / results["concurrent"]["seconds"], 2)
+    for server in servers:
+        server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Compare embedding providers: memory footprint, index size, ingest speed and query latency.
+
+Each provider spec (see embeddings.py; e.g. `onnx-minilm`,
+`onnx-minilm-int8`, `onnx-minilm@128`,
+`sentence-transformers:BAAI/bge-small-en-v1.5`) runs in its own process so
+memory is measured from a clean start. It embeds the same synthetic corpus
+into a throwaway store and reports:
+
+- rss_mb: resident memory once imports are done, and what loading the model adds
+- model_mb: size of the model file on disk, where known
+- index_mb: size of the store on disk, and the raw float32 vector bytes
+- ingest chunks/s, and p50/p95/p99 of query embedding and of vector search
+- overlap@k: share of each query's top k that the first provider also returns,
+  a quality proxy for quantized or truncated variants of the same model
+
+    cd backend && python benchmarks/embedding_benchmark.py
+    cd backend && python benchmarks/embedding_benchmark.py --providers onnx-minilm onnx-minilm-int8 --chunks 5000
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from embeddings import PROVIDERS  # noqa: E402
+from retrieval_benchmark import percentiles  # noqa: E402
+
+DEFAULT_PROVIDERS = ["onnx-minilm", "onnx-minilm-int8", "onnx-minilm@128"]
+WORDS = ("payment intent checkout session webhook customer invoice subscription refund charge "
+         "component state effect hook render props context router layout deploy function edge "
+         "cache build preview domain utility class variant breakpoint spacing color server client "
+         "token secret environment variable request response stream error retry timeout").split()
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def dir_mb(path: str) -> float:
+    return sum(os.path.getsize(os.path.join(dirpath, name))
+               for dirpath, _, names in os.walk(path) for name in names) / 1024 / 1024
+
+
+def model_mb(provider) -> float:
+    """On-disk size of the ONNX model a provider loads; None for others"""
+    from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+
+    filename = {"onnx-minilm": "model.onnx", "onnx-minilm-int8": "model_int8.onnx"}.get(provider.name)
+    if not filename:
+        return None
+    path = os.path.join(ONNXMiniLM_L6_V2.DOWNLOAD_PATH, ONNXMiniLM_L6_V2.EXTRACTED_FOLDER_NAME, filename)
+    return round(os.path.getsize(path) / 1024 / 1024, 1) if os.path.exists(path) else None
+
+
+def corpus(chunks: int, queries: int, seed: int):
+    rng = random.Random(seed)
+    texts = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))) for _ in range(chunks)]
+    questions = [" ".join(rng.sample(texts[rng.randrange(chunks)].split(), 6)) for _ in range(queries)]
+    return texts, questions
+
+
+def measure(spec: str, args) -> dict:
+    """Runs in a fresh process: load the provider, ingest the corpus and time queries"""
+    from chunking import Chunk
+    from embed_store import EmbedStore
+    from embeddings import provider_from_spec
+
+    texts, questions = corpus(args.chunks, args.queries, args.seed)
+    provider = provider_from_spec(spec)
+    baseline_rss = rss_mb()
+    start = time.perf_counter()
+    dimensions = len(provider(["load the model"])[0])
+    load_seconds = time.perf_counter() - start
+    loaded_rss = rss_mb()
+
+    with tempfile.TemporaryDirectory(prefix="embedding-benchmark-") as persist_dir:
+        store = EmbedStore(persist_dir, embedding_provider=provider)
+        store.query_cache_size = 0
+        start = time.perf_counter()
+        store.add_chunks([Chunk(text=text, tool="bench", tool_name="Bench", title=f"Chunk {i}",
+                                url=f"https://docs.example/{i}") for i, text in enumerate(texts)],
+                         workers=args.workers)
+        ingest_seconds = time.perf_counter() - start
+
+        embed_latencies, search_latencies, top_ids = [], [], []
+        for question in questions:
+            start = time.perf_counter()
+            embedding = provider([question])
+            embed_latencies.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            results = store.search_many_with_metadata([question], args.k, None, "vector", embedding)[0]
+            search_latencies.append(time.perf_counter() - start)
+            top_ids.append([result["id"] for result in results])
+        del store
+        index_mb = dir_mb(persist_dir)
+
+    return {
+        "dimensions": dimensions,
+        "rss_mb": {"baseline": round(baseline_rss, 1), "model": round(loaded_rss - baseline_rss, 1),
+                   "after_ingest": round(rss_mb(), 1)},
+        "model_load_s": round(load_seconds, 3),
+        "model_mb": model_mb(provider),
+        "index_mb": round(index_mb, 2),
+        "vectors_mb": round(args.chunks * dimensions * 4 / 1024 / 1024, 2),
+        "ingest_chunks_per_s": round(args.chunks / ingest_seconds, 1),
+        "query_embedding": percentiles(embed_latencies),
+        "vector_search": percentiles(search_latencies),
+        "top_ids": top_ids,
+    }
+
+
+def overlap(ids, baseline) -> float:
+    shared = [len(set(mine) & set(theirs)) / max(1, len(theirs)) for mine, theirs in zip(ids, baseline)]
+    return round(sum(shared) / len(shared), 3) if shared else 0.0
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=BACKEND, check=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--providers", nargs="+", default=DEFAULT_PROVIDERS,
+                        help="provider specs; the first is the baseline for overlap@k")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=1, help="embedding processes during ingest")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="also write the JSON report here")
+    parser.add_argument("--measure", help=argparse.SUPPRESS)  # internal: run one provider in this process
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args)))
+        return
+
+    report = {"commit": git_commit(), "chunks": args.chunks, "queries": args.queries, "k": args.k,
+              "providers": {}}
+    baseline = None
+    for spec in args.providers:
+        provider = PROVIDERS.get(spec.partition("@")[0].partition(":")[0])
+        if provider is not None and not provider.available():
+            report["providers"][spec] = {"skipped": "not installed"}
+            continue
+        command = [sys.executable, os.path.abspath(__file__), "--measure", spec, "--chunks", str(args.chunks),
+                   "--queries", str(args.queries), "-k", str(args.k), "--workers", str(args.workers),
+                   "--seed", str(args.seed)]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            report["providers"][spec] = {"error": result.stderr.strip().splitlines()[-1]}
+            continue
+        measured = json.loads(result.stdout.strip().splitlines()[-1])
+        top_ids = measured.pop("top_ids")
+        baseline = baseline or top_ids
+        measured[f"overlap@{args.k}"] = overlap(top_ids, baseline)
+        report["providers"][spec] = measured
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
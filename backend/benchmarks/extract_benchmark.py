@@ -0,0 +1,168 @@
+"""Compare HTML extraction backends over saved documentation pages.
+
+Pages are read from a fixtures directory of `<tool>--<name>.html` files, so
+each is extracted with its tool's selectors. `--fetch` saves the enabled
+tools' scrape_paths there first; with an empty directory and no network,
+`--synthetic N` writes generated reference-style pages instead. Reports
+pages per second for every installed backend plus the original
+BeautifulSoup code path, and how much text each one extracts.
+
+    cd backend && python benchmarks/extract_benchmark.py --fetch
+    cd backend && python benchmarks/extract_benchmark.py --synthetic 12
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import time
+from urllib.parse import urljoin
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+from chunking import HEADING_MARKER, chunk_page, count_tokens  # noqa: E402
+from extract import FALLBACK_CONTENT, HEADING_TAGS, available_extractors, get_extractor  # noqa: E402
+from scrape import UniversalScraper  # noqa: E402
+from tools import TOOLS, get_enabled_tools  # noqa: E402
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+DEFAULT_SELECTORS = {"content": "article, main", "title": "h1", "exclude": "nav, footer"}
+
+WORDS = ("request object parameter returns customer payment intent component state render "
+         "hook effect deploy function route cache config token webhook event list update "
+         "create delete retrieve string integer boolean optional required default value").split()
+
+
+def legacy_extract(html: bytes, selectors: dict):
+    """The scraper's extraction before pluggable backends, for comparison"""
+    soup = BeautifulSoup(html, 'html.parser')
+    if 'exclude' in selectors:
+        for element in soup.select(selectors['exclude']):
+            element.decompose()
+    content_elements = soup.select(selectors['content']) or soup.select(FALLBACK_CONTENT)
+    blocks = []
+    for element in content_elements:
+        title_elem = element.select_one(selectors.get('title', 'h1, h2, h3'))
+        title = title_elem.get_text().strip() if title_elem else ""
+        for heading in element.find_all(HEADING_TAGS):
+            heading.replace_with(f"\n{HEADING_MARKER}{heading.get_text(' ', strip=True)}\n")
+        blocks.append((title, element.get_text().strip()))
+    return blocks
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def synthetic_page(rng: random.Random, title: str, sections: int) -> str:
+    """A large API-reference-style page: long sidebar, nested content wrappers, code and tables"""
+    nav = "".join(f'<li><a href="/docs/ref/item-{i}">Item {i}</a></li>' for i in range(300))
+    body = []
+    for s in range(sections):
+        body.append(f"<h2 id='s{s}'>Section {s} {rng.choice(WORDS)}</h2>")
+        for _ in range(3):
+            body.append(f"<p>{' '.join(sentence(rng, rng.randint(8, 20)) for _ in range(4))}</p>")
+        body.append("<h3>Parameters</h3><table>" + "".join(
+            f"<tr><td><code>{rng.choice(WORDS)}_{i}</code></td><td>{sentence(rng, 10)}</td></tr>"
+            for i in range(6)) + "</table>")
+        body.append(f"<pre><code>{'; '.join(rng.choice(WORDS) + '()' for _ in range(12))}</code></pre>")
+    return f"""<!DOCTYPE html><html><head><title>{title}</title>
+<script>window.__DATA__ = {json.dumps({'words': WORDS * 20})};</script>
+<style>.sidebar {{ width: 240px; }}</style></head>
+<body><nav class="sidebar navigation"><ul>{nav}</ul></nav>
+<div class="docs-content"><main><article><h1>{title}</h1>{''.join(body)}</article></main></div>
+<footer class="footer">Footer links</footer></body></html>"""
+
+
+def write_synthetic(fixtures: str, count: int, seed: int = 0):
+    rng = random.Random(seed)
+    os.makedirs(fixtures, exist_ok=True)
+    for i in range(count):
+        path = os.path.join(fixtures, f"stripe--synthetic-{i}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(synthetic_page(rng, f"Synthetic reference {i}", sections=rng.randint(20, 60)))
+
+
+def fetch_fixtures(fixtures: str):
+    os.makedirs(fixtures, exist_ok=True)
+    scraper = UniversalScraper()
+    for tool_name, config in get_enabled_tools().items():
+        for path in config.scrape_paths:
+            url = urljoin(config.base_url, path)
+            try:
+                response = scraper.session.get(url, timeout=10)
+                response.raise_for_status()
+            except Exception as e:
+                print(f"Skipping {url}: {e}", file=sys.stderr)
+                continue
+            name = path.strip("/").replace("/", "_") or "index"
+            with open(os.path.join(fixtures, f"{tool_name}--{name}.html"), "wb") as f:
+                f.write(response.content)
+
+
+def load_fixtures(fixtures: str):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(fixtures, "*.html"))):
+        tool = os.path.basename(path).split("--")[0]
+        selectors = TOOLS[tool].selectors if tool in TOOLS else DEFAULT_SELECTORS
+        with open(path, "rb") as f:
+            pages.append((os.path.basename(path), f.read(), selectors))
+    return pages
+
+
+def measure(extract, pages, repeat: int) -> dict:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, html, selectors in pages:
+            extract(html, selectors)
+    elapsed = time.perf_counter() - start
+
+    tokens = chunks = 0
+    for _, html, selectors in pages:
+        for _, text in extract(html, selectors):
+            tokens += count_tokens(text.replace(HEADING_MARKER, " "))
+            chunks += len(chunk_page(text, 200, 40)) if len(text) > 100 else 0
+    total_bytes = sum(len(html) for _, html, _ in pages) * repeat
+    return {
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(len(pages) * repeat / elapsed, 1),
+        "mb_per_second": round(total_bytes / elapsed / 1e6, 2),
+        "tokens_extracted": tokens,
+        "chunks": chunks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="directory of saved .html pages")
+    parser.add_argument("--fetch", action="store_true", help="save the enabled tools' pages into --fixtures first")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="write this many generated pages into --fixtures first")
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the fixtures per backend")
+    args = parser.parse_args()
+
+    if args.fetch:
+        fetch_fixtures(args.fixtures)
+    if args.synthetic:
+        write_synthetic(args.fixtures, args.synthetic)
+    pages = load_fixtures(args.fixtures)
+    if not pages:
+        parser.error(f"no .html fixtures in {args.fixtures}; use --fetch or --synthetic N")
+
+    results = {"pages": len(pages), "megabytes": round(sum(len(p[1]) for p in pages) / 1e6, 2), "backends": {}}
+    results["backends"]["bs4-legacy"] = measure(legacy_extract, pages, args.repeat)
+    for name in available_extractors():
+        extractor = get_extractor(name)
+        results["backends"][name] = measure(lambda html, selectors: extractor.extract(html, selectors).blocks,
+                                            pages, args.repeat)
+
+    baseline = results["backends"]["bs4-legacy"]["pages_per_second"]
+    for backend in results["backends"].values():
+        backend["speedup"] = round(backend["pages_per_second"] / baseline, 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
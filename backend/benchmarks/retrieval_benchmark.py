@@ -0,0 +1,362 @@
+"""Measure retrieval quality and latency over a fixed offline corpus.
+
+Pages come from a fixtures directory of saved `<tool>--<name>.html` files
+(see extract_benchmark.py; `--fetch` saves the enabled tools' pages there).
+They are served from a local HTTP server and ingested with the real scraper
+and pipeline into a throwaway store, then every labeled question is run
+against it. Labels name the fixture pages that answer a question; a search
+result counts as relevant when it comes from one of them.
+
+Reports recall@k and MRR per search mode, p50/p95/p99 latency of
+search_with_metadata and of POST /ask (DeepSeek replaced by a local stub,
+answer cache cleared before every request), as JSON for comparing commits.
+`--synthetic N` generates pages and questions in a temporary directory,
+so they never mix with fetched fixtures and the corpus needs no network.
+The embedding model still does: the default provider downloads its model
+on first use, so run once online (or pick a provider whose model is
+already cached with `--embedding-provider`) before going offline. Fetched pages
+change with the live docs, so the report records a SHA-256 of every page and
+of the question file: compare two reports only when those match.
+
+    cd backend && python benchmarks/retrieval_benchmark.py --fetch
+    cd backend && python benchmarks/retrieval_benchmark.py --synthetic 60 --output before.json
+"""
+import argparse
+import asyncio
+import contextlib
+import dataclasses
+import hashlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Per-request log lines would be interleaved with the JSON report
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from embed_store import SEARCH_MODES, EmbedStore  # noqa: E402
+from embeddings import get_provider, provider_from_spec  # noqa: E402
+from extract_benchmark import DEFAULT_FIXTURES, DEFAULT_SELECTORS, WORDS, fetch_fixtures  # noqa: E402
+from pipeline import run_ingest  # noqa: E402
+from scrape import UniversalScraper  # noqa: E402
+from tools import TOOLS, ToolConfig, ToolType  # noqa: E402
+
+DEFAULT_QUESTIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "retrieval_questions.json")
+SYLLABLES = "ka lo mi ne ru sa ti vo ze qua bri den fal gor hin jul".split()
+
+
+def percentiles(samples) -> dict:
+    """p50/p95/p99 and mean of latency samples, in milliseconds"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+    return {
+        "p50_ms": round(rank(50) * 1000, 2),
+        "p95_ms": round(rank(95) * 1000, 2),
+        "p99_ms": round(rank(99) * 1000, 2),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+    }
+
+
+def write_synthetic(fixtures: str, count: int, seed: int = 0) -> str:
+    """Generated pages, each about one made-up topic, plus a question file labeling them"""
+    rng = random.Random(seed)
+    os.makedirs(fixtures, exist_ok=True)
+    tools = ["stripe", "tailwind", "react"]
+    questions = []
+    for i in range(count):
+        tool = tools[i % len(tools)]
+        name = f"synthetic-{i}"
+        terms = ["".join(rng.choice(SYLLABLES) for _ in range(3)) for _ in range(4)]
+        identifier = f"{terms[0]}_{terms[1]}"
+        sections = []
+        for s in range(rng.randint(3, 8)):
+            filler = " ".join(rng.choice(WORDS) for _ in range(rng.randint(60, 120)))
+            topical = " ".join(rng.choice(terms[2:]) for _ in range(6))
+            sections.append(f"<h2>Section {s}</h2><p>{filler} {topical}.</p>"
+                            f"<pre><code>client.{identifier}(value)</code></pre>")
+        html = (f"<html><body><nav>Docs navigation</nav><main><article><h1>{' '.join(terms[2:]).title()}</h1>"
+                f"{''.join(sections)}</article></main><footer>Footer</footer></body></html>")
+        with open(os.path.join(fixtures, f"{tool}--{name}.html"), "w", encoding="utf-8") as f:
+            f.write(html)
+        page = f"{tool}--{name}"
+        questions.append({"question": f"How do I call {identifier}?", "pages": [page]})
+        questions.append({"question": f"What are {terms[2]} and {terms[3]} used for?", "pages": [page]})
+
+    path = os.path.join(fixtures, "questions.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(questions, f, indent=1)
+    return path
+
+
+def load_corpus(fixtures: str) -> dict:
+    """Fixture pages by page ID (`<tool>--<name>`), as raw bytes"""
+    pages = {}
+    for filename in sorted(os.listdir(fixtures)):
+        if filename.endswith(".html") and "--" in filename:
+            with open(os.path.join(fixtures, filename), "rb") as f:
+                pages[filename[:-len(".html")]] = f.read()
+    return pages
+
+
+def digests(pages: dict, questions_path: str) -> dict:
+    """SHA-256 of every fixture page and of the question file, pinning what a report measured"""
+    with open(questions_path, "rb") as f:
+        questions = hashlib.sha256(f.read()).hexdigest()
+    page_hashes = {pid: hashlib.sha256(payload).hexdigest() for pid, payload in sorted(pages.items())}
+    corpus = hashlib.sha256(json.dumps(page_hashes, sort_keys=True).encode("utf-8")).hexdigest()
+    return {"corpus_sha256": corpus, "questions_sha256": questions, "page_sha256": page_hashes}
+
+
+def serve(pages: dict) -> ThreadingHTTPServer:
+    """Serve each page at /<tool>/<name> on a local port"""
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            payload = pages.get(page_id(self.path))
+            if payload is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def page_id(url: str) -> str:
+    """Fixture page ID of a served URL or path: /react/learn -> react--learn"""
+    return unquote(urlsplit(url).path).strip("/").replace("/", "--", 1)
+
+
+def fixture_configs(server: ThreadingHTTPServer, pages: dict) -> dict:
+    """One crawl config per tool in the corpus, fetching exactly its fixture pages"""
+    host, port = server.server_address
+    paths = {}
+    for pid in pages:
+        tool, name = pid.split("--", 1)
+        paths.setdefault(tool, []).append(f"/{tool}/{name}")
+
+    configs = {}
+    for tool, scrape_paths in paths.items():
+        base = TOOLS.get(tool) or ToolConfig(name=tool, tool_type=ToolType.JS_FRAMEWORK, base_url="",
+                                             scrape_paths=[], selectors=DEFAULT_SELECTORS)
+        configs[tool] = dataclasses.replace(base, base_url=f"http://{host}:{port}", scrape_paths=scrape_paths,
+                                            delay=0.0, max_depth=0, use_sitemap=False)
+    return configs
+
+
+def evaluate_search(store: EmbedStore, questions, mode: str, ks, repeat: int) -> dict:
+    """recall@k, MRR and latency of one search mode over the labeled questions"""
+    depth = max(ks)
+    recall = {k: 0.0 for k in ks}
+    reciprocal_ranks = 0.0
+    latencies = []
+    for item in questions:
+        relevant = set(item["pages"])
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results = store.search_with_metadata(item["question"], depth, item.get("tools"), mode)
+            latencies.append(time.perf_counter() - start)
+
+        ranked = [page_id((result.get("metadata") or {}).get("url", "")) for result in results]
+        first = next((rank for rank, pid in enumerate(ranked, 1) if pid in relevant), None)
+        reciprocal_ranks += 1 / first if first else 0.0
+        for k in ks:
+            recall[k] += len(relevant & set(ranked[:k])) / len(relevant)
+
+    n = len(questions)
+    return {
+        **{f"recall@{k}": round(recall[k] / n, 4) for k in ks},
+        "mrr": round(reciprocal_ranks / n, 4),
+        "latency": percentiles(latencies),
+    }
+
+
+class StubCompletions:
+    """Stands in for DeepSeek's chat.completions: a fixed answer after an optional delay"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.prompts = []
+
+    async def create(self, model, messages, stream=False, **kwargs):
+        self.prompts.append(messages)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        message = types.SimpleNamespace(content="Stub answer.")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+
+
+async def measure_ask(app, answer_cache, questions, mode: str, repeat: int) -> list:
+    import httpx
+
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as http:
+        for item in questions:
+            body = {"question": item["question"], "mode": mode}
+            if item.get("tools"):
+                body["tools"] = item["tools"]
+            for _ in range(repeat):
+                answer_cache.clear()
+                start = time.perf_counter()
+                response = await http.post("/ask", json=body)
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+    return latencies
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="directory of saved .html pages")
+    parser.add_argument("--questions", help="labeled question JSON (default: the bundled set, "
+                                            "or the generated one with --synthetic)")
+    parser.add_argument("--fetch", action="store_true", help="save the enabled tools' pages into --fixtures first")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="benchmark this many generated pages and their questions instead of --fixtures")
+    parser.add_argument("--k", default="1,3,5,10", help="comma-separated cutoffs for recall@k")
+    parser.add_argument("--modes", default=",".join(SEARCH_MODES), help="search modes to evaluate")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per question")
+    parser.add_argument("--llm-latency", type=float, default=0.0,
+                        help="seconds the stub LLM waits before answering")
+    parser.add_argument("--query-cache", action="store_true",
+                        help="keep the query embedding cache on (repeat runs then skip the model)")
+    parser.add_argument("--embedding-provider", metavar="SPEC",
+                        help="provider spec such as onnx-minilm-int8 or onnx-minilm@128 "
+                             "(default: EMBEDDING_PROVIDER / EMBEDDING_MODEL)")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    modes = [mode for mode in args.modes.split(",") if mode]
+    unknown = [mode for mode in modes if mode not in SEARCH_MODES]
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(unknown)}")
+
+    if args.synthetic and args.fetch:
+        parser.error("--synthetic and --fetch build different corpora; pick one")
+
+    with contextlib.ExitStack() as cleanup:
+        fixtures = args.fixtures
+        questions_path = args.questions
+        if args.synthetic:
+            # Generated pages get their own directory, never the fetched fixtures
+            fixtures = cleanup.enter_context(tempfile.TemporaryDirectory(prefix="retrieval-synthetic-"))
+            questions_path = questions_path or write_synthetic(fixtures, args.synthetic)
+        elif args.fetch:
+            fetch_fixtures(fixtures)
+        pages = load_corpus(fixtures) if os.path.isdir(fixtures) else {}
+        run(parser, args, pages, questions_path or DEFAULT_QUESTIONS)
+
+
+def run(parser: argparse.ArgumentParser, args, pages: dict, questions_path: str):
+    """Ingest the corpus, evaluate every question and print the report"""
+    if not pages:
+        parser.error(f"no <tool>--<name>.html fixtures in {args.fixtures}; use --fetch or --synthetic N")
+    generated = [pid for pid in pages if pid.split("--", 1)[1].startswith("synthetic-")]
+    if generated and len(generated) < len(pages):
+        parser.error(f"{args.fixtures} mixes generated synthetic-* pages with fetched ones; "
+                     "remove them, or use --synthetic N for a generated corpus")
+
+    ks = sorted({int(k) for k in args.k.split(",")})
+    modes = [mode for mode in args.modes.split(",") if mode]
+    with open(questions_path, encoding="utf-8") as f:
+        labeled = json.load(f)
+    # Questions about pages that are not in this corpus can't be answered from it
+    questions = [item for item in labeled if any(pid in pages for pid in item["pages"])]
+    if not questions:
+        parser.error("none of the labeled questions refer to a page in the corpus")
+
+    try:
+        provider = provider_from_spec(args.embedding_provider) if args.embedding_provider else get_provider()
+    except ValueError as e:
+        parser.error(str(e))
+
+    log = io.StringIO()  # the app's progress prints would swamp the report
+    with tempfile.TemporaryDirectory(prefix="retrieval-benchmark-") as store_dir, contextlib.redirect_stdout(log):
+        store = EmbedStore(persist_dir=store_dir, embedding_provider=provider)
+        server = serve(pages)
+        try:
+            scraper = UniversalScraper(manifest=store.page_manifest())
+            start = time.perf_counter()
+            ingest = run_ingest(store, scraper, fixture_configs(server, pages), scraper.manifest)
+            ingest_seconds = time.perf_counter() - start
+        finally:
+            server.shutdown()
+        if not ingest["ok"]:
+            # Metrics over a partial corpus would look like a regression (or hide one)
+            print(log.getvalue(), file=sys.stderr)
+            print(f"Ingestion failed: {json.dumps(ingest, default=str)}", file=sys.stderr)
+            sys.exit(1)
+        if not args.query_cache:
+            store.query_cache_size = 0
+        store.search_with_metadata("warm up the embedding model", 1)
+
+        report = {
+            "commit": git_commit(),
+            "corpus": {
+                "pages": len(pages),
+                "embedding_provider": provider.spec,
+                "chunks": store.collection.count(),
+                "questions": len(questions),
+                "skipped_questions": len(labeled) - len(questions),
+                "ingest_seconds": round(ingest_seconds, 2),
+                "ingest_ok": ingest["ok"],
+                **digests(pages, questions_path),
+            },
+            "search": {mode: evaluate_search(store, questions, mode, ks, args.repeat) for mode in modes},
+        }
+
+        # Import the app only now, so it serves from the benchmark store instead of ./chroma_store
+        os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+        EmbedStore._instance = store
+        import main as app_module
+
+        completions = StubCompletions(args.llm_latency)
+        app_module.client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+        mode = app_module.DEFAULT_SEARCH_MODE
+        latencies = asyncio.run(measure_ask(app_module.app, app_module.answer_cache, questions, mode, args.repeat))
+        prompt_tokens = [app_module.count_message_tokens(messages) for messages in completions.prompts]
+        report["ask"] = {
+            "mode": mode,
+            "llm_latency_ms": round(args.llm_latency * 1000, 2),
+            "mean_prompt_tokens": round(sum(prompt_tokens) / len(prompt_tokens), 1) if prompt_tokens else 0,
+            "latency": percentiles(latencies),
+        }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
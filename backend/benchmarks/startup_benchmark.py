@@ -0,0 +1,184 @@
+"""Measure cold-start time of the API under each WARMUP mode.
+
+Every run starts a fresh `uvicorn main:app` in an empty temporary working
+directory (so it opens a new, empty chroma_store) and polls it:
+
+- listen: spawn until `GET /` answers
+- status: latency of the first `GET /status`, taken while starting up
+- first_ask: latency of a `POST /ask` sent as soon as the server listens,
+  i.e. what the first user of a scaled-from-zero instance waits for
+- time_to_first_answer: spawn until that answer arrives
+- ready: spawn until `/status` reports `"ready": true`
+- warm_ask: latency of a second, different question
+
+The store is empty, so /ask returns the no-context answer without calling
+DeepSeek; the numbers cover imports, opening Chroma and loading the
+embedding model, not index size. Also reports the time to `import main` and
+whether that import pulled in chromadb or openai. Results are medians over
+`--runs`, as JSON for comparing commits.
+
+    cd backend && python benchmarks/startup_benchmark.py
+    cd backend && python benchmarks/startup_benchmark.py --modes off background --runs 5 --output after.json
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ("off", "background", "blocking")
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+print(json.dumps({"seconds": time.perf_counter() - start,
+                  "modules": {name: name in sys.modules for name in ("chromadb", "onnxruntime", "openai")}}))
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_env(mode: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "WARMUP": mode,
+        "LOG_LEVEL": "WARNING",
+        "PYTHONPATH": os.pathsep.join(filter(None, [BACKEND, env.get("PYTHONPATH")])),
+    })
+    env.setdefault("DEEPSEEK_API_KEY", "benchmark")
+    return env
+
+
+def measure_import(workdir: str) -> dict:
+    result = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=workdir, env=server_env("off"),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def wait_until(check, timeout: float, interval: float = 0.01):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if check():
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(interval)
+    raise TimeoutError("server did not come up in time")
+
+
+def measure_run(mode: str, timeout: float) -> dict:
+    """Start one server in `mode` and time its startup milestones"""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory(prefix="startup-benchmark-") as workdir:
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=workdir, env=server_env(mode), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+        try:
+            with httpx.Client(base_url=base, timeout=timeout) as http:
+                wait_until(lambda: http.get("/").status_code == 200, timeout)
+                listen = time.perf_counter() - start
+
+                request_start = time.perf_counter()
+                status = http.get("/status").json()
+                status_seconds = time.perf_counter() - request_start
+
+                request_start = time.perf_counter()
+                http.post("/ask", json={"question": "How do I get started?"}).raise_for_status()
+                first_ask = time.perf_counter() - request_start
+                first_answer = time.perf_counter() - start
+
+                wait_until(lambda: http.get("/status").json()["ready"], timeout)
+                ready = time.perf_counter() - start
+
+                request_start = time.perf_counter()
+                http.post("/ask", json={"question": "Which options does the client accept?"}).raise_for_status()
+                warm_ask = time.perf_counter() - request_start
+                warmup = http.get("/status").json()["warmup"]
+        except Exception:
+            server.kill()
+            sys.stderr.write(server.stderr.read().decode(errors="replace")[-2000:])
+            raise
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    return {
+        "listen_s": listen,
+        "status_ms": status_seconds * 1000,
+        "status_ready_at_listen": status["ready"],
+        "first_ask_ms": first_ask * 1000,
+        "time_to_first_answer_s": first_answer,
+        "ready_s": ready,
+        "warm_ask_ms": warm_ask * 1000,
+        "warmup_steps_s": warmup["steps_seconds"],
+    }
+
+
+def summarize(runs: list) -> dict:
+    """Median of every numeric field over the runs"""
+    summary = {}
+    for key, value in runs[0].items():
+        if isinstance(value, bool):
+            summary[key] = all(run[key] for run in runs)
+        elif isinstance(value, dict):
+            summary[key] = {step: round(statistics.median(run[key].get(step, 0.0) for run in runs), 3)
+                            for step in value}
+        else:
+            summary[key] = round(statistics.median(run[key] for run in runs), 3)
+    return summary
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=BACKEND, check=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--runs", type=int, default=3, help="server starts per mode")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds to wait for each milestone")
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="startup-benchmark-") as workdir:
+        imports = [measure_import(workdir) for _ in range(args.runs)]
+    report = {
+        "commit": git_commit(),
+        "runs": args.runs,
+        "import_main": {
+            "seconds": round(statistics.median(probe["seconds"] for probe in imports), 3),
+            "imports": imports[0]["modules"],
+        },
+        "modes": {mode: summarize([measure_run(mode, args.timeout) for _ in range(args.runs)])
+                  for mode in args.modes},
+    }
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
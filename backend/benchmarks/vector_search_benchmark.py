@@ -0,0 +1,150 @@
+"""Compare vector search backends: Chroma's HNSW index vs the NumPy index in float32 and float16.
+
+Fills a throwaway store with `--chunks` synthetic unit vectors (clustered, in
+`--tools` tools) written straight to Chroma, so no embedding model is
+loaded and only the search itself is timed. Queries are noisy copies of
+stored vectors. For each backend it reports:
+
+- build_s: time to load the NumPy index from Chroma (what every ingest adds)
+- index_mb: size of the NumPy index files on disk
+- single / filtered: p50/p95/p99 of one-query searches, without and with a tool filter
+- batch: per-query time when `--batch` queries go in one call
+- recall@k: share of the exact top k (brute force) each backend returns
+
+    cd backend && python benchmarks/vector_search_benchmark.py
+    cd backend && python benchmarks/vector_search_benchmark.py --chunks 20000 --batch 64 --output search.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from retrieval_benchmark import percentiles  # noqa: E402
+
+BACKENDS = {"chroma": ("chroma", "float32"), "numpy-float32": ("numpy", "float32"),
+            "numpy-float16": ("numpy", "float16")}
+
+
+def unit(vectors: np.ndarray) -> np.ndarray:
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def corpus(chunks: int, dimensions: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimensions))
+    return unit(centers[rng.integers(clusters, size=chunks)] + rng.normal(scale=0.6, size=(chunks, dimensions)))
+
+
+def fill(persist_dir: str, vectors: np.ndarray, tools: int):
+    from embed_store import EmbedStore
+
+    os.environ["SEARCH_BACKEND"] = "chroma"
+    store = EmbedStore(persist_dir)
+    for start in range(0, len(vectors), 500):
+        rows = range(start, min(start + 500, len(vectors)))
+        store.collection.upsert(
+            ids=[f"chunk-{i}" for i in rows],
+            documents=[f"Synthetic chunk {i}" for i in rows],
+            metadatas=[{"tool": f"tool{i % tools}", "title": f"Chunk {i}", "url": f"https://docs.example/{i}"}
+                       for i in rows],
+            embeddings=vectors[start:start + len(rows)].tolist(),
+        )
+
+
+def timed(search, queries, repeat: int) -> list:
+    latencies = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            search([query])
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def recall(results, exact) -> float:
+    hits = [len({result["id"] for result in found} & set(truth)) / len(truth) for found, truth in zip(results, exact)]
+    return round(sum(hits) / len(hits), 4)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=BACKEND, check=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--tools", type=int, default=6)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=32, help="queries per call in the batched run")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per query")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    from embed_store import EmbedStore
+
+    vectors = corpus(args.chunks, args.dimensions, max(1, args.chunks // 100), args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = unit(vectors[rng.integers(args.chunks, size=args.queries)]
+                   + rng.normal(scale=0.05, size=(args.queries, args.dimensions)))
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.k]
+    exact = [[f"chunk-{i}" for i in row] for row in exact]
+
+    report = {"commit": git_commit(), "chunks": args.chunks, "dimensions": args.dimensions, "k": args.k,
+              "batch": args.batch, "backends": {}}
+    with tempfile.TemporaryDirectory(prefix="vector-search-benchmark-") as persist_dir:
+        fill(persist_dir, vectors, args.tools)
+        for name in args.backends:
+            backend, dtype = BACKENDS[name]
+            os.environ["SEARCH_BACKEND"], os.environ["DENSE_INDEX_DTYPE"] = backend, dtype
+            store = EmbedStore(persist_dir)
+            result = {}
+            if store.dense is not None:
+                start = time.perf_counter()
+                store.rebuild_dense_index()
+                result["build_s"] = round(time.perf_counter() - start, 3)
+                result["index_mb"] = round(sum(
+                    os.path.getsize(os.path.join(dirpath, filename))
+                    for dirpath, _, filenames in os.walk(store.dense.path) for filename in filenames
+                ) / 1024 / 1024, 2)
+
+            def search(batch, tools=None):
+                return store.search_many_with_metadata(["query"] * len(batch), args.k, tools, "vector", list(batch))
+
+            search(queries[:1])  # warm the index pages
+            result["single"] = percentiles(timed(search, queries, args.repeat))
+            result["filtered"] = percentiles(timed(lambda batch: search(batch, ["tool0"]), queries, args.repeat))
+            batches = [queries[i:i + args.batch] for i in range(0, len(queries), args.batch)]
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for batch in batches:
+                    search(batch)
+            result["batch_per_query_ms"] = round((time.perf_counter() - start) * 1000 / (args.repeat * len(queries)), 3)
+            result[f"recall@{args.k}"] = recall(search(queries), exact)
+            report["backends"][name] = result
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Measure /ask throughput with several uvicorn workers sharing a Chroma server.
+
+Launches `chroma run` on a temporary directory and fills it with synthetic
+chunks through EmbedStore (CHROMA_SERVER_URL mode). For each `--workers`
+count it then starts `uvicorn main:app --workers N` against that server and
+sends `--requests` distinct questions, `--concurrency` at a time. DeepSeek is
+replaced by a local OpenAI-compatible stub (DEEPSEEK_BASE_URL) that answers
+after `--llm-latency` seconds. Unless `--no-embedded`, the same corpus is also
+served by one worker in the default embedded mode, as the baseline.
+
+Every answer must cite sources, so a worker that cannot reach the server
+shows up as errors. Reports throughput, latency percentiles and how many
+distinct worker processes answered /status, as JSON.
+
+    cd backend && python benchmarks/workers_benchmark.py
+    cd backend && python benchmarks/workers_benchmark.py --workers 1 2 4 8 --requests 800 --output workers.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from chunking import Chunk  # noqa: E402
+from retrieval_benchmark import percentiles  # noqa: E402
+
+WORDS = ("payment intent checkout session webhook customer invoice subscription refund charge "
+         "component state effect hook render props context router layout deploy function edge "
+         "cache build preview domain utility class variant breakpoint spacing color").split()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until(check, timeout: float, what: str):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if check():
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"{what} did not come up within {timeout}s")
+
+
+class StubLLM(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible /chat/completions that sleeps, then returns a fixed answer"""
+    latency = 0.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+        body = json.dumps({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": "deepseek-chat",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "Stub answer."}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 2, "total_tokens": 2},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_chroma(path: str, timeout: float):
+    chroma = shutil.which("chroma") or os.path.join(os.path.dirname(sys.executable), "chroma")
+    port = free_port()
+    server = subprocess.Popen([chroma, "run", "--path", path, "--port", str(port)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://localhost:{port}"
+    wait_until(lambda: httpx.get(f"{url}/api/v2/heartbeat").status_code == 200, timeout, "chroma server")
+    return server, url
+
+
+def fill_store(persist_dir: str, chunks: int, seed: int):
+    """Synthetic chunks in a few tools, so every question finds context"""
+    from embed_store import EmbedStore
+
+    rng = random.Random(seed)
+    store = EmbedStore(persist_dir=persist_dir)
+    store.add_chunks([
+        Chunk(text=" ".join(rng.choice(WORDS) for _ in range(60)), tool=f"tool{i % 4}",
+              tool_name=f"Tool {i % 4}", title=f"Page {i}", url=f"https://docs.example/{i}")
+        for i in range(chunks)
+    ])
+    return store.collection.count()
+
+
+async def load(base: str, requests: int, concurrency: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    # Distinct questions, so neither the answer cache nor the query cache hides the work
+    questions = [f"how does the {rng.choice(WORDS)} {rng.choice(WORDS)} work? ({i})" for i in range(requests)]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async with httpx.AsyncClient(base_url=base, timeout=120,
+                                 limits=httpx.Limits(max_connections=concurrency)) as http:
+        async def ask(question: str):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await http.post("/ask", json={"question": question})
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200 or not response.json().get("sources"):
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(ask(question) for question in questions))
+        elapsed = time.perf_counter() - start
+        # A new connection per probe, so the kernel can hand each one to a different worker
+        pids = {(await http.get("/status", headers={"Connection": "close"})).json()["worker_pid"]
+                for _ in range(max(20, concurrency))}
+
+    return {
+        "requests_per_second": round(requests / elapsed, 1),
+        "errors": errors,
+        "latency": percentiles(latencies),
+        "workers_seen": len(pids),
+    }
+
+
+def serve_and_load(workdir: str, workers: int, env: dict, args) -> dict:
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        wait_until(lambda: httpx.get(f"{base}/status").json()["ready"], args.timeout, "app")
+        return asyncio.run(load(base, args.requests, args.concurrency, args.seed))
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=BACKEND, check=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="uvicorn worker counts to run")
+    parser.add_argument("--chunks", type=int, default=2000, help="synthetic chunks in the corpus")
+    parser.add_argument("--requests", type=int, default=400, help="/ask requests per run")
+    parser.add_argument("--concurrency", type=int, default=32, help="requests in flight")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds the stub LLM takes per answer")
+    parser.add_argument("--no-embedded", action="store_true", help="skip the single-worker embedded baseline")
+    parser.add_argument("--timeout", type=float, default=180.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    StubLLM.latency = args.llm_latency
+    llm = ThreadingHTTPServer(("127.0.0.1", 0), StubLLM)
+    threading.Thread(target=llm.serve_forever, daemon=True).start()
+
+    env = dict(os.environ)
+    env.update({
+        "WARMUP": "blocking",
+        "LOG_LEVEL": "WARNING",
+        "DEEPSEEK_BASE_URL": f"http://127.0.0.1:{llm.server_address[1]}",
+        "PYTHONPATH": os.pathsep.join(filter(None, [BACKEND, env.get("PYTHONPATH")])),
+    })
+    env.setdefault("DEEPSEEK_API_KEY", "benchmark")
+    env.pop("CHROMA_SERVER_URL", None)
+
+    report = {"commit": git_commit(), "chunks": args.chunks, "requests": args.requests,
+              "concurrency": args.concurrency, "llm_latency_ms": round(args.llm_latency * 1000, 2), "runs": {}}
+    with tempfile.TemporaryDirectory(prefix="workers-benchmark-") as workdir:
+        if not args.no_embedded:
+            embedded_dir = os.path.join(workdir, "embedded")
+            os.makedirs(embedded_dir)
+            fill_store(os.path.join(embedded_dir, "chroma_store"), args.chunks, args.seed)
+            report["runs"]["embedded-1"] = serve_and_load(embedded_dir, 1, env, args)
+
+        chroma, url = start_chroma(os.path.join(workdir, "chroma_server"), args.timeout)
+        try:
+            server_dir = os.path.join(workdir, "server")
+            os.makedirs(server_dir)
+            os.environ["CHROMA_SERVER_URL"] = env["CHROMA_SERVER_URL"] = url
+            report["chroma_server_chunks"] = fill_store(os.path.join(server_dir, "chroma_store"),
+                                                        args.chunks, args.seed)
+            for workers in args.workers:
+                report["runs"][f"server-{workers}"] = serve_and_load(server_dir, workers, env, args)
+        finally:
+            chroma.terminate()
+            chroma.wait(timeout=60)
+    llm.shutdown()
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
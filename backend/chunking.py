@@ -0,0 +1,133 @@
+import re
+from dataclasses import dataclass
+from typing import List, Tuple
+
+# Words and individual punctuation marks; tracks the embedder's wordpiece
+# count closely enough for sizing chunks without loading a tokenizer
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Marks a heading inside extracted page text so sections can be recovered
+HEADING_MARKER = "\x00HEADING\x00"
+
+# Chunks smaller than this are dropped as navigation debris
+MIN_CHUNK_CHARS = 40
+
+
+@dataclass
+class Chunk:
+    """A piece of a scraped page plus the metadata stored alongside it"""
+    text: str  # the embedded body, without any Source:/URL: header
+    tool: str  # tool key, e.g. "stripe"
+    tool_name: str  # display name, e.g. "Stripe"
+    title: str
+    url: str
+    section: str = ""
+
+    def metadata(self) -> dict:
+        return {
+            "tool": self.tool,
+            "tool_name": self.tool_name,
+            "title": self.title,
+            "url": self.url,
+            "section": self.section,
+        }
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count of a piece of text"""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    """Split marked-up page text into (heading, body) sections"""
+    parts = text.split(HEADING_MARKER)
+    sections = [("", parts[0])]
+    for part in parts[1:]:
+        heading, _, body = part.partition("\n")
+        sections.append((heading.strip(), body))
+    return sections
+
+
+def _normalize(text: str) -> str:
+    lines = [line.strip() for line in text.splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def _windows(text: str, max_tokens: int, overlap: int) -> List[str]:
+    """Split text into windows of at most max_tokens, overlapping by `overlap` tokens.
+
+    Window ends are pulled back to the last paragraph or sentence break in
+    the final third of the window, and overlaps start at a line or sentence
+    break, when one exists.
+    """
+    starts = [m.start() for m in TOKEN_PATTERN.finditer(text)]
+    ends = [m.end() for m in TOKEN_PATTERN.finditer(text)]
+    if len(starts) <= max_tokens:
+        return [text]
+
+    windows = []
+    start = 0
+    while start < len(starts):
+        end = min(start + max_tokens, len(starts))
+        if end < len(starts):
+            floor = start + (2 * max_tokens) // 3
+            window_text = text[starts[floor]:ends[end - 1]]
+            for boundary in ("\n\n", "\n", ". "):
+                cut = window_text.rfind(boundary)
+                if cut > 0:
+                    cut_pos = starts[floor] + cut + len(boundary)
+                    while end > floor + 1 and starts[end - 1] >= cut_pos:
+                        end -= 1
+                    break
+        windows.append(text[starts[start]:ends[end - 1]])
+        if end >= len(starts):
+            break
+        next_start = max(end - overlap, start + 1)
+        # Begin the overlap at a line or sentence start rather than mid-sentence
+        overlap_text = text[starts[next_start]:starts[end]]
+        for boundary in ("\n", ". "):
+            cut = overlap_text.find(boundary)
+            if cut >= 0:
+                cut_pos = starts[next_start] + cut + len(boundary)
+                while next_start < end and starts[next_start] < cut_pos:
+                    next_start += 1
+                break
+        start = next_start
+    return windows
+
+
+def chunk_page(text: str, max_tokens: int, overlap: int) -> List[Tuple[str, str]]:
+    """Split one page's extracted text into (section heading, body) pieces.
+
+    The text is split at headings first; adjacent small sections are merged
+    and long ones are windowed with overlap.
+    """
+    budget = max(50, max_tokens)
+    overlap = min(overlap, budget // 2)
+
+    pieces = []  # (section heading, body)
+    pending_heading, pending = "", []
+    pending_tokens = 0
+    for heading, body in split_sections(text):
+        body = _normalize(body)
+        if not body:
+            continue
+        tokens = count_tokens(body)
+        # A merged section keeps its heading in the body, so the heading counts too
+        merged = f"{heading}\n{body}" if heading else body
+        merged_tokens = count_tokens(merged)
+        if pending and pending_tokens + merged_tokens <= budget:
+            pending.append(merged)
+            pending_tokens += merged_tokens
+            continue
+        if pending:
+            pieces.append((pending_heading, "\n\n".join(pending)))
+        if tokens > budget:
+            pieces.extend((heading, window) for window in _windows(body, budget, overlap))
+            pending_heading, pending, pending_tokens = "", [], 0
+        else:
+            pending_heading, pending, pending_tokens = heading, [body], tokens
+    if pending:
+        pieces.append((pending_heading, "\n\n".join(pending)))
+
+    return [(heading, body) for heading, body in pieces if len(body) >= MIN_CHUNK_CHARS]
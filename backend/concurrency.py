@@ -0,0 +1,74 @@
+import asyncio
+from typing import Dict, Optional
+
+from metrics import IN_FLIGHT, QUEUE_DEPTH
+
+
+class QueueFullError(Exception):
+    """Raised when a request cannot get a slot before the queue overflows"""
+
+
+class RequestLimiter:
+    """Bounds concurrent work on an endpoint and tracks queue depth.
+
+    At most `max_concurrent` callers hold a slot at once. Up to `max_queue`
+    more wait for one; anything beyond that (or waiting longer than
+    `queue_timeout` seconds) is rejected with QueueFullError so a burst
+    degrades into fast 503s instead of piling up on the event loop.
+    In-flight and queued counts are exported as gauges labelled `name`.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: Optional[float] = None,
+                 name: str = "ask"):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self._export()
+
+    async def acquire(self):
+        """Wait for a slot, raising QueueFullError if the queue is saturated"""
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f"{self.waiting} requests already queued")
+
+        self.waiting += 1
+        self._export()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise QueueFullError(f"Timed out after {self.queue_timeout}s waiting for a slot")
+        finally:
+            self.waiting -= 1
+            self._export()
+
+        self.in_flight += 1
+        self._export()
+
+    def release(self):
+        """Give back a slot obtained with acquire()"""
+        self.in_flight -= 1
+        self.completed += 1
+        self._semaphore.release()
+        self._export()
+
+    def _export(self):
+        IN_FLIGHT.set(self.in_flight, limiter=self.name)
+        QUEUE_DEPTH.set(self.waiting, limiter=self.name)
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of the limiter counters"""
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,127 @@
+import math
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Set
+
+from chunking import TOKEN_PATTERN, count_tokens
+from lexical import tokenize
+
+# Weights of the rerank signals: retrieval rank, query-term coverage of the
+# chunk body, and coverage of its title/section
+RANK_WEIGHT = 0.3
+BODY_WEIGHT = 0.6
+HEADING_WEIGHT = 0.1
+
+# Word n-gram size used to compare chunks for near-duplicates
+SHINGLE_SIZE = 5
+
+# Appended to a chunk cut down to the budget
+TRUNCATION_MARKER = " ..."
+
+
+@dataclass
+class PackedContext:
+    """The prompt context for one question and how it was assembled"""
+    text: str
+    results: List[dict] = field(default_factory=list)  # search results that made it in, best first
+    tokens: int = 0
+    candidates: int = 0
+    duplicates: int = 0
+    over_budget: int = 0
+
+
+def rerank(question: str, results: List[dict]) -> List[dict]:
+    """Reorder search results with a cheap local score, best first.
+
+    Mixes the retrieval rank with how much of the question's (IDF-weighted,
+    within the candidate set) terms appear in the chunk and in its title or
+    section. No model is involved, so it costs well under a millisecond
+    per candidate.
+    """
+    query_terms = set(tokenize(question))
+    if not query_terms or len(results) < 2:
+        return list(results)
+
+    bodies = [set(tokenize(result["content"])) for result in results]
+    headings = [set(tokenize(" ".join(
+        str((result.get("metadata") or {}).get(key, "")) for key in ("title", "section")
+    ))) for result in results]
+    idf = {term: math.log(1 + len(results) / (1 + sum(term in body for body in bodies)))
+           for term in query_terms}
+    total = sum(idf.values()) or 1.0
+
+    def coverage(terms: Set[str]) -> float:
+        return sum(idf[term] for term in query_terms & terms) / total
+
+    scored = []
+    for rank, (result, body, heading) in enumerate(zip(results, bodies, headings)):
+        score = (RANK_WEIGHT * (1 - rank / len(results))
+                 + BODY_WEIGHT * coverage(body)
+                 + HEADING_WEIGHT * coverage(heading))
+        scored.append((score, rank, dict(result, rerank_score=round(score, 4))))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [result for _, _, result in scored]
+
+
+def _shingles(text: str) -> Set[tuple]:
+    words = [word.lower() for word in TOKEN_PATTERN.findall(text)]
+    if len(words) <= SHINGLE_SIZE:
+        return {tuple(words)}
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def dedupe(results: List[dict], threshold: float) -> List[dict]:
+    """Drop results whose text is near-identical (shingle Jaccard >= threshold) to a better one"""
+    kept, kept_shingles = [], []
+    for result in results:
+        shingles = _shingles(result["content"])
+        if any(len(shingles & other) / (len(shingles | other) or 1) >= threshold for other in kept_shingles):
+            continue
+        kept.append(result)
+        kept_shingles.append(shingles)
+    return kept
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens, the marker included"""
+    ends = [match.end() for match in TOKEN_PATTERN.finditer(text)]
+    if len(ends) <= max_tokens:
+        return text
+    keep = max(1, max_tokens - count_tokens(TRUNCATION_MARKER))
+    return text[:ends[keep - 1]] + TRUNCATION_MARKER
+
+
+def assemble_context(question: str, results: List[dict], token_budget: int,
+                     format_chunk: Callable[[dict], str],
+                     duplicate_threshold: float = 0.8) -> PackedContext:
+    """Rerank, dedupe and greedily pack search results into a token budget.
+
+    Chunks are taken best first and skipped (not truncated) when they no
+    longer fit, so a smaller lower-ranked chunk can still fill the space.
+    The best chunk is always included, cut down to the budget if it is
+    larger on its own (e.g. a whole page from an older store).
+    """
+    ranked = rerank(question, results)
+    unique = dedupe(ranked, duplicate_threshold)
+    packed = PackedContext(text="", candidates=len(results), duplicates=len(ranked) - len(unique))
+
+    parts: List[str] = []
+    for result in unique:
+        text = format_chunk(result)
+        tokens = count_tokens(text) + 1  # plus the blank line joining chunks
+        if packed.tokens + tokens > token_budget:
+            if parts:
+                packed.over_budget += 1
+                continue
+            text = _truncate(text, token_budget)
+            tokens = count_tokens(text)
+        parts.append(text)
+        packed.results.append(result)
+        packed.tokens += tokens
+
+    packed.text = "\n\n".join(parts)
+    return packed
+
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """Approximate prompt size of chat messages, in the chunker's token units"""
+    return sum(count_tokens(message["content"]) + 4 for message in messages)
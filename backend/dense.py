@@ -0,0 +1,248 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DTYPES = ("float32", "float16")
+
+# Rows scored per matmul, so a float16 matrix is only widened a block at a time
+BLOCK_ROWS = 32768
+
+CURRENT_FILE = "current.json"
+
+
+def _mapped(path: str) -> np.ndarray:
+    # A plain ndarray view of the mapping: np.memmap's own indexing is several times slower
+    return np.load(path, mmap_mode="r").view(np.ndarray)
+
+
+class StringColumn:
+    """Strings packed into one UTF-8 buffer with row offsets; None marks a missing value.
+
+    Columns whose values are not all strings (numbers, booleans) are stored
+    JSON-encoded and decoded on read.
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray, present: np.ndarray, encoded: bool):
+        self.data = data
+        self.offsets = offsets
+        self.present = present
+        self.encoded = encoded
+
+    def __getitem__(self, row: int) -> Any:
+        if not self.present[row]:
+            return None
+        value = self.data[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+        return json.loads(value) if self.encoded else value
+
+    @staticmethod
+    def write(directory: str, name: str, values: List[Any]) -> bool:
+        """Save a column's files; returns whether its values were JSON-encoded"""
+        encoded = any(value is not None and not isinstance(value, str) for value in values)
+        blobs = [b"" if value is None else (json.dumps(value) if encoded else value).encode("utf-8")
+                 for value in values]
+        offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+        np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+        np.save(os.path.join(directory, f"{name}.data.npy"), np.frombuffer(b"".join(blobs), dtype=np.uint8))
+        np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+        np.save(os.path.join(directory, f"{name}.present.npy"), np.array([value is not None for value in values]))
+        return encoded
+
+    @classmethod
+    def load(cls, directory: str, name: str, encoded: bool) -> "StringColumn":
+        def part(suffix):
+            return _mapped(os.path.join(directory, f"{name}.{suffix}.npy"))
+        return cls(part("data"), part("offsets"), part("present"), encoded)
+
+
+class _Build:
+    """One immutable, memory-mapped build of the index"""
+
+    def __init__(self, directory: str, info: Dict[str, Any]):
+        self.info = info
+        self.count = info["count"]
+        self.space = info["space"]
+        self.vectors = _mapped(os.path.join(directory, "vectors.npy"))
+        self.norms = _mapped(os.path.join(directory, "norms.npy"))
+        self.tool_codes = _mapped(os.path.join(directory, "tool_codes.npy"))
+        self.tools = {tool: code for code, tool in enumerate(info["tools"])}
+        self.ids = StringColumn.load(directory, "ids", False)
+        self.documents = StringColumn.load(directory, "documents", False)
+        self.metadata = {key: StringColumn.load(directory, f"meta.{key}", encoded)
+                         for key, encoded in info["metadata_columns"].items()}
+
+    def tool_mask(self, tools: Optional[List[str]]) -> Optional[np.ndarray]:
+        if not tools:
+            return None
+        codes = [self.tools[tool] for tool in tools if tool in self.tools]
+        return np.isin(self.tool_codes, codes)
+
+    def distances(self, queries: np.ndarray) -> np.ndarray:
+        """(queries x rows) distances, in the collection's distance function as Chroma reports it"""
+        products = np.empty((len(queries), self.count), dtype=np.float32)
+        for start in range(0, self.count, BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+            np.matmul(queries, block.T, out=products[:, start:start + len(block)])
+        # In place, so the only (queries x rows) array is `products`
+        if self.space == "ip":
+            np.subtract(1.0, products, out=products)
+            return products
+        query_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+        if self.space == "cosine":
+            products /= np.maximum(np.sqrt(query_norms * self.norms[None, :]), 1e-12)
+            np.subtract(1.0, products, out=products)
+            return products
+        # Squared euclidean distance, expanded so the matmul does the work
+        products *= -2.0
+        products += self.norms
+        products += query_norms
+        return np.maximum(products, 0.0, out=products)
+
+    def row(self, row: int, distance: float) -> Dict[str, Any]:
+        metadata = {}
+        for key, column in self.metadata.items():
+            value = column[row]
+            if value is not None:
+                metadata[key] = value
+        return {"content": self.documents[row], "id": self.ids[row], "distance": distance, "metadata": metadata}
+
+
+class DenseIndex:
+    """Brute-force vector index: every embedding of a collection in one memory-mapped matrix.
+
+    Built from the Chroma collection (see EmbedStore.rebuild_dense_index),
+    for corpora small enough that scoring every row beats an HNSW lookup
+    through Chroma. All queries of a batch are scored with one matmul and
+    the top k picked with argpartition, using the collection's distance
+    function, so results carry the same distances Chroma would report.
+    Chunk text and metadata live beside the matrix in columnar files.
+
+    Each build goes to its own directory under `path`, and `current.json`
+    names the live one. A rebuild therefore never disturbs searches running
+    on the previous build, and other processes pick it up on their next
+    search (one stat() each).
+    """
+
+    def __init__(self, path: str, dtype: str = "float32"):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown dense index dtype '{dtype}'. Choose from: {', '.join(DTYPES)}")
+        self.path = path
+        self.dtype = dtype
+        self._lock = threading.Lock()
+        self._build: Optional[_Build] = None
+        self._mtime: Optional[int] = None
+        self.reload()
+
+    def _stat(self) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(self.path, CURRENT_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def reload(self):
+        """Load the current build if it changed since the last look"""
+        if self._stat() == self._mtime:
+            return
+        with self._lock:
+            mtime = self._stat()
+            if mtime == self._mtime:
+                return
+            build = None
+            if mtime is not None:
+                with open(os.path.join(self.path, CURRENT_FILE), "r", encoding="utf-8") as f:
+                    info = json.load(f)
+                build = _Build(os.path.join(self.path, info["build"]), info)
+            self._build, self._mtime = build, mtime
+
+    @property
+    def info(self) -> Dict[str, Any]:
+        """Metadata of the loaded build (count, model, space, dtype, ...); empty if none"""
+        return dict(self._build.info) if self._build else {}
+
+    def count(self) -> int:
+        return self._build.count if self._build else 0
+
+    def build(self, pages: Iterable[Tuple[List[str], List[str], List[dict], Any]], space: str = "l2",
+              model: Optional[str] = None) -> int:
+        """Write a new build from (ids, documents, metadatas, embeddings) pages and switch to it"""
+        ids, documents, metadatas, vectors = [], [], [], []
+        for page_ids, page_documents, page_metadatas, page_embeddings in pages:
+            ids.extend(page_ids)
+            documents.extend(page_documents)
+            metadatas.extend(metadata or {} for metadata in page_metadatas)
+            vectors.append(np.asarray(page_embeddings, dtype=np.float32).reshape(len(page_ids), -1))
+        dimensions = vectors[0].shape[1] if vectors else 0
+        matrix = np.concatenate(vectors).astype(self.dtype) if vectors else np.zeros((0, 0), dtype=self.dtype)
+        widened = matrix.astype(np.float32)
+        tools = sorted({metadata["tool"] for metadata in metadatas if isinstance(metadata.get("tool"), str)})
+        codes = {tool: code for code, tool in enumerate(tools)}
+
+        name = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        partial = os.path.join(self.path, f"{name}.partial")
+        os.makedirs(partial)
+        np.save(os.path.join(partial, "vectors.npy"), matrix)
+        # Squared norms of the stored (possibly rounded) rows, for l2 and cosine distances
+        np.save(os.path.join(partial, "norms.npy"), np.einsum("ij,ij->i", widened, widened))
+        np.save(os.path.join(partial, "tool_codes.npy"),
+                np.array([codes.get(metadata.get("tool"), -1) for metadata in metadatas], dtype=np.int32))
+        StringColumn.write(partial, "ids", ids)
+        StringColumn.write(partial, "documents", documents)
+        metadata_columns = {}
+        for key in sorted({key for metadata in metadatas for key in metadata}):
+            metadata_columns[key] = StringColumn.write(partial, f"meta.{key}",
+                                                       [metadata.get(key) for metadata in metadatas])
+        os.replace(partial, os.path.join(self.path, name))
+
+        info = {"build": name, "count": len(ids), "dimensions": dimensions, "dtype": self.dtype, "space": space,
+                "model": model, "tools": tools, "metadata_columns": metadata_columns, "built_at": time.time()}
+        current = os.path.join(self.path, CURRENT_FILE)
+        with open(f"{current}.tmp", "w", encoding="utf-8") as f:
+            json.dump(info, f)
+        os.replace(f"{current}.tmp", current)
+        self.reload()
+        # Older builds can go: processes still mapping them keep their pages until they reload
+        for entry in os.listdir(self.path):
+            if entry not in (name, CURRENT_FILE) and os.path.isdir(os.path.join(self.path, entry)):
+                shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+        return len(ids)
+
+    def search(self, query_embeddings: List[Any], top_k: int = 5,
+               tools: Optional[List[str]] = None) -> List[List[Dict[str, Any]]]:
+        """Nearest rows for each query, formatted like EmbedStore's Chroma results"""
+        self.reload()
+        build = self._build
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        if build is None or not build.count or top_k <= 0:
+            return [[] for _ in range(len(queries))]
+        if queries.shape[1] != build.vectors.shape[1]:
+            raise ValueError(f"Query embeddings have {queries.shape[1]} dimensions, "
+                             f"the index {build.vectors.shape[1]}")
+
+        distances = build.distances(queries)
+        mask = build.tool_mask(tools)
+        candidates = build.count
+        if mask is not None:
+            distances[:, ~mask] = np.inf
+            candidates = int(mask.sum())
+        k = min(top_k, candidates)
+        if k == 0:
+            return [[] for _ in range(len(queries))]
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k] if k < build.count else \
+            np.broadcast_to(np.arange(build.count), distances.shape)
+        top_distances = np.take_along_axis(distances, top, axis=1)
+        order = np.argsort(top_distances, axis=1, kind="stable")[:, :k]
+        rows = np.take_along_axis(top, order, axis=1)
+        ranked = np.take_along_axis(top_distances, order, axis=1)
+        return [[build.row(int(row), float(distance)) for row, distance in zip(rows[q], ranked[q])]
+                for q in range(len(queries))]
+
+    def clear(self):
+        """Forget every build"""
+        with self._lock:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._build, self._mtime = None, None
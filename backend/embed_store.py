@@ -1,97 +1,1061 @@
-import chromadb
-from typing import List, Dict, Any
+import contextvars
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Tuple
+from chunking import Chunk
+from dense import DenseIndex
+from embeddings import DEFAULT_PROVIDER, EmbeddingProvider, get_provider, provider_from_spec
+from lexical import BM25Index
+from manifest import PageManifest, content_hash
+from metrics import CHUNKS, record_stage, span
+
+# Embedding model loaded once per bulk-ingest worker process
+_worker_embedding_function = None
+
+def _init_embed_worker(provider_spec: str):
+    global _worker_embedding_function
+    _worker_embedding_function = provider_from_spec(provider_spec)
+
+def _embed_batch(texts: List[str]):
+    """Embeddings for a batch and the seconds they took, timed in the worker"""
+    start = time.perf_counter()
+    embeddings = _worker_embedding_function(texts)
+    return embeddings, time.perf_counter() - start
+
+SEARCH_MODES = ("hybrid", "vector", "lexical")
+
+# Where vector searches run: Chroma's HNSW index, or a NumPy copy of every vector (see dense.py)
+SEARCH_BACKENDS = ("chroma", "numpy")
+
+# k in reciprocal-rank fusion, score = sum(1 / (k + rank)); 60 is the usual choice
+RRF_K = 60
+
+# Collection searched when no rebuild has swapped in another one yet
+DEFAULT_COLLECTION = "docs"
+
+# Names the live collection (and the one it replaced) once a rebuild has swapped one in
+ACTIVE_COLLECTION_FILE = "active_collection.json"
+
+# Rewritten after every change to the live corpus, so other processes sharing persist_dir notice it
+CORPUS_VERSION_FILE = "corpus_version.json"
+
+# Collection metadata key naming the embedding model (provider spec) its vectors come from
+EMBEDDING_MODEL_KEY = "embedding_model"
+
+class EmbeddingMismatchError(ValueError):
+    """Raised when a collection is searched or written with a different embedding model than it was built with"""
+
+def make_chroma_client(persist_dir: str):
+    """Chroma client for the store: embedded by default, or a Chroma server over HTTP.
+
+    Set CHROMA_SERVER_URL (e.g. http://localhost:8001) to share one Chroma
+    server between several app processes, such as uvicorn workers, instead
+    of each opening the SQLite/HNSW files in `persist_dir`. HTTP requests go
+    through one pooled keep-alive client per process, sized by
+    CHROMA_HTTP_MAX_CONNECTIONS and CHROMA_HTTP_KEEPALIVE_SECS.
+    """
+    # chromadb (and through it onnxruntime) is imported on first use rather than with this
+    # module, so importing the app stays fast and the cost moves to the startup warmup
+    import chromadb
+
+    server_url = os.getenv("CHROMA_SERVER_URL")
+    if not server_url:
+        return chromadb.PersistentClient(path=persist_dir)
+
+    from urllib.parse import urlsplit
+    from chromadb.config import Settings
+
+    url = urlsplit(server_url)
+    max_connections = int(os.getenv("CHROMA_HTTP_MAX_CONNECTIONS", "16"))
+    settings = Settings(
+        chroma_http_max_connections=max_connections,
+        chroma_http_max_keepalive_connections=max_connections,
+        chroma_http_keepalive_secs=float(os.getenv("CHROMA_HTTP_KEEPALIVE_SECS", "40")),
+    )
+    return chromadb.HttpClient(host=url.hostname or "localhost",
+                               port=url.port or (443 if url.scheme == "https" else 8000),
+                               ssl=url.scheme == "https", settings=settings)
 
 class EmbedStore:
     _instance = None
+    _instance_lock = threading.Lock()
 
-    def __init__(self, persist_dir="chroma_store"):
-        # ChromaDB client with default embeddings (no external API needed)
-        self.client = chromadb.PersistentClient(path=persist_dir)
-        self.collection = self.client.get_or_create_collection(name="docs")
-        print("EmbedStore initialized with ChromaDB default embeddings")
+    def __init__(self, persist_dir="chroma_store", collection_name: Optional[str] = None,
+                 client: Optional[Any] = None, embedding_provider: Optional[EmbeddingProvider] = None):
+        # ChromaDB client with a local embedding model (no external API needed). The BM25
+        # index, page manifest and collection pointer stay in persist_dir either way.
+        self.persist_dir = persist_dir
+        self.client = client or make_chroma_client(persist_dir)
+        # EMBEDDING_PROVIDER by default (see embeddings.get_provider); loaded on first use
+        self.embedding_function = embedding_provider or get_provider()
+        self.embedding_mismatch: Optional[str] = None
+        # The live store follows the pointer file, so swaps made by other processes reach it
+        self._follows_pointer = collection_name is None
+        self._pointer_mtime = self._pointer_stat()
+        self._corpus_version = self.corpus_version()
+        self.collection = self._open_collection(
+            collection_name or self._read_pointer().get("active", DEFAULT_COLLECTION)
+        )
+        self._swap_lock = threading.Lock()
+        # Which pages are already embedded in this store (see page_manifest)
+        self.manifest_path = os.path.join(persist_dir, "page_manifest.json")
+        # Query text -> embedding, so repeated questions skip the model
+        self.query_cache_size = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+        self._query_cache: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+        self.query_cache_hits = 0
+        self.query_cache_misses = 0
+        # BM25 index over the same chunks, for exact identifiers the embeddings miss
+        self.lexical = BM25Index(self._lexical_path(self.collection.name))
+        self._lexical_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="lexical")
+        if self.lexical.count() != self.collection.count():
+            self.rebuild_lexical_index()
+        # Optional NumPy copy of the vectors, rebuilt from the collection after every write
+        self.search_backend = os.getenv("SEARCH_BACKEND", "chroma").lower()
+        if self.search_backend not in SEARCH_BACKENDS:
+            raise ValueError(f"Unknown search backend '{self.search_backend}'. "
+                             f"Choose from: {', '.join(SEARCH_BACKENDS)}")
+        self._dense_lock = threading.Lock()
+        self.dense = self._open_dense(self.collection)
+        print(f"EmbedStore initialized with {self.embedding_function.spec} embeddings")
 
     @classmethod
     def get_instance(cls):
-        if cls._instance is None:
-            cls._instance = cls()
+        # Locked because the startup warmup and the first requests may race to open the store
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
         return cls._instance
 
-    def add_texts(self, texts: List[str]) -> bool:
-        """Add texts using ChromaDB's built-in embeddings"""
+    def warmup(self) -> Dict[str, float]:
+        """Load the embedding model and run a dummy query through both indexes.
+
+        Returns the seconds each step took. The query bypasses the query
+        embedding cache, so warming up leaves its stats untouched.
+        """
+        timings = {}
+        start = time.perf_counter()
+        embedding = self.embedding_function(["warmup query"])[0]
+        timings["model_load"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if self.collection.count() and not self.embedding_mismatch:
+            self._vector_search([embedding], 1, None)
+        self.lexical.search("warmup query", 1)
+        timings["dummy_query"] = time.perf_counter() - start
+        return timings
+
+    def _open_collection(self, name: str, create: bool = True):
+        """Open (or create) a collection and check it was embedded with this store's model.
+
+        The model's spec is recorded in the metadata of new collections. Chroma
+        gets no embedding function: the store always passes vectors itself.
+        A collection built with another model still opens, so it can be
+        inspected or rebuilt, but searching or writing it raises
+        EmbeddingMismatchError.
+        """
+        spec = self.embedding_function.spec
+        if create:
+            collection = self.client.get_or_create_collection(name=name, metadata={EMBEDDING_MODEL_KEY: spec})
+        else:
+            collection = self.client.get_collection(name=name)
+        metadata = dict(collection.metadata or {})
+        recorded = metadata.get(EMBEDDING_MODEL_KEY)
+        if recorded is None:
+            if collection.count() and spec != DEFAULT_PROVIDER:
+                # Stores from before models were configurable hold default-model vectors
+                recorded = DEFAULT_PROVIDER
+            else:
+                recorded = spec
+                collection.modify(metadata={**metadata, EMBEDDING_MODEL_KEY: spec})
+        self.embedding_mismatch = None if recorded == spec else (
+            f"Collection '{name}' was embedded with '{recorded}', but this store uses '{spec}'. "
+            f"Set EMBEDDING_PROVIDER (and EMBEDDING_MODEL / EMBEDDING_DIMENSIONS) to match, "
+            f"or rebuild it with POST /initialize?rebuild=true"
+        )
+        if self.embedding_mismatch:
+            print(self.embedding_mismatch)
+        return collection
+
+    def _check_embedding_model(self, query_embeddings: Optional[List[Any]] = None):
+        """Refuse to mix vectors of different models in one collection"""
+        if self.embedding_mismatch:
+            raise EmbeddingMismatchError(self.embedding_mismatch)
+        dimensions = self.embedding_function.dimensions
+        if query_embeddings is not None and dimensions:
+            for embedding in query_embeddings:
+                if len(embedding) != dimensions:
+                    raise EmbeddingMismatchError(
+                        f"Query embedding has {len(embedding)} dimensions, the collection {dimensions}")
+
+    def embedding_info(self) -> Dict[str, Any]:
+        return {
+            "model": self.embedding_function.spec,
+            "collection_model": (self.collection.metadata or {}).get(EMBEDDING_MODEL_KEY),
+            "mismatch": self.embedding_mismatch,
+        }
+
+    def search_backend_info(self) -> Dict[str, Any]:
+        info = {"backend": self.search_backend}
+        if self.dense is not None:
+            dense = self.dense.info
+            info.update({key: dense.get(key) for key in ("count", "dimensions", "dtype", "space")})
+        return info
+
+    def page_manifest(self) -> PageManifest:
+        """Manifest of scraped pages that lives alongside this store"""
+        return PageManifest(self.manifest_path)
+
+    @staticmethod
+    def chunk_id(text_hash: str, tool: Optional[str] = None) -> str:
+        """Deterministic chunk ID derived from content (and tool, when known)"""
+        return f"{tool or 'chunk'}-{text_hash[:32]}"
+
+    def _prepare(self, items: List[Tuple[str, dict]]) -> Dict[str, tuple]:
+        """Map chunk ID -> (text, metadata) for the valid, de-duplicated items"""
+        prepared = {}
+        for text, metadata in items:
+            if not text or len(text.strip()) <= 10:
+                continue
+            text = text.strip()
+            text_hash = content_hash(text)
+            metadata = {**metadata, "hash": text_hash}
+            prepared.setdefault(self.chunk_id(text_hash, metadata.get("tool")), (text, metadata))
+        return prepared
+
+    def add_texts(self, texts: List[str], tool: Optional[str] = None) -> bool:
+        """Add plain texts, optionally tagged with a tool"""
         if not texts:
             return False
-            
-        # Filter valid texts
-        valid_texts = [text.strip() for text in texts if text and text.strip() and len(text.strip()) > 10]
-        if not valid_texts:
+        return self._upsert_new(self._prepare([(text, {"tool": tool} if tool else {}) for text in texts]))
+
+    def add_chunks(self, chunks: List[Chunk], **ingest_options) -> bool:
+        """Add scraped chunks, storing their tool/title/URL/section as metadata.
+
+        `ingest_options` (on_progress, cancel_event, ...) go to bulk_ingest.
+        """
+        if not chunks:
+            return False
+        return self._upsert_new(self._prepare([(chunk.text, chunk.metadata()) for chunk in chunks]),
+                                **ingest_options)
+
+    def _upsert_new(self, prepared: Dict[str, tuple], **ingest_options) -> bool:
+        """Embed and store the prepared chunks that are not stored yet.
+
+        IDs are derived from the chunk content, so re-adding the same text
+        does not embed it again: chunks that are already stored only get
+        their metadata rewritten if it changed, and new ones are upserted.
+        """
+        if not prepared:
             return False
-        
-        print(f"Adding {len(valid_texts)} texts to embedding store...")
         
         try:
-            # Generate IDs
-            current_count = self.collection.count()
-            ids = [f"doc-{current_count + i}" for i in range(len(valid_texts))]
-            
-            # Add documents - ChromaDB will automatically generate embeddings
-            self.collection.add(
-                documents=valid_texts,
-                ids=ids
-            )
-            
-            print(f"Successfully added {len(valid_texts)} texts to ChromaDB")
-            return True
+            self._check_embedding_model()
+            existing, updated = self._existing_ids(prepared)
+            new_ids = [chunk_id for chunk_id in prepared if chunk_id not in existing]
+            if not new_ids:
+                print(f"All {len(prepared)} texts are already embedded, nothing to add")
+                if updated:
+                    self._corpus_changed()
+                return True
+
+            print(f"Adding {len(new_ids)} texts to embedding store ({len(existing)} unchanged skipped)...")
+            stats = self.bulk_ingest({chunk_id: prepared[chunk_id] for chunk_id in new_ids}, **ingest_options)
+            return stats["failed"] == 0 and not stats["cancelled"]
             
         except Exception as e:
             print(f"Error adding texts: {e}")
             return False
 
-    def search(self, query: str, top_k: int = 5) -> List[str]:
-        """Search using ChromaDB's built-in embeddings"""
+    def bulk_ingest(self, prepared: Dict[str, tuple], batch_size: Optional[int] = None,
+                    **ingest_options) -> Dict[str, Any]:
+        """Embed already-prepared chunks in batches, writing each batch as it is ready.
+
+        See _embed_batches for `ingest_options` (workers, on_progress,
+        on_write, cancel_event).
+        """
+        batch_size = batch_size or int(os.getenv("EMBED_BATCH_SIZE", "64"))
+        items = [(chunk_id, text, metadata) for chunk_id, (text, metadata) in prepared.items()]
+        batches = (items[i:i + batch_size] for i in range(0, len(items), batch_size))
+        return self._embed_batches(batches, total=len(items), **ingest_options)
+
+    def ingest_stream(self, chunks: Iterable[Chunk], batch_size: Optional[int] = None,
+                      **ingest_options) -> Dict[str, Any]:
+        """Embed and store chunks as they arrive from a lazy iterable.
+
+        Chunks are pulled only as fast as batches are embedded, so when fed
+        from UniversalScraper.iter_pages memory holds a few batches rather
+        than the whole corpus, and fetching overlaps with embedding. Chunks
+        that are already stored are not embedded again; only their metadata
+        is rewritten if it changed (see _existing_ids).
+        """
+        batch_size = batch_size or int(os.getenv("EMBED_BATCH_SIZE", "64"))
+        skipped = [0]
+        updated = [0]
+
+        def batches():
+            seen = set()
+            pending: Dict[str, tuple] = {}
+            ready: List[tuple] = []
+
+            def check_pending():
+                existing, changed = self._existing_ids(pending)
+                skipped[0] += len(existing)
+                updated[0] += changed
+                ready.extend((chunk_id, text, metadata) for chunk_id, (text, metadata) in pending.items()
+                             if chunk_id not in existing)
+                pending.clear()
+
+            for chunk in chunks:
+                for chunk_id, item in self._prepare([(chunk.text, chunk.metadata())]).items():
+                    if chunk_id not in seen:
+                        seen.add(chunk_id)
+                        pending[chunk_id] = item
+                if len(pending) >= batch_size:
+                    check_pending()
+                while len(ready) >= batch_size:
+                    yield ready[:batch_size]
+                    del ready[:batch_size]
+            check_pending()
+            if ready:
+                yield ready
+
+        stats = self._embed_batches(batches(), **ingest_options)
+        stats["skipped"] = skipped[0]
+        stats["metadata_updated"] = updated[0]
+        if updated[0] and not stats["embedded"]:
+            self._corpus_changed()  # otherwise done after the writes
+        return stats
+
+    def _embed_batches(self, batches: Iterator[List[tuple]], total: Optional[int] = None,
+                       workers: Optional[int] = None,
+                       on_progress: Optional[Callable[[int, int], None]] = None,
+                       on_write: Optional[Callable[[List[dict]], None]] = None,
+                       cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """Embed (id, text, metadata) batches and upsert them on a writer thread.
+
+        With more than one worker, batches are embedded in a process pool
+        (each process loads its own copy of the model) with at most two
+        batches per worker in flight; embedded batches wait in a bounded
+        queue for the writer, so embedding, writing and whatever produces
+        `batches` all overlap while peak memory stays bounded. A batch that
+        fails is logged and counted; the others are still stored, and
+        because IDs are content-derived a retry only re-embeds what failed.
+        `on_progress(done, total)` is called after every batch, with total
+        being the chunks seen so far when it is not known up front;
+        `on_write(metadatas)` gets each stored batch's metadata; setting
+        `cancel_event` stops new batches from starting.
+        """
+        self._check_embedding_model()
+        workers = workers if workers is not None else int(os.getenv("EMBED_WORKERS", str(min(4, os.cpu_count() or 1))))
+        stats = {"embedded": 0, "failed": 0, "batches": 0, "cancelled": False}
+        queued = [0]
+        start = time.perf_counter()
+
+        def report():
+            elapsed = time.perf_counter() - start
+            rate = stats["embedded"] / elapsed if elapsed else 0.0
+            seen = total if total is not None else queued[0]
+            print(f"Embedded {stats['embedded']}/{seen} chunks ({rate:.1f} chunks/s)")
+            if on_progress:
+                on_progress(stats["embedded"], seen)
+
+        writes: "queue.Queue" = queue.Queue(maxsize=max(2, workers * 2))
+
+        def writer():
+            while True:
+                item = writes.get()
+                if item is None:
+                    return
+                batch, embeddings = item
+                try:
+                    with span("store_write"):
+                        # Lexical first: an ID indexed without its Chroma row is harmless and re-added next run
+                        self.lexical.add([chunk_id for chunk_id, _, _ in batch],
+                                         [text for _, text, _ in batch],
+                                         [metadata for _, _, metadata in batch])
+                        self.collection.upsert(
+                            ids=[chunk_id for chunk_id, _, _ in batch],
+                            documents=[text for _, text, _ in batch],
+                            metadatas=[metadata for _, _, metadata in batch],
+                            embeddings=embeddings,
+                        )
+                    stats["embedded"] += len(batch)
+                    CHUNKS.inc(len(batch), result="embedded")
+                    if on_write:
+                        on_write([metadata for _, _, metadata in batch])
+                except Exception as e:
+                    print(f"Error writing batch of {len(batch)} chunks: {e}")
+                    stats["failed"] += len(batch)
+                    CHUNKS.inc(len(batch), result="failed")
+                report()
+
+        def failed(batch: List[tuple], error: Exception):
+            print(f"Error embedding batch of {len(batch)} chunks: {error}")
+            stats["failed"] += len(batch)
+            CHUNKS.inc(len(batch), result="failed")
+            report()
+
+        def embed_inline(batch: List[tuple]):
+            try:
+                with span("embed_batch"):
+                    embeddings = self.embedding_function([text for _, text, _ in batch])
+                writes.put((batch, embeddings))
+            except Exception as e:
+                failed(batch, e)
+
+        def cancelled() -> bool:
+            stats["cancelled"] = bool(cancel_event and cancel_event.is_set())
+            return stats["cancelled"]
+
+        def next_batch():
+            batch = next(batches, None)
+            if batch is not None:
+                stats["batches"] += 1
+                queued[0] += len(batch)
+            return batch
+
+        batches = iter(batches)
+        write_thread = threading.Thread(target=writer, name="embed-writer", daemon=True)
+        write_thread.start()
+        try:
+            # Only start a process pool when there are at least two batches to share out
+            head = [batch for batch in (next_batch(), next_batch()) if batch is not None]
+            remaining = chain(head, iter(next_batch, None))
+            if workers <= 1 or len(head) <= 1:
+                for batch in remaining:
+                    if cancelled():
+                        break
+                    embed_inline(batch)
+            else:
+                self._embed_in_pool(remaining, workers, writes, embed_inline, failed, cancelled,
+                                    self.embedding_function.spec)
+        finally:
+            writes.put(None)
+            write_thread.join()
+            if stats["embedded"]:
+                self._corpus_changed()
+
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        stats["chunks_per_second"] = round(stats["embedded"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+        print(f"Bulk ingest finished: {stats}")
+        return stats
+
+    @staticmethod
+    def _embed_in_pool(batches: Iterator[List[tuple]], workers: int, writes: "queue.Queue",
+                       embed_inline: Callable, failed: Callable, cancelled: Callable[[], bool],
+                       provider_spec: str = DEFAULT_PROVIDER):
+        """Embed batches across worker processes, handing results to the writer queue"""
+        # spawn, not fork: the parent runs threads (uvicorn, Chroma) that fork would copy mid-flight
+        context = multiprocessing.get_context("spawn")
+        pending = {}
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_init_embed_worker, initargs=(provider_spec,)) as pool:
+                while True:
+                    while len(pending) < workers * 2 and not cancelled():
+                        batch = next(batches, None)
+                        if batch is None:
+                            break
+                        pending[pool.submit(_embed_batch, [text for _, text, _ in batch])] = batch
+                    if not pending:
+                        break
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        batch = pending.pop(future)
+                        try:
+                            embeddings, seconds = future.result()
+                        except BrokenProcessPool:
+                            pending[future] = batch
+                            raise
+                        except Exception as e:
+                            failed(batch, e)
+                            continue
+                        record_stage("embed_batch", seconds)
+                        writes.put((batch, embeddings))
+        except BrokenProcessPool as e:
+            # A worker died (e.g. out of memory); finish the remaining batches here
+            print(f"Embedding worker pool failed ({e}), continuing in-process")
+            for batch in chain(list(pending.values()), batches):
+                if cancelled():
+                    break
+                embed_inline(batch)
+
+    def replace_tool(self, tool: str, chunks: List[Chunk], keep_hashes: Iterable[str] = (),
+                     **ingest_options) -> bool:
+        """Make `chunks` the complete set of chunks stored for a tool.
+
+        New chunks are upserted first and the tool's stale chunks are deleted
+        afterwards, so searches never see the tool half-empty. Chunks listed
+        in `keep_hashes` (e.g. from pages skipped as unchanged) survive.
+        """
+        if chunks and not self.add_chunks(chunks, **ingest_options):
+            return False
+        keep_hashes = [content_hash(chunk.text) for chunk in chunks] + list(keep_hashes)
+        return self.remove_stale(tool, keep_hashes)
+
+    def remove_stale(self, tool: str, keep_hashes: Iterable[str]) -> bool:
+        """Delete a tool's stored chunks except those whose content hash is kept"""
+        try:
+            with span("stale_removal"):
+                keep = {self.chunk_id(text_hash, tool) for text_hash in keep_hashes}
+                current = self.collection.get(where={"tool": tool}, include=[])["ids"]
+                stale = [chunk_id for chunk_id in current if chunk_id not in keep]
+                for i in range(0, len(stale), 500):
+                    self.collection.delete(ids=stale[i:i + 500])
+                self.lexical.delete(stale)
+            if stale:
+                self._corpus_changed()
+                print(f"Removed {len(stale)} stale chunks for {tool}")
+            return True
+        except Exception as e:
+            print(f"Error replacing chunks for {tool}: {e}")
+            return False
+
+    def compact(self, batch_size: int = 500) -> Dict[str, int]:
+        """Rewrite a store to deterministic IDs, dropping duplicate chunks.
+
+        Older stores used positional `doc-N` IDs and can hold many copies of
+        the same chunk. Each chunk is moved to its content-derived ID (reusing
+        the stored embedding, so nothing is re-embedded) and extra copies are
+        deleted. Safe to run repeatedly.
+        """
+        from tools import TOOLS
+        tool_keys = {config.name: key for key, config in TOOLS.items()}
+
+        # Pass 1: work out where every chunk should live
+        targets: Dict[str, str] = {}  # target ID -> ID of the copy we keep
+        moves: Dict[str, tuple] = {}  # current ID -> (target ID, metadata)
+        duplicates: List[str] = []
+        offset = 0
+        while True:
+            page = self.collection.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+            if not page["ids"]:
+                break
+            for chunk_id, doc, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                metadata = dict(metadata or {})
+                metadata["hash"] = content_hash(doc)
+                if "tool" not in metadata:
+                    source = doc.split("\n", 1)[0]
+                    if source.startswith("Source:"):
+                        tool_name = source.replace("Source:", "").split(" - ", 1)[0].strip()
+                        if tool_name in tool_keys:
+                            metadata["tool"] = tool_keys[tool_name]
+                target = self.chunk_id(metadata["hash"], metadata.get("tool"))
+                if target in targets:
+                    if chunk_id != target:
+                        duplicates.append(chunk_id)
+                        continue
+                    # This copy already sits at the target ID, so it wins
+                    duplicates.append(targets[target])
+                    moves.pop(targets[target], None)
+                targets[target] = chunk_id
+                if chunk_id != target:
+                    moves[chunk_id] = (target, metadata)
+            offset += len(page["ids"])
+
+        # Pass 2: copy chunks to their new IDs, then delete the old ones
+        move_ids = list(moves)
+        for i in range(0, len(move_ids), batch_size):
+            batch = move_ids[i:i + batch_size]
+            rows = self.collection.get(ids=batch, include=["documents", "embeddings"])
+            self.collection.upsert(
+                ids=[moves[chunk_id][0] for chunk_id in rows["ids"]],
+                documents=rows["documents"],
+                embeddings=rows["embeddings"],
+                metadatas=[moves[chunk_id][1] for chunk_id in rows["ids"]],
+            )
+            self.collection.delete(ids=rows["ids"])
+
+        for i in range(0, len(duplicates), batch_size):
+            self.collection.delete(ids=duplicates[i:i + batch_size])
+
+        if moves or duplicates:
+            self.rebuild_lexical_index(batch_size)
+            self._corpus_changed()
+
+        stats = {"moved": len(moves), "duplicates_removed": len(duplicates), "remaining": self.collection.count()}
+        print(f"Compaction finished: {stats}")
+        return stats
+
+    def rebuild_lexical_index(self, batch_size: int = 500) -> int:
+        """Re-index every stored chunk for BM25, e.g. for stores created before the index"""
+        print("Rebuilding BM25 index from the collection...")
+        self.lexical.clear()
+        offset = 0
+        while True:
+            page = self.collection.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+            if not page["ids"]:
+                break
+            self.lexical.add(page["ids"], page["documents"], page["metadatas"])
+            offset += len(page["ids"])
+        print(f"Indexed {offset} chunks for BM25")
+        return offset
+
+    def _dense_path(self, collection_name: str) -> str:
+        return os.path.join(self.persist_dir, f"dense_{collection_name}")
+
+    def _open_dense(self, collection) -> Optional[DenseIndex]:
+        """The collection's NumPy index with the numpy backend (built if missing or stale), else None"""
+        if self.search_backend != "numpy":
+            return None
+        dense = DenseIndex(self._dense_path(collection.name), os.getenv("DENSE_INDEX_DTYPE", "float32"))
+        info = dense.info
+        if (info.get("count") != collection.count() or info.get("dtype") != dense.dtype
+                or info.get("model") != (collection.metadata or {}).get(EMBEDDING_MODEL_KEY)):
+            self.rebuild_dense_index(dense, collection)
+        return dense
+
+    @staticmethod
+    def _distance_space(collection) -> str:
+        """Distance function of a collection's HNSW index (l2, cosine or ip)"""
+        configuration = getattr(collection, "configuration", None) or {}
+        hnsw = configuration.get("hnsw") or {}
+        return hnsw.get("space") or (collection.metadata or {}).get("hnsw:space") or "l2"
+
+    def rebuild_dense_index(self, dense: Optional[DenseIndex] = None, collection=None,
+                            batch_size: int = 500) -> int:
+        """Reload every stored vector from Chroma into the NumPy index (numpy backend only)"""
+        dense, collection = dense or self.dense, collection or self.collection
+        if dense is None:
+            return 0
+
+        def pages():
+            offset = 0
+            while True:
+                page = collection.get(limit=batch_size, offset=offset,
+                                      include=["documents", "metadatas", "embeddings"])
+                if not len(page["ids"]):
+                    return
+                yield page["ids"], page["documents"], page["metadatas"], page["embeddings"]
+                offset += len(page["ids"])
+
+        with self._dense_lock, span("dense_index_build"):
+            count = dense.build(pages(), self._distance_space(collection),
+                                (collection.metadata or {}).get(EMBEDDING_MODEL_KEY))
+        print(f"Loaded {count} vectors into the NumPy index ({dense.dtype})")
+        return count
+
+    def _refresh_dense(self):
+        """Rebuild the NumPy index after a write; searches keep the previous build if this fails"""
+        if self.dense is None:
+            return
+        try:
+            self.rebuild_dense_index()
+        except Exception as e:
+            print(f"Error rebuilding the NumPy index: {e}")
+
+    def _corpus_changed(self):
+        """After a write: refresh the NumPy index and tell the other processes (see corpus_version)"""
+        self._refresh_dense()
+        self._bump_corpus_version()
+
+    def _existing_ids(self, prepared: Dict[str, tuple], batch_size: int = 500) -> Tuple[set, int]:
+        """Return the prepared chunk IDs already present in the collection, and how many were updated.
+
+        A stored chunk's text cannot have changed (its ID is derived from
+        it), but the page it came from may have been renamed or moved, so
+        changed metadata is rewritten in place without embedding again.
+        """
+        ids = list(prepared)
+        existing, changed = set(), {}
+        for i in range(0, len(ids), batch_size):
+            found = self.collection.get(ids=ids[i:i + batch_size], include=["metadatas"])
+            for chunk_id, metadata in zip(found["ids"], found["metadatas"]):
+                existing.add(chunk_id)
+                if metadata != prepared[chunk_id][1]:
+                    changed[chunk_id] = prepared[chunk_id][1]
+        if changed:
+            self.collection.update(ids=list(changed), metadatas=list(changed.values()))
+            CHUNKS.inc(len(changed), result="metadata_updated")
+        return existing, len(changed)
+
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        return " ".join(query.split())
+
+    def embed_queries(self, queries: List[str]) -> List[Any]:
+        """Embed many queries, running the model once for all cache misses.
+
+        Cached vectors are keyed by the provider's spec as well as the
+        query, so a store given another embedding model never reuses them.
+        """
+        spec = self.embedding_function.spec
+        texts = [self._normalize_query(query) for query in queries]
+        keys = [(spec, text) for text in texts]
+        embeddings: Dict[tuple, Any] = {}
+        with self._query_cache_lock:
+            for key in keys:
+                if key in self._query_cache:
+                    self._query_cache.move_to_end(key)
+                    embeddings[key] = self._query_cache[key]
+            self.query_cache_hits += sum(1 for key in keys if key in embeddings)
+
+        missing = list(dict.fromkeys(key for key in keys if key not in embeddings))
+        if missing:
+            with span("query_embedding"):
+                vectors = self.embedding_function([text for _, text in missing])
+            with self._query_cache_lock:
+                self.query_cache_misses += len(missing)
+                for key, vector in zip(missing, vectors):
+                    embeddings[key] = vector
+                    self._query_cache[key] = vector
+                while len(self._query_cache) > self.query_cache_size:
+                    self._query_cache.popitem(last=False)
+
+        return [embeddings[key] for key in keys]
+
+    def embed_query(self, query: str) -> Any:
+        """Embed a single query (cached) with the same model the collection uses"""
+        return self.embed_queries([query])[0]
+
+    def query_cache_stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._query_cache),
+            "hits": self.query_cache_hits,
+            "misses": self.query_cache_misses,
+        }
+
+    @staticmethod
+    def _tool_filter(tools: Optional[List[str]]) -> Optional[Dict[str, Any]]:
+        """Chroma `where` clause restricting a query to the given tool keys"""
+        if not tools:
+            return None
+        if len(tools) == 1:
+            return {"tool": tools[0]}
+        return {"tool": {"$in": list(tools)}}
+
+    def search(self, query: str, top_k: int = 5, tools: Optional[List[str]] = None) -> List[str]:
+        """Search using the store's embedding model, optionally within some tools"""
         if not query or not query.strip():
             return []
+        self._follow_pointer()
+        self._check_embedding_model()
             
         try:
-            # Use query_texts - ChromaDB handles embedding automatically
-            results = self.collection.query(
-                query_texts=[query.strip()],
-                n_results=top_k
-            )
-            return results["documents"][0] if results["documents"] else []
+            return [result["content"] for result in self._vector_search([self.embed_query(query)], top_k, tools)[0]]
         except Exception as e:
             print(f"Search error: {e}")
             return []
     
-    def search_with_metadata(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Enhanced search with metadata"""
+    def search_with_metadata(self, query: str, top_k: int = 5,
+                             tools: Optional[List[str]] = None, mode: str = "vector") -> List[Dict[str, Any]]:
+        """Search returning each chunk with its distance and stored metadata.
+
+        `tools` limits the search to chunks of those tool keys; the filter is
+        applied inside Chroma, before nearest-neighbour ranking. `mode` is
+        one of SEARCH_MODES (see search_many_with_metadata).
+        """
         if not query or not query.strip():
             return []
+        return self.search_many_with_metadata([query], top_k, tools, mode)[0]
+
+    def search_many_with_metadata(self, queries: List[str], top_k: int = 5,
+                                  tools: Optional[List[str]] = None, mode: str = "vector",
+                                  query_embeddings: Optional[List[Any]] = None) -> List[List[Dict[str, Any]]]:
+        """Batch form of search_with_metadata: one model call and one Chroma query.
+
+        "vector" ranks by embedding distance, "lexical" by BM25 over the
+        chunk text, and "hybrid" runs both at once (BM25 on a side thread
+        while Chroma answers) and merges them with reciprocal-rank fusion.
+        Hybrid and lexical results carry an `rrf_score` / `bm25_score`;
+        `distance` is None for chunks only the lexical side found. Pass
+        `query_embeddings` (from embed_queries) if the queries are already
+        embedded, to skip the model.
+        """
+        if not queries:
+            return []
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}'. Choose from: {', '.join(SEARCH_MODES)}")
+        self._follow_pointer()
+        if mode != "lexical":
+            self._check_embedding_model(query_embeddings)
             
         try:
-            results = self.collection.query(
-                query_texts=[query.strip()],
-                n_results=top_k
-            )
-            
-            search_results = []
-            if results["documents"] and len(results["documents"]) > 0:
-                documents = results["documents"][0]
-                ids = results["ids"][0] if results["ids"] else []
-                distances = results["distances"][0] if results["distances"] else []
-                
-                for i, doc in enumerate(documents):
-                    result = {
-                        "content": doc,
-                        "id": ids[i] if i < len(ids) else f"doc-{i}",
-                        "distance": distances[i] if i < len(distances) else 0,
-                    }
-                    search_results.append(result)
-            
-            return search_results
+            if mode == "lexical":
+                with span("lexical_search"):
+                    return [self._lexical_results(self.lexical.search(query, top_k, tools)) for query in queries]
+
+            # Fuse over a deeper candidate list than we return
+            n_results = top_k * 4 if mode == "hybrid" else top_k
+            lexical = (self._lexical_executor.submit(
+                contextvars.copy_context().run, self._lexical_search, queries, n_results, tools
+            ) if mode == "hybrid" else None)
+            if query_embeddings is None:
+                query_embeddings = self.embed_queries(queries)
+            with span("vector_search"):
+                vector = self._vector_search(query_embeddings, n_results, tools)
+            if lexical is None:
+                return vector
+            return [self._fuse(dense, sparse, top_k) for dense, sparse in zip(vector, lexical.result())]
             
         except Exception as e:
             print(f"Search error: {e}")
+            return [[] for _ in queries]
+
+    def _vector_search(self, query_embeddings: List[Any], n_results: int,
+                       tools: Optional[List[str]]) -> List[List[Dict[str, Any]]]:
+        """Nearest chunks per query embedding, from the NumPy index if enabled, else Chroma"""
+        if self.dense is not None:
+            return self.dense.search(query_embeddings, n_results, tools)
+        results = self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=self._tool_filter(tools)
+        )
+        return [self._format_results(results, q) for q in range(len(query_embeddings))]
+
+    def _lexical_search(self, queries: List[str], top_k: int,
+                        tools: Optional[List[str]]) -> List[List[Tuple[str, float]]]:
+        with span("lexical_search"):
+            return [self.lexical.search(query, top_k, tools) for query in queries]
+
+    def _lexical_results(self, hits: List[Tuple[str, float]]) -> List[Dict[str, Any]]:
+        """Load BM25 hits from Chroma in rank order, skipping any no longer stored"""
+        if not hits:
             return []
+        rows = self.collection.get(ids=[chunk_id for chunk_id, _ in hits], include=["documents", "metadatas"])
+        found = {chunk_id: (doc, metadata) for chunk_id, doc, metadata
+                 in zip(rows["ids"], rows["documents"], rows["metadatas"])}
+        return [
+            {"content": found[chunk_id][0], "id": chunk_id, "distance": None,
+             "metadata": found[chunk_id][1] or {}, "bm25_score": score}
+            for chunk_id, score in hits if chunk_id in found
+        ]
+
+    def _fuse(self, dense: List[Dict[str, Any]], sparse: List[Tuple[str, float]],
+              top_k: int) -> List[Dict[str, Any]]:
+        """Reciprocal-rank fusion of vector results and BM25 hits"""
+        scores: Dict[str, float] = {}
+        for ranked_ids in ([result["id"] for result in dense], [chunk_id for chunk_id, _ in sparse]):
+            for rank, chunk_id in enumerate(ranked_ids):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+        best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+
+        by_id = {result["id"]: result for result in dense}
+        missing = [(chunk_id, score) for chunk_id, score in sparse if chunk_id in best and chunk_id not in by_id]
+        by_id.update((result["id"], result) for result in self._lexical_results(missing))
+        bm25 = dict(sparse)
+        fused = []
+        for chunk_id in best:
+            if chunk_id in by_id:
+                result = dict(by_id[chunk_id], rrf_score=scores[chunk_id])
+                if chunk_id in bm25:
+                    result["bm25_score"] = bm25[chunk_id]
+                fused.append(result)
+        return fused
+
+    @staticmethod
+    def _format_results(results: Dict[str, Any], q: int) -> List[Dict[str, Any]]:
+        """Flatten the q-th query's rows of a Chroma query result"""
+        search_results = []
+        if results["documents"] and len(results["documents"]) > q:
+            documents = results["documents"][q]
+            ids = results["ids"][q] if results["ids"] else []
+            distances = results["distances"][q] if results["distances"] else []
+            metadatas = results["metadatas"][q] if results.get("metadatas") else []
+            
+            for i, doc in enumerate(documents):
+                result = {
+                    "content": doc,
+                    "id": ids[i] if i < len(ids) else f"doc-{i}",
+                    "distance": distances[i] if i < len(distances) else 0,
+                    # tool, tool_name, title, url, section and hash, as stored at ingestion
+                    "metadata": (metadatas[i] if i < len(metadatas) else None) or {},
+                }
+                search_results.append(result)
+        
+        return search_results
+
+    def _lexical_path(self, collection_name: str) -> str:
+        return os.path.join(self.persist_dir, f"bm25_{collection_name}.sqlite3")
+
+    def _read_pointer(self) -> Dict[str, str]:
+        try:
+            with open(os.path.join(self.persist_dir, ACTIVE_COLLECTION_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _pointer_stat(self) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(self.persist_dir, ACTIVE_COLLECTION_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def corpus_version(self) -> Optional[Tuple[int, int]]:
+        """Changes whenever any process writes to the live corpus (one stat()).
+
+        Compare it to drop state derived from the corpus, such as cached
+        answers, when another uvicorn worker or manage.py changed it.
+        """
+        try:
+            stat = os.stat(os.path.join(self.persist_dir, CORPUS_VERSION_FILE))
+        except FileNotFoundError:
+            return None
+        # The file is replaced on every bump, so the inode changes even if the mtime does not
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _bump_corpus_version(self):
+        """Record a change to the live corpus; staging stores are not live until swap_in"""
+        if not self._follows_pointer:
+            return
+        path = os.path.join(self.persist_dir, CORPUS_VERSION_FILE)
+        partial = f"{path}.{os.getpid()}.tmp"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump({"collection": self.collection.name, "changed_at": time.time(), "pid": os.getpid()}, f)
+        stat = os.stat(partial)  # a rename keeps both, and another process may bump right after
+        os.replace(partial, path)
+        self._corpus_version = stat.st_ino, stat.st_mtime_ns
+
+    def _follow_pointer(self):
+        """Catch up with changes another process made to the live corpus.
+
+        Costs two stat() calls per search. With several app processes
+        (uvicorn workers) only the one running a rebuild calls swap_in; the
+        others notice the rewritten pointer file here. A reset_collection
+        elsewhere (e.g. `manage.py reset`) drops and recreates the collection
+        under the same name, which shows up as a new corpus version and a
+        new collection ID, so the stale handle is replaced too.
+        """
+        if not self._follows_pointer or (
+                self._pointer_stat() == self._pointer_mtime and self.corpus_version() == self._corpus_version):
+            return
+        with self._swap_lock:
+            mtime, version = self._pointer_stat(), self.corpus_version()
+            if mtime == self._pointer_mtime and version == self._corpus_version:
+                return
+            self._pointer_mtime, self._corpus_version = mtime, version
+            active = self._read_pointer().get("active", DEFAULT_COLLECTION)
+            collection = self._open_collection(active, create=False)
+            if active == self.collection.name and collection.id == self.collection.id:
+                return
+            dense = self._open_dense(collection)
+            self.collection, self.lexical, self.dense = collection, BM25Index(self._lexical_path(active)), dense
+        print(f"Following changes to collection {active}")
+
+    def _write_pointer(self, pointer: Dict[str, str]):
+        path = os.path.join(self.persist_dir, ACTIVE_COLLECTION_FILE)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(pointer, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _staging_manifest_path(self, collection_name: str) -> str:
+        return os.path.join(self.persist_dir, f"page_manifest-{collection_name}.json")
+
+    def _drop_collection(self, name: str):
+        """Delete a collection with its BM25 index files and staging manifest"""
+        try:
+            self.client.delete_collection(name)
+        except Exception as e:
+            print(f"Could not delete collection {name}: {e}")
+        lexical_path = self._lexical_path(name)
+        for path in (lexical_path, f"{lexical_path}-wal", f"{lexical_path}-shm", self._staging_manifest_path(name)):
+            if os.path.exists(path):
+                os.remove(path)
+        shutil.rmtree(self._dense_path(name), ignore_errors=True)
+
+    def staging_store(self) -> "EmbedStore":
+        """An empty store on a new collection beside this one, to build a replacement in.
+
+        Fill it with the usual ingest methods, then swap_in() it on success
+        or discard() it on failure. Leftovers of builds that never finished
+        (e.g. the process died) are dropped first.
+        """
+        pointer = self._read_pointer()
+        keep = {self.collection.name, pointer.get("previous")}
+        for collection in self.client.list_collections():
+            name = getattr(collection, "name", collection)
+            if name.startswith(f"{DEFAULT_COLLECTION}-") and name not in keep:
+                print(f"Dropping unfinished collection {name}")
+                self._drop_collection(name)
+        name = f"{DEFAULT_COLLECTION}-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        staging = EmbedStore(self.persist_dir, collection_name=name, client=self.client,
+                             embedding_provider=self.embedding_function)
+        # Its own manifest, which replaces the live one on swap_in
+        staging.manifest_path = self._staging_manifest_path(name)
+        return staging
+
+    def swap_in(self, staging: "EmbedStore"):
+        """Make a fully built staging store's collection the live one.
+
+        Searches move over with a single attribute assignment, so none of
+        them sees a partly built index, and the pointer file is replaced
+        atomically so a restart opens the new collection too. The replaced
+        collection is kept until the next swap, as searches that started
+        just before may still be reading it.
+        """
+        with self._swap_lock:
+            previous = self._read_pointer().get("previous")
+            replaced = self.collection.name
+            self._write_pointer({"active": staging.collection.name, "previous": replaced})
+            self._pointer_mtime = self._pointer_stat()
+            self.collection, self.lexical, self.dense = staging.collection, staging.lexical, staging.dense
+            self._bump_corpus_version()
+            self.embedding_mismatch = staging.embedding_mismatch
+            if os.path.exists(staging.manifest_path):
+                os.replace(staging.manifest_path, self.manifest_path)
+            if previous and previous not in (replaced, staging.collection.name):
+                self._drop_collection(previous)
+        print(f"Swapped in collection {staging.collection.name} ({staging.collection.count()} chunks), "
+              f"replacing {replaced}")
+
+    def discard(self, staging: "EmbedStore"):
+        """Throw away a staging store that will not be swapped in"""
+        if staging.collection.name != self.collection.name:
+            self._drop_collection(staging.collection.name)
+
+    def _delete_paged(self, where: Optional[Dict[str, Any]], batch_size: int) -> Tuple[int, set]:
+        """Delete matching chunks a page at a time; returns (count, source URLs)"""
+        deleted, urls = 0, set()
+        while True:
+            # Always the first page: everything before it has just been deleted
+            page = self.collection.get(where=where, limit=batch_size, include=["metadatas"])
+            if not page["ids"]:
+                return deleted, urls
+            self.collection.delete(ids=page["ids"])
+            self.lexical.delete(page["ids"])
+            urls.update((metadata or {}).get("url") for metadata in page["metadatas"])
+            deleted += len(page["ids"])
+
+    def delete_tool(self, tool: str, batch_size: int = 500) -> int:
+        """Delete every chunk of one tool and forget its pages, so the next ingest refetches them"""
+        deleted, urls = self._delete_paged({"tool": tool}, batch_size)
+        if deleted:
+            self._corpus_changed()
+        manifest = self.page_manifest()
+        for url in urls - {None}:
+            manifest.forget(url)
+        manifest.save()
+        print(f"Deleted {deleted} chunks for {tool}")
+        return deleted
+
+    def reset_collection(self):
+        """Empty the store by dropping and recreating the collection, whatever its size"""
+        with self._swap_lock:
+            name = self.collection.name
+            self.client.delete_collection(name)
+            self.collection = self._open_collection(name)
+            self.lexical.clear()
+            if self.dense is not None:
+                self.dense.clear()
+            self._remove_manifest()
+            self._bump_corpus_version()
+
+    def _remove_manifest(self):
+        # The manifest only says which pages are already embedded, so it goes with them
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
 
     def get_collection_info(self) -> Dict[str, Any]:
         """Get collection information"""
@@ -99,20 +1063,26 @@ class EmbedStore:
             count = self.collection.count()
             return {
                 "document_count": count,
+                "lexical_document_count": self.lexical.count(),
                 "collection_name": self.collection.name,
-                "embedding_type": "ChromaDB default",
+                "embedding_type": self.embedding_function.spec,
+                "search_backend": self.search_backend_info(),
                 "status": "ready" if count > 0 else "empty"
             }
         except Exception as e:
             return {"status": f"error: {e}"}
 
-    def clear_collection(self) -> bool:
-        """Clear all documents"""
+    def clear_collection(self, batch_size: int = 500) -> bool:
+        """Clear all documents, deleting them a page at a time (see reset_collection for large stores)"""
         try:
-            all_data = self.collection.get()
-            if all_data["ids"]:
-                self.collection.delete(ids=all_data["ids"])
-                print(f"Cleared {len(all_data['ids'])} documents")
+            deleted, _ = self._delete_paged(None, batch_size)
+            if deleted:
+                print(f"Cleared {deleted} documents")
+            self.lexical.clear()
+            if self.dense is not None:
+                self.dense.clear()
+            self._remove_manifest()
+            self._bump_corpus_version()
             return True
         except Exception as e:
             print(f"Error clearing: {e}")
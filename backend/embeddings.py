@@ -0,0 +1,176 @@
+import importlib.util
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, List, Optional
+
+import numpy as np
+
+# The model every store used before providers were configurable; collections without
+# a recorded model were embedded with it
+DEFAULT_PROVIDER = "onnx-minilm"
+
+
+class EmbeddingProvider(ABC):
+    """A local CPU embedding model, turning texts into unit-length float32 vectors.
+
+    `dimensions`, if set, keeps only the first that many components of every
+    vector (renormalized), for smaller vectors and index; it suits models
+    trained for truncation (Matryoshka) best. `spec` names the model and its
+    settings, and is recorded in each collection's metadata so a store never
+    mixes vectors from different models.
+    """
+    name = ""
+
+    def __init__(self, model: Optional[str] = None, dimensions: Optional[int] = None):
+        self.model = model
+        self.dimensions = dimensions
+        self._lock = threading.Lock()
+
+    @property
+    def spec(self) -> str:
+        spec = self.name
+        if self.model:
+            spec += f":{self.model}"
+        if self.dimensions:
+            spec += f"@{self.dimensions}"
+        return spec
+
+    @staticmethod
+    def available() -> bool:
+        return True
+
+    @abstractmethod
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Raw model output for a batch of texts, one row per text"""
+
+    def __call__(self, texts: List[str]) -> List[np.ndarray]:
+        vectors = np.asarray(self._embed(list(texts)), dtype=np.float32)
+        if self.dimensions and vectors.ndim == 2 and vectors.shape[1] > self.dimensions:
+            vectors = vectors[:, :self.dimensions]
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        return list(vectors)
+
+
+class OnnxMiniLMProvider(EmbeddingProvider):
+    """all-MiniLM-L6-v2 on onnxruntime, as shipped with Chroma (384 dimensions)"""
+    name = "onnx-minilm"
+
+    def __init__(self, model: Optional[str] = None, dimensions: Optional[int] = None):
+        super().__init__(None, dimensions)  # the model is fixed
+        self._function = None
+
+    def _load(self):
+        from chromadb.utils import embedding_functions
+        return embedding_functions.DefaultEmbeddingFunction()
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        if self._function is None:
+            with self._lock:
+                if self._function is None:
+                    self._function = self._load()
+        return np.asarray(self._function(texts))
+
+
+class QuantizedMiniLMProvider(OnnxMiniLMProvider):
+    """The same MiniLM with its weights dynamically quantized to int8.
+
+    About a quarter of the model's size and faster on most CPUs, for a small
+    loss in accuracy. The quantized copy is written next to Chroma's model
+    the first time it is needed (requires the `onnx` package).
+    """
+    name = "onnx-minilm-int8"
+
+    @staticmethod
+    def available() -> bool:
+        return importlib.util.find_spec("onnx") is not None
+
+    def _load(self):
+        from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+
+        class QuantizedMiniLM(ONNXMiniLM_L6_V2):
+            @property
+            def model(self) -> Any:
+                cached = self.__dict__.get("_quantized_session")
+                if cached is None:
+                    cached = self.__dict__["_quantized_session"] = _quantized_session(self)
+                return cached
+
+        return QuantizedMiniLM()
+
+
+def _quantized_session(function) -> Any:
+    """onnxruntime session over an int8 copy of the function's model, creating it if needed"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    function._download_model_if_not_exists()
+    folder = os.path.join(function.DOWNLOAD_PATH, function.EXTRACTED_FOLDER_NAME)
+    quantized = os.path.join(folder, "model_int8.onnx")
+    if not os.path.exists(quantized):
+        # Per-process temp name, so concurrent workers never read a half-written model
+        partial = f"{quantized}.{os.getpid()}.tmp"
+        quantize_dynamic(os.path.join(folder, "model.onnx"), partial, weight_type=QuantType.QInt8)
+        os.replace(partial, quantized)
+
+    options = function.ort.SessionOptions()
+    options.log_severity_level = 3
+    options.graph_optimization_level = function.ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return function.ort.InferenceSession(quantized, providers=["CPUExecutionProvider"], sess_options=options)
+
+
+class SentenceTransformersProvider(EmbeddingProvider):
+    """Any sentence-transformers model by name, on CPU (requires `sentence-transformers`)"""
+    name = "sentence-transformers"
+    default_model = "sentence-transformers/all-MiniLM-L6-v2"
+
+    def __init__(self, model: Optional[str] = None, dimensions: Optional[int] = None):
+        super().__init__(model or self.default_model, dimensions)
+        self._model = None
+
+    @staticmethod
+    def available() -> bool:
+        return importlib.util.find_spec("sentence_transformers") is not None
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model, device="cpu")
+        return self._model.encode(texts, batch_size=32, normalize_embeddings=True,
+                                  convert_to_numpy=True, show_progress_bar=False)
+
+
+PROVIDERS = {
+    OnnxMiniLMProvider.name: OnnxMiniLMProvider,
+    QuantizedMiniLMProvider.name: QuantizedMiniLMProvider,
+    SentenceTransformersProvider.name: SentenceTransformersProvider,
+}
+
+
+def get_provider(name: Optional[str] = None, model: Optional[str] = None,
+                 dimensions: Optional[int] = None) -> EmbeddingProvider:
+    """Embedding provider by name, defaulting to the EMBEDDING_PROVIDER, EMBEDDING_MODEL
+    and EMBEDDING_DIMENSIONS environment variables.
+
+    Models are loaded on first use, not here.
+    """
+    name = (name or os.getenv("EMBEDDING_PROVIDER", DEFAULT_PROVIDER)).lower()
+    model = model or os.getenv("EMBEDDING_MODEL") or None
+    if dimensions is None and os.getenv("EMBEDDING_DIMENSIONS"):
+        dimensions = int(os.environ["EMBEDDING_DIMENSIONS"])
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown embedding provider '{name}'. Choose from: {', '.join(PROVIDERS)}")
+    if not PROVIDERS[name].available():
+        raise ValueError(f"Embedding provider '{name}' is not installed")
+    return PROVIDERS[name](model, dimensions)
+
+
+def provider_from_spec(spec: str) -> EmbeddingProvider:
+    """Rebuild a provider from its `spec`, e.g. in an embedding worker process"""
+    rest, _, dimensions = spec.partition("@")
+    name, _, model = rest.partition(":")
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown embedding provider '{name}'. Choose from: {', '.join(PROVIDERS)}")
+    return PROVIDERS[name](model or None, int(dimensions) if dimensions else None)
@@ -0,0 +1,182 @@
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+from chunking import HEADING_MARKER
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # optional, fastest backend
+    LexborHTMLParser = None
+
+try:
+    import cssselect  # noqa: F401 - lxml needs it for CSS selectors
+    import lxml.html
+except ImportError:  # optional
+    lxml = None
+
+HEADING_TAGS = ["h1", "h2", "h3", "h4"]
+
+# Used when a tool's content selector matches nothing on a page
+FALLBACK_CONTENT = "article, main, .content, .documentation"
+
+# Never part of the page text
+DROP_TAGS = "script, style, noscript, template"
+
+
+@dataclass
+class ExtractedPage:
+    """What the scraper needs from one HTML page"""
+    links: List[str] = field(default_factory=list)  # raw hrefs, in page order
+    blocks: List[Tuple[str, str]] = field(default_factory=list)  # (title, text with heading markers)
+
+
+# lxml rejects the NUL bytes in HEADING_MARKER, so it marks headings with this instead
+LXML_HEADING_MARKER = "\ue000"
+
+
+def mark_heading(text: str, marker: str = HEADING_MARKER) -> str:
+    """Heading text as it appears in the extracted text, for the chunker"""
+    return f"\n{marker}{' '.join(text.split())}\n"
+
+
+class Extractor(ABC):
+    """Turns raw HTML into links and content blocks using a tool's selectors.
+
+    Content elements nested inside another match (e.g. an `article` inside
+    `main` when the selector is "article, main") are dropped, so their text
+    is only extracted once, as part of the outermost match.
+    """
+    name = ""
+
+    @abstractmethod
+    def extract(self, html: bytes, selectors: Dict[str, str]) -> ExtractedPage:
+        """Parse one page's HTML"""
+
+
+class SoupExtractor(Extractor):
+    """BeautifulSoup with the pure-Python html.parser; always available"""
+    name = "bs4"
+
+    def extract(self, html: bytes, selectors: Dict[str, str]) -> ExtractedPage:
+        soup = BeautifulSoup(html, 'html.parser')
+        page = ExtractedPage(links=[a['href'] for a in soup.find_all('a', href=True)])
+
+        for element in soup.select(DROP_TAGS):
+            element.decompose()
+        if 'exclude' in selectors:
+            for element in soup.select(selectors['exclude']):
+                element.decompose()
+
+        matches = soup.select(selectors['content']) or soup.select(FALLBACK_CONTENT)
+        matched = {id(element) for element in matches}
+        for element in matches:
+            if any(id(parent) in matched for parent in element.parents):
+                continue
+            title_elem = element.select_one(selectors.get('title', 'h1, h2, h3'))
+            title = title_elem.get_text().strip() if title_elem else ""
+            for heading in element.find_all(HEADING_TAGS):
+                heading.replace_with(mark_heading(heading.get_text(' ', strip=True)))
+            page.blocks.append((title, element.get_text().strip()))
+        return page
+
+
+class LxmlExtractor(Extractor):
+    """lxml's C HTML parser with cssselect-compiled XPath selectors"""
+    name = "lxml"
+
+    def extract(self, html: bytes, selectors: Dict[str, str]) -> ExtractedPage:
+        root = lxml.html.fromstring(html)
+        page = ExtractedPage(links=[a.get('href') for a in root.iter('a') if a.get('href')])
+
+        for element in root.cssselect(DROP_TAGS):
+            element.drop_tree()
+        if 'exclude' in selectors:
+            for element in root.cssselect(selectors['exclude']):
+                element.drop_tree()
+
+        matches = root.cssselect(selectors['content']) or root.cssselect(FALLBACK_CONTENT)
+        matched = set(matches)
+        for element in matches:
+            if any(parent in matched for parent in element.iterancestors()):
+                continue
+            title_elems = element.cssselect(selectors.get('title', 'h1, h2, h3'))
+            title = title_elems[0].text_content().strip() if title_elems else ""
+            for heading in element.iter(*HEADING_TAGS):
+                text = mark_heading(heading.text_content(), LXML_HEADING_MARKER)
+                for child in list(heading):
+                    heading.remove(child)
+                heading.text = text
+            page.blocks.append((title, element.text_content().replace(LXML_HEADING_MARKER, HEADING_MARKER).strip()))
+        return page
+
+
+class SelectolaxExtractor(Extractor):
+    """selectolax's Lexbor engine: C parser and C CSS matching"""
+    name = "selectolax"
+
+    def extract(self, html: bytes, selectors: Dict[str, str]) -> ExtractedPage:
+        tree = LexborHTMLParser(html)
+        page = ExtractedPage(links=[a.attributes['href'] for a in tree.css('a[href]') if a.attributes.get('href')])
+
+        # Only outermost matches: decomposing a node also frees everything inside it
+        for element in self._outermost(tree.css(DROP_TAGS)):
+            element.decompose()
+        if 'exclude' in selectors:
+            for element in self._outermost(tree.css(selectors['exclude'])):
+                element.decompose()
+
+        for element in self._outermost(tree.css(selectors['content']) or tree.css(FALLBACK_CONTENT)):
+            title_elem = element.css_first(selectors.get('title', 'h1, h2, h3'))
+            title = title_elem.text().strip() if title_elem else ""
+            for heading in element.css(", ".join(HEADING_TAGS)):
+                heading.replace_with(mark_heading(heading.text(separator=' ', strip=True)))
+            page.blocks.append((title, element.text().strip()))
+        return page
+
+    @staticmethod
+    def _outermost(nodes) -> list:
+        matched = {node.mem_id for node in nodes}
+        outermost = []
+        for node in nodes:
+            parent = node.parent
+            while parent is not None and parent.mem_id not in matched:
+                parent = parent.parent
+            if parent is None:
+                outermost.append(node)
+        return outermost
+
+
+EXTRACTORS = {
+    SelectolaxExtractor.name: SelectolaxExtractor,
+    LxmlExtractor.name: LxmlExtractor,
+    SoupExtractor.name: SoupExtractor,
+}
+
+
+def available_extractors() -> List[str]:
+    """Installed backends, fastest first"""
+    names = []
+    if LexborHTMLParser is not None:
+        names.append(SelectolaxExtractor.name)
+    if lxml is not None:
+        names.append(LxmlExtractor.name)
+    names.append(SoupExtractor.name)
+    return names
+
+
+def get_extractor(name: Optional[str] = None) -> Extractor:
+    """Extraction backend by name; "auto" (the default) picks the fastest installed.
+
+    The name defaults to the HTML_EXTRACTOR environment variable.
+    """
+    name = (name or os.getenv("HTML_EXTRACTOR", "auto")).lower()
+    if name == "auto":
+        name = available_extractors()[0]
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown HTML extractor '{name}'. Choose from: auto, {', '.join(EXTRACTORS)}")
+    if name not in available_extractors():
+        raise ValueError(f"HTML extractor '{name}' is not installed")
+    return EXTRACTORS[name]()
@@ -0,0 +1,335 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import IO, Callable, Dict, List, Optional
+
+from metrics import log_event, record_stage
+
+try:
+    import fcntl
+except ImportError:  # Windows: tool locks and job state then only hold within one process
+    fcntl = None
+
+FINISHED = ("completed", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Raised inside a job runner once the job has been cancelled"""
+
+
+class JobConflictError(Exception):
+    """Raised when a job is submitted for a tool that already has one running"""
+
+    def __init__(self, tool: str, job_id: str):
+        super().__init__(f"Tool '{tool}' is already being ingested by job {job_id}")
+        self.tool = tool
+        self.job_id = job_id
+
+
+@dataclass
+class ToolProgress:
+    status: str = "pending"  # pending, scraping, embedding, done
+    pages_total: int = 0
+    pages_fetched: int = 0
+    chunks_scraped: int = 0
+    chunks_embedded: int = 0
+
+
+@dataclass
+class IngestJob:
+    """One background ingestion run over a set of tools"""
+    tools: List[str]
+    force: bool = False
+    rebuild: bool = False  # build a new collection and swap it in, instead of updating in place
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    status: str = "queued"  # queued, running, completed, failed, cancelled
+    message: str = ""
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: Dict[str, ToolProgress] = field(default_factory=dict)
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    # Progress is updated from fetch workers and the store writer, and read by heartbeat saves
+    _progress_lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.progress = {tool: ToolProgress() for tool in self.tools}
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def page_queued(self, tool: str, url: str):
+        """Scraper callback: the crawler found another page of `tool` to fetch"""
+        with self._progress_lock:
+            self.progress[tool].pages_total += 1
+
+    def page_done(self, tool: str, url: str, chunks: int):
+        """Scraper callback: one page of `tool` has been processed"""
+        with self._progress_lock:
+            progress = self.progress[tool]
+            progress.pages_fetched += 1
+            progress.chunks_scraped += chunks
+            if progress.pages_fetched == progress.pages_total:
+                progress.status = "embedding"
+
+    def chunks_written(self, tools: List[str]):
+        """Store callback: one chunk of each listed tool was written"""
+        with self._progress_lock:
+            for tool in tools:
+                self.progress[tool].chunks_embedded += 1
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or time.time()
+        with self._progress_lock:
+            progress = {tool: dict(vars(p)) for tool, p in self.progress.items()}
+        return {
+            "id": self.id,
+            "tools": self.tools,
+            "force": self.force,
+            "rebuild": self.rebuild,
+            "status": self.status,
+            "message": self.message,
+            "error": self.error,
+            "created_at": self.created_at,
+            "elapsed_seconds": round(end - self.started_at, 1) if self.started_at else 0.0,
+            "progress": progress,
+            "totals": {
+                "pages_fetched": sum(p["pages_fetched"] for p in progress.values()),
+                "chunks_embedded": sum(p["chunks_embedded"] for p in progress.values()),
+            },
+        }
+
+
+class JobManager:
+    """Runs ingestion jobs on background threads, one job per tool at a time.
+
+    With a `state_dir` shared by every app process (uvicorn workers), the
+    per-tool lock is also a file lock there, and each job's progress is
+    saved there as JSON every `heartbeat` seconds. Any worker can then
+    report on or cancel a job another worker runs. A file lock is released
+    when the process holding it dies, and a job whose state stops being
+    saved is reported as failed.
+    """
+
+    def __init__(self, runner: Callable[[IngestJob], None], max_history: int = 50,
+                 state_dir: Optional[str] = None, heartbeat: float = 1.0):
+        self.runner = runner
+        self.max_history = max_history
+        self.state_dir = state_dir
+        self.heartbeat = heartbeat
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._active_tools: Dict[str, str] = {}
+        self._tool_locks: Dict[str, List[IO]] = {}  # job ID -> its tools' open lock files
+        self._lock = threading.Lock()
+
+    def submit(self, tools: List[str], force: bool = False, rebuild: bool = False) -> IngestJob:
+        with self._lock:
+            for tool in tools:
+                if tool in self._active_tools:
+                    raise JobConflictError(tool, self._active_tools[tool])
+            job = IngestJob(tools=list(tools), force=force, rebuild=rebuild)
+            self._tool_locks[job.id] = self._lock_tools(job)
+            for tool in tools:
+                self._active_tools[tool] = job.id
+            self._jobs[job.id] = job
+            self._trim_history()
+        self._save(job)
+
+        threading.Thread(target=self._run, args=(job,), name=f"ingest-{job.id}", daemon=True).start()
+        return job
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.state_dir, name)
+
+    def _lock_tools(self, job: IngestJob) -> List[IO]:
+        """Take the file lock of every tool of `job`, or of none of them"""
+        if not self.state_dir or fcntl is None:
+            return []
+        os.makedirs(self._path("locks"), exist_ok=True)
+        held = []
+        try:
+            for tool in job.tools:
+                lock_file = open(self._path(os.path.join("locks", f"{tool}.lock")), "a+", encoding="utf-8")
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    lock_file.seek(0)
+                    owner = lock_file.read().strip()
+                    lock_file.close()
+                    raise JobConflictError(tool, owner)
+                held.append(lock_file)
+                lock_file.seek(0)
+                lock_file.truncate()
+                lock_file.write(job.id)
+                lock_file.flush()
+        except BaseException:
+            self._unlock(held)
+            raise
+        return held
+
+    @staticmethod
+    def _unlock(lock_files: List[IO]):
+        for lock_file in lock_files:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def _save(self, job: IngestJob):
+        """Write the job's state where the other processes read it"""
+        if not self.state_dir:
+            return
+        os.makedirs(self.state_dir, exist_ok=True)
+        path = self._path(f"{job.id}.json")
+        # The heartbeat thread and the job thread may both be saving; each writes its own file
+        tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(job.to_dict(), f)
+        os.replace(tmp, path)
+
+    def _load(self, job_id: str) -> Optional[dict]:
+        """State of a job run by another process, from its last save"""
+        if not self.state_dir or not job_id.isalnum():
+            return None
+        path = self._path(f"{job_id}.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            saved_at = os.stat(path).st_mtime
+        except (FileNotFoundError, ValueError):
+            return None
+        if state["status"] not in FINISHED and time.time() - saved_at > 10 * self.heartbeat:
+            # Its process stopped saving, so it died mid-job (its tool locks went with it)
+            state.update(status="failed", error="The worker running this job stopped")
+        return state
+
+    def _save_while_running(self, job: IngestJob, done: threading.Event):
+        """Save progress periodically and pick up cancellations requested through another process"""
+        while not done.wait(self.heartbeat):
+            if os.path.exists(self._path(f"{job.id}.cancel")):
+                job.cancel_event.set()
+            self._save(job)
+
+    def _run(self, job: IngestJob):
+        job.status = "running"
+        job.started_at = time.time()
+        done = threading.Event()
+        heartbeat = None
+        if self.state_dir:
+            heartbeat = threading.Thread(target=self._save_while_running, args=(job, done),
+                                         name=f"ingest-{job.id}-state", daemon=True)
+            heartbeat.start()
+        status = "failed"
+        try:
+            self.runner(job)
+            status = "completed"
+        except JobCancelled:
+            status = "cancelled"
+            job.message = job.message or "Cancelled"
+        except Exception as e:
+            log_event("ingest_failed", logging.ERROR, exc_info=True, job_id=job.id, error=str(e))
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            record_stage("ingest_job", job.finished_at - job.started_at)
+            log_event("ingest_finished", job_id=job.id, tools=job.tools, status=status,
+                      seconds=round(job.finished_at - job.started_at, 2), message=job.message)
+            done.set()
+            if heartbeat is not None:
+                # A heartbeat save still in progress must not land after the final state
+                heartbeat.join()
+            if self.state_dir and os.path.exists(self._path(f"{job.id}.cancel")):
+                os.remove(self._path(f"{job.id}.cancel"))
+            # Free the tools before the job reads as finished, so a resubmit right after succeeds
+            with self._lock:
+                for tool in job.tools:
+                    if self._active_tools.get(tool) == job.id:
+                        del self._active_tools[tool]
+                self._unlock(self._tool_locks.pop(job.id, []))
+            job.status = status
+            self._save(job)
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_history)]:
+            del self._jobs[job_id]
+        if not self.state_dir or not os.path.isdir(self.state_dir):
+            return
+        # Running jobs save every heartbeat, so the oldest files are finished (or abandoned) ones
+        saved = sorted((entry for entry in os.scandir(self.state_dir) if entry.name.endswith(".json")),
+                       key=lambda entry: entry.stat().st_mtime)
+        for entry in saved[:max(0, len(saved) - self.max_history)]:
+            job_id = entry.name[:-len(".json")]
+            if job_id not in self._jobs:
+                for name in (entry.name, f"{job_id}.cancel"):
+                    if os.path.exists(self._path(name)):
+                        os.remove(self._path(name))
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        """A job run by this process"""
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[IngestJob]:
+        return list(self._jobs.values())
+
+    def describe(self, job_id: str) -> Optional[dict]:
+        """State of a job run by any process sharing `state_dir`"""
+        job = self._jobs.get(job_id)
+        return job.to_dict() if job else self._load(job_id)
+
+    def describe_all(self) -> List[dict]:
+        """Recent jobs of every process sharing `state_dir`, oldest first"""
+        states = {job_id: job.to_dict() for job_id, job in self._jobs.items()}
+        if self.state_dir and os.path.isdir(self.state_dir):
+            for name in os.listdir(self.state_dir):
+                job_id = name[:-len(".json")]
+                if name.endswith(".json") and job_id not in states:
+                    state = self._load(job_id)
+                    if state:
+                        states[job_id] = state
+        return sorted(states.values(), key=lambda state: state["created_at"])
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """Ask a job to stop; it finishes its current page or batch first.
+
+        A job of another process is asked through a marker file it checks
+        every heartbeat.
+        """
+        job = self._jobs.get(job_id)
+        if job:
+            if not job.finished:
+                job.cancel_event.set()
+            return job.to_dict()
+        state = self._load(job_id)
+        if state and state["status"] not in FINISHED:
+            open(self._path(f"{job_id}.cancel"), "w").close()
+        return state
+
+    def active(self) -> Dict[str, str]:
+        """Tool -> ID of the job currently ingesting it, in any process sharing `state_dir`"""
+        with self._lock:
+            active = dict(self._active_tools)
+        locks = self._path("locks") if self.state_dir else None
+        if fcntl is None or not locks or not os.path.isdir(locks):
+            return active
+        for name in os.listdir(locks):
+            tool = name[:-len(".lock")]
+            if tool in active or not name.endswith(".lock"):
+                continue
+            with open(os.path.join(locks, name), "r", encoding="utf-8") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    active[tool] = lock_file.read().strip()  # held by a running job
+                    continue
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return active
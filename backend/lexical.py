@@ -0,0 +1,146 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Identifiers are kept whole (payment_intent, useEffect, backdrop-blur, --force)
+# and also split into their parts, so both exact and partial matches score
+IDENTIFIER_PATTERN = re.compile(r"-{0,2}[A-Za-z0-9][A-Za-z0-9_.\-]*")
+PART_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i if in into is it its of on or "
+    "so that the their then there these this to was what when where which who why will with "
+    "you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased index terms: whole identifiers plus their word parts"""
+    terms = []
+    for match in IDENTIFIER_PATTERN.finditer(text):
+        identifier = match.group().rstrip(".-")
+        whole = identifier.lower()
+        if whole not in STOPWORDS:
+            terms.append(whole)
+        for part in PART_PATTERN.findall(identifier):
+            part = part.lower()
+            if part != whole and part not in STOPWORDS:
+                terms.append(part)
+    return terms
+
+
+class BM25Index:
+    """On-disk inverted index over the stored chunks, scored with BM25.
+
+    Lives in a SQLite file next to the Chroma collection and is updated by
+    EmbedStore whenever chunks are written or deleted. Each thread gets its
+    own connection; WAL mode lets searches run while an ingest writes.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS docs (id TEXT PRIMARY KEY, tool TEXT, length INTEGER);
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT, doc_id TEXT, tf INTEGER, PRIMARY KEY (term, doc_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+                CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value INTEGER);
+                INSERT OR IGNORE INTO stats VALUES ('docs', 0), ('total_length', 0);
+            """)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _delete(self, conn: sqlite3.Connection, ids: List[str]):
+        for i in range(0, len(ids), 500):
+            batch = ids[i:i + 500]
+            marks = ",".join("?" * len(batch))
+            count, length = conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs WHERE id IN ({marks})", batch
+            ).fetchone()
+            conn.execute(f"DELETE FROM postings WHERE doc_id IN ({marks})", batch)
+            conn.execute(f"DELETE FROM docs WHERE id IN ({marks})", batch)
+            conn.execute("UPDATE stats SET value = value - ? WHERE key = 'docs'", (count,))
+            conn.execute("UPDATE stats SET value = value - ? WHERE key = 'total_length'", (length,))
+
+    def add(self, ids: List[str], texts: List[str], metadatas: Iterable[Optional[dict]]):
+        """Index chunks, replacing any already indexed under the same IDs"""
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                self._delete(conn, ids)
+                total_length = 0
+                for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                    terms = tokenize(text)
+                    total_length += len(terms)
+                    conn.execute("INSERT INTO docs VALUES (?, ?, ?)",
+                                 (chunk_id, (metadata or {}).get("tool", ""), len(terms)))
+                    conn.executemany("INSERT INTO postings VALUES (?, ?, ?)",
+                                     [(term, chunk_id, tf) for term, tf in Counter(terms).items()])
+                conn.execute("UPDATE stats SET value = value + ? WHERE key = 'docs'", (len(ids),))
+                conn.execute("UPDATE stats SET value = value + ? WHERE key = 'total_length'", (total_length,))
+
+    def delete(self, ids: List[str]):
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                self._delete(conn, ids)
+
+    def clear(self):
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM postings")
+                conn.execute("DELETE FROM docs")
+                conn.execute("UPDATE stats SET value = 0")
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT value FROM stats WHERE key = 'docs'").fetchone()[0]
+
+    def search(self, query: str, top_k: int = 5, tools: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """(chunk ID, BM25 score) pairs for the best-matching chunks"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        conn = self._connection()
+        stats = dict(conn.execute("SELECT key, value FROM stats").fetchall())
+        n_docs = stats.get("docs", 0)
+        if not n_docs:
+            return []
+        avg_length = stats["total_length"] / n_docs or 1.0
+
+        term_marks = ",".join("?" * len(terms))
+        doc_freq = dict(conn.execute(
+            f"SELECT term, COUNT(*) FROM postings WHERE term IN ({term_marks}) GROUP BY term", terms
+        ).fetchall())
+        sql = (f"SELECT p.term, p.doc_id, p.tf, d.length FROM postings p JOIN docs d ON d.id = p.doc_id "
+               f"WHERE p.term IN ({term_marks})")
+        params = list(terms)
+        if tools:
+            sql += f" AND d.tool IN ({','.join('?' * len(tools))})"
+            params += list(tools)
+
+        scores: Dict[str, float] = {}
+        for term, doc_id, tf, length in conn.execute(sql, params):
+            df = doc_freq[term]
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_length))
+            scores[doc_id] = scores.get(doc_id, 0.0) + idf * norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
@@ -1,20 +1,96 @@
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
 from dotenv import load_dotenv
+import asyncio
+import contextvars
+import json
+import logging
 import os
-from openai import OpenAI
-from embed_store import EmbedStore
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from answer_cache import AnswerCache
+from concurrency import RequestLimiter, QueueFullError
+from context import assemble_context, count_message_tokens
+from embed_store import SEARCH_MODES, EmbeddingMismatchError, EmbedStore
+from jobs import IngestJob, JobConflictError, JobManager
+from metrics import (ANSWERS, HTTP_REQUEST_SECONDS, HTTP_REQUESTS, PROMPT_TOKENS, REGISTRY, Trace,
+                     annotate, log_event, record_stage, span)
 from tools import get_enabled_tools, get_tool_config
 from typing import List, Optional
-import uvicorn
+from warmup import Warmup
 
 load_dotenv()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warmup.start()
+    yield
+    await warmup.stop()
+    if client is not None:
+        await client.close()
+    search_executor.shutdown(wait=False)
 
-client = OpenAI(
-    api_key=os.getenv("DEEPSEEK_API_KEY"),
-    base_url="https://api.deepseek.com"
+app = FastAPI(lifespan=lifespan)
+
+# Async DeepSeek client on a pooled HTTP connection so /ask never blocks the event loop
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+
+# Created on the first question, so starting the app does not import openai
+client = None
+
+def llm_client():
+    global client
+    if client is None:
+        import httpx
+        from openai import AsyncOpenAI
+
+        client = AsyncOpenAI(
+            api_key=os.getenv("DEEPSEEK_API_KEY"),
+            base_url=os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com"),
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                ),
+                timeout=httpx.Timeout(120.0, connect=10.0),
+            ),
+        )
+    return client
+
+# ChromaDB queries are synchronous, so they run on a small dedicated pool
+search_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SEARCH_WORKERS", "4")),
+    thread_name_prefix="vector-search",
+)
+
+# Repeated questions are answered from memory; the semantic layer is opt-in
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+    similarity_threshold=float(os.environ["ANSWER_CACHE_SIMILARITY"]) if os.getenv("ANSWER_CACHE_SIMILARITY") else None,
+)
+
+# Retrieval used when /ask does not pass `mode`: hybrid, vector or lexical
+DEFAULT_SEARCH_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+
+# Context assembly: candidates fetched per question, and the prompt budget they are packed into
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "20"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.8"))
+
+# /ask/batch: most questions per request, and LLM calls in flight per batch
+ASK_BATCH_MAX_QUESTIONS = int(os.getenv("ASK_BATCH_MAX_QUESTIONS", "500"))
+ASK_BATCH_CONCURRENCY = int(os.getenv("ASK_BATCH_CONCURRENCY", "8"))
+
+# Cap concurrent /ask work; extra requests queue briefly, then get a 503
+ask_limiter = RequestLimiter(
+    max_concurrent=int(os.getenv("ASK_MAX_CONCURRENCY", "8")),
+    max_queue=int(os.getenv("ASK_MAX_QUEUE", "32")),
+    queue_timeout=float(os.getenv("ASK_QUEUE_TIMEOUT", "30")),
+    name="ask",
 )
 
 # CORS for production + development
@@ -32,7 +108,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-embed_store = EmbedStore.get_instance()
+# The store is opened (and the embedding model loaded) after startup rather than on import:
+# WARMUP=background warms up while serving, blocking before serving, off on first use
+warmup = Warmup(EmbedStore.get_instance, search_executor, mode=os.getenv("WARMUP", "background"))
+
+@app.middleware("http")
+async def record_http_metrics(request: Request, call_next):
+    """Count requests and time them per route (streamed responses until their headers are sent)"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        route = getattr(route, "path", "unmatched")
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method, route=route)
+        HTTP_REQUESTS.inc(method=request.method, route=route, status=status)
 
 @app.get("/")
 async def root():
@@ -52,45 +145,336 @@ async def get_available_tools():
         for name, config in tools.items()
     }}
 
+NO_CONTEXT_ANSWER = "I don't have enough context to answer that question. Please make sure the knowledge base is initialized with '/initialize' or '/initialize/{tool_name}'."
+
+SYSTEM_PROMPT = "You are an AI assistant specializing in developer tools and frameworks."
+
+async def read_body(request: Request) -> dict:
+    """The request's JSON body, which must be an object"""
+    try:
+        data = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body must be valid JSON")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="Request body must be a JSON object")
+    return data
+
+async def read_question(request: Request):
+    """Parse the question, optional tool filter and retrieval mode from an ask request body"""
+    data = await read_body(request)
+    question = data.get("question", "")
+    # Validated before anything else touches it, so a non-string is a 400 rather than a 500
+    if not isinstance(question, str) or not question.strip():
+        raise HTTPException(status_code=400, detail="Question must be a non-empty string")
+    tool_filter = parse_tool_filter(data.get("tools", None))  # Optional: filter by specific tools
+    mode = parse_search_mode(data.get("mode", None))
+    annotate(question=question[:200], tools=tool_filter, mode=mode)
+    return question, tool_filter, mode
+
+def parse_search_mode(mode) -> str:
+    """Validate the optional `mode` field: hybrid, vector or lexical"""
+    if mode is None:
+        return DEFAULT_SEARCH_MODE
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"'mode' must be one of: {', '.join(SEARCH_MODES)}")
+    return mode
+
+def parse_tool_filter(tools) -> Optional[List[str]]:
+    """Validate the optional `tools` field: a tool key or a list of tool keys"""
+    if not tools:
+        return None
+    if isinstance(tools, str):
+        tools = [tools]
+    if not isinstance(tools, list) or not all(isinstance(tool, str) for tool in tools):
+        raise HTTPException(status_code=400, detail="'tools' must be a tool name or a list of tool names")
+
+    available_tools = get_enabled_tools()
+    tool_keys = sorted({tool.lower() for tool in tools})
+    unknown = [tool for tool in tool_keys if tool not in available_tools]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown tools: {', '.join(unknown)}. Available tools: {', '.join(available_tools)}"
+        )
+    return tool_keys
+
+def count_answer(source: str):
+    """Record where an answer came from: cache, similar (cache), llm or no_context"""
+    ANSWERS.inc(source=source)
+    annotate(answer=source)
+
+def sync_answer_cache():
+    """Drop cached answers once any process changed the corpus, not only this worker's own jobs"""
+    store = warmup.loaded_store
+    if store is not None:
+        answer_cache.sync(store.corpus_version())
+
+async def run_search(fn, *args):
+    """Run a blocking store call on the search pool, keeping the request's trace"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(search_executor, contextvars.copy_context().run, fn, *args)
+
 @app.post("/ask")
 async def ask(request: Request):
+    trace = Trace("ask").activate()
     try:
-        print("1. Starting ask endpoint")
-        data = await request.json()
-        question = data.get("question", "")
-        tool_filter = data.get("tools", None)  # Optional: filter by specific tools
-        print(f"2. Got question: {question}")
-        
-        if not question.strip():
-            raise HTTPException(status_code=400, detail="Question cannot be empty")
-
-        print("3. About to search embed_store")
-        # Retrieve relevant docs from vector store - get more results for source tracking
-        search_results = embed_store.search_with_metadata(question, top_k=5)
-        print(f"4. Got {len(search_results)} context chunks")
-        
-        if not search_results:
-            return {
-                "answer": "I don't have enough context to answer that question. Please make sure the knowledge base is initialized with '/initialize' or '/initialize/{tool_name}'.",
-                "sources": []
-            }
-        
-        print("5. Building context and extracting sources")
-        context_chunks = []
+        with span("parse"):
+            question, tool_filter, mode = await read_question(request)
+
+        # Exact cache hits skip the queue entirely
+        sync_answer_cache()
+        cached = answer_cache.get(question, tool_filter, mode)
+        if cached:
+            count_answer("cache")
+            trace.finish()
+            return cached
+
+        with span("queue_wait"):
+            await ask_limiter.acquire()
+        try:
+            result = await answer_question(question, tool_filter, mode)
+        finally:
+            ask_limiter.release()
+        trace.finish()
+        return result
+
+    except QueueFullError as e:
+        trace.finish("rejected", reason=str(e))
+        raise HTTPException(status_code=503, detail="Server is busy, please retry shortly")
+    except EmbeddingMismatchError as e:
+        # The knowledge base was built with another embedding model than the one configured
+        trace.finish("error", error=str(e))
+        raise HTTPException(status_code=409, detail=str(e))
+    except HTTPException as e:
+        trace.finish("invalid", detail=e.detail)
+        raise
+    except Exception as e:
+        trace.finish("error", error=str(e))
+        log_event("ask_failed", logging.ERROR, exc_info=True, error=str(e))
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.post("/ask/stream")
+async def ask_stream(request: Request):
+    """Same as /ask, but streams the answer as Server-Sent Events.
+
+    Emits one `sources` event, then a `token` event per completion delta,
+    and finally `done` (or `error` if something fails mid-stream).
+    """
+    trace = Trace("ask_stream").activate()
+    try:
+        with span("parse"):
+            question, tool_filter, mode = await read_question(request)
+
+        sync_answer_cache()
+        cached = answer_cache.get(question, tool_filter, mode)
+        if cached:
+            count_answer("cache")
+            trace.finish()
+            return StreamingResponse(cached_events(cached), media_type="text/event-stream",
+                                     headers={"Cache-Control": "no-cache"})
+
+        # Take the slot before responding so a saturated server still answers 503
+        with span("queue_wait"):
+            await ask_limiter.acquire()
+    except QueueFullError as e:
+        trace.finish("rejected", reason=str(e))
+        raise HTTPException(status_code=503, detail="Server is busy, please retry shortly")
+    except HTTPException as e:
+        trace.finish("invalid", detail=e.detail)
+        raise
+
+    released = False
+
+    def release_slot():
+        # Called from the generator and as a background task; only the first call counts,
+        # the second covers clients that disconnect before the stream starts
+        nonlocal released
+        if not released:
+            released = True
+            ask_limiter.release()
+            trace.finish()
+
+    return StreamingResponse(
+        stream_answer(question, tool_filter, mode, release_slot, trace),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release_slot),
+    )
+
+async def read_batch(request: Request):
+    """Parse the questions, optional tool filter and retrieval mode from an ask batch body"""
+    data = await read_body(request)
+    questions = data.get("questions")
+    if not isinstance(questions, list) or not questions:
+        raise HTTPException(status_code=400, detail="'questions' must be a non-empty list of strings")
+    if not all(isinstance(question, str) and question.strip() for question in questions):
+        raise HTTPException(status_code=400, detail="Questions cannot be empty")
+    if len(questions) > ASK_BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400,
+                            detail=f"At most {ASK_BATCH_MAX_QUESTIONS} questions per batch, got {len(questions)}")
+    tool_filter = parse_tool_filter(data.get("tools", None))
+    mode = parse_search_mode(data.get("mode", None))
+    annotate(questions=len(questions), tools=tool_filter, mode=mode)
+    return questions, tool_filter, mode
+
+@app.post("/ask/batch")
+async def ask_batch(request: Request):
+    """Answer many questions at once, streaming one NDJSON line per answer as it finishes.
+
+    All questions are embedded in one model call and searched with one
+    multi-query Chroma call; the LLM calls then run at most
+    ASK_BATCH_CONCURRENCY at a time. Each line is `{"index", "question",
+    "answer", "sources"}` (or `"error"` instead of answer/sources), in
+    completion order; the last line is `{"done": true, ...}` with counts.
+    """
+    trace = Trace("ask_batch").activate()
+    try:
+        with span("parse"):
+            questions, tool_filter, mode = await read_batch(request)
+
+        # The whole batch takes one /ask slot, so it can't crowd out interactive questions
+        with span("queue_wait"):
+            await ask_limiter.acquire()
+    except QueueFullError as e:
+        trace.finish("rejected", reason=str(e))
+        raise HTTPException(status_code=503, detail="Server is busy, please retry shortly")
+    except HTTPException as e:
+        trace.finish("invalid", detail=e.detail)
+        raise
+
+    released = False
+
+    def release_slot():
+        nonlocal released
+        if not released:
+            released = True
+            ask_limiter.release()
+            trace.finish()
+
+    return StreamingResponse(
+        batch_answers(questions, tool_filter, mode, release_slot, trace),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release_slot),
+    )
+
+async def batch_answers(questions: List[str], tool_filter: Optional[List[str]], mode: str, on_finish,
+                        trace: Trace):
+    """Yield an NDJSON line per answered question, calling on_finish once the stream ends"""
+    trace.activate()
+    tasks = []
+    counts = {"answered": 0, "failed": 0, "cached": 0}
+
+    def line(index: int, result: dict) -> str:
+        return json.dumps({"index": index, "question": questions[index], **result}) + "\n"
+
+    try:
+        sync_answer_cache()
+        pending = []
+        for index, question in enumerate(questions):
+            cached = answer_cache.get(question, tool_filter, mode)
+            if cached:
+                count_answer("cache")
+                counts["cached"] += 1
+                yield line(index, cached)
+            else:
+                pending.append(index)
+
+        store = await warmup.store()
+        embeddings = [None] * len(pending)
+        if pending and (mode != "lexical" or answer_cache.semantic_enabled):
+            embeddings = await run_search(store.embed_queries, [questions[i] for i in pending])
+        if answer_cache.semantic_enabled:
+            remaining = []
+            for index, embedding in zip(pending, embeddings):
+                cached = answer_cache.get_similar(embedding, tool_filter, mode)
+                if cached:
+                    count_answer("similar")
+                    counts["cached"] += 1
+                    yield line(index, cached)
+                else:
+                    remaining.append((index, embedding))
+            pending, embeddings = [index for index, _ in remaining], [embedding for _, embedding in remaining]
+
+        search_results = []
+        if pending:
+            search_results = await run_search(
+                store.search_many_with_metadata, [questions[i] for i in pending], CONTEXT_CANDIDATES,
+                tool_filter, mode, None if mode == "lexical" else embeddings
+            )
+
+        semaphore = asyncio.Semaphore(ASK_BATCH_CONCURRENCY)
+
+        async def answer_one(index: int, results: List[dict], embedding) -> str:
+            async with semaphore:
+                # Each question gets its own trace line, tagged with the batch's request ID
+                item = Trace("ask_batch_item", batch_id=trace.request_id, index=index).activate()
+                try:
+                    context, sources = pack_context(questions[index], results)
+                    result = await generate_answer(questions[index], context, sources, tool_filter, mode, embedding)
+                    item.finish()
+                    counts["answered"] += 1
+                    return line(index, result)
+                except Exception as e:
+                    item.finish("error", error=str(e))
+                    counts["failed"] += 1
+                    return line(index, {"error": str(e)})
+
+        tasks = [asyncio.create_task(answer_one(index, results, embedding))
+                 for index, results, embedding in zip(pending, search_results, embeddings)]
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+        yield json.dumps({"done": True, "questions": len(questions), **counts}) + "\n"
+
+    except Exception as e:
+        trace.finish("error", error=str(e))
+        log_event("ask_failed", logging.ERROR, exc_info=True, error=str(e))
+        yield json.dumps({"done": True, "error": f"Internal server error: {str(e)}"}) + "\n"
+    finally:
+        # A client that disconnects mid-batch shouldn't keep paying for completions
+        for task in tasks:
+            task.cancel()
+        trace.fields.update(counts)
+        on_finish()
+
+async def retrieve_context(question: str, tool_filter: Optional[List[str]] = None,
+                           mode: str = DEFAULT_SEARCH_MODE):
+    """Search the knowledge base and return (context, sources) for the prompt.
+
+    Over-fetches CONTEXT_CANDIDATES chunks, then reranks, dedupes and packs
+    them into CONTEXT_TOKEN_BUDGET tokens (see context.assemble_context).
+    """
+    store = await warmup.store()
+    search_results = await run_search(
+        store.search_with_metadata, question, CONTEXT_CANDIDATES, tool_filter, mode
+    )
+    return pack_context(question, search_results)
+
+def pack_context(question: str, search_results: List[dict]):
+    """Rerank, dedupe and pack one question's search results into (context, sources)"""
+    if not search_results:
+        annotate(candidates=0)
+        return None, []
+    
+    with span("context_assembly"):
+        packed = assemble_context(question, search_results, CONTEXT_TOKEN_BUDGET,
+                                  format_context_chunk, CONTEXT_DUPLICATE_THRESHOLD)
+    annotate(candidates=packed.candidates, packed_chunks=len(packed.results), context_tokens=packed.tokens,
+             duplicates=packed.duplicates, over_budget=packed.over_budget)
+    
+    with span("source_extraction"):
         sources = []
-        
-        for result in search_results:
-            context_chunks.append(result['content'])
-            
-            # Extract source info from the content (assuming our scraper adds it)
-            source_info = extract_source_info(result['content'])
+        for result in packed.results:
+            source_info = source_from_result(result)
             if source_info:
                 sources.append(source_info)
-        
-        context = "\n\n".join(context_chunks)
+    
+    return packed.text, sources
 
-        # Enhanced prompt that handles multiple tools
-        prompt = f"""You are an AI assistant specializing in developer tools and frameworks. Answer the question based on the provided context from various documentation sources.
+def build_messages(question: str, context: str) -> List[dict]:
+    """Build the DeepSeek chat messages for a question and its context"""
+    # Enhanced prompt that handles multiple tools
+    prompt = f"""You are an AI assistant specializing in developer tools and frameworks. Answer the question based on the provided context from various documentation sources.
 
 Context from documentation:
 {context}
@@ -104,31 +488,151 @@ Instructions:
 - If you need to reference multiple tools, organize your answer clearly
 - Be concise but thorough
 """
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+async def lookup_similar(question: str, tool_filter: Optional[List[str]], mode: str):
+    """Check the near-duplicate cache layer; returns (cached answer, query embedding)"""
+    if not answer_cache.semantic_enabled:
+        return None, None
+    store = await warmup.store()
+    embedding = await run_search(store.embed_query, question)
+    return answer_cache.get_similar(embedding, tool_filter, mode), embedding
+
+async def answer_question(question: str, tool_filter: Optional[List[str]] = None,
+                          mode: str = DEFAULT_SEARCH_MODE) -> dict:
+    """Retrieve context for a question and ask DeepSeek for an answer"""
+    cached, embedding = await lookup_similar(question, tool_filter, mode)
+    if cached:
+        count_answer("similar")
+        return cached
 
-        print("6. Calling DeepSeek API")
-        response = client.chat.completions.create(
+    context, sources = await retrieve_context(question, tool_filter, mode)
+    return await generate_answer(question, context, sources, tool_filter, mode, embedding)
+
+async def generate_answer(question: str, context: Optional[str], sources: List[dict],
+                          tool_filter: Optional[List[str]], mode: str, embedding=None) -> dict:
+    """Ask DeepSeek to answer from the packed context and cache the result"""
+    if context is None:
+        count_answer("no_context")
+        return {"answer": NO_CONTEXT_ANSWER, "sources": []}
+
+    with span("prompt_build"):
+        messages = build_messages(question, context)
+        prompt_tokens = count_message_tokens(messages)
+    PROMPT_TOKENS.inc(prompt_tokens)
+    with span("llm_total"):
+        response = await llm_client().chat.completions.create(
             model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": "You are an AI assistant specializing in developer tools and frameworks."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=messages,
             stream=False
         )  
-        print("7. Got response from DeepSeek")
-        
-        return {
-            "answer": response.choices[0].message.content,
-            "sources": sources
-        }
-        
+    usage = getattr(response, "usage", None)
+    annotate(prompt_tokens=prompt_tokens, billed_prompt_tokens=usage.prompt_tokens if usage else None)
+    count_answer("llm")
+    
+    result = {
+        "answer": response.choices[0].message.content,
+        "sources": sources
+    }
+    answer_cache.put(question, tool_filter, result, embedding, mode)
+    return result
+
+def sse_event(event: str, data: dict) -> str:
+    """Format a single Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def cached_events(cached: dict):
+    """Replay a cached answer as SSE events"""
+    yield sse_event("sources", {"sources": cached["sources"]})
+    yield sse_event("token", {"text": cached["answer"]})
+    yield sse_event("done", {})
+
+async def stream_answer(question: str, tool_filter: Optional[List[str]], mode: str, on_finish,
+                        trace: Optional[Trace] = None):
+    """Yield SSE events for a question, calling on_finish once the stream ends"""
+    if trace:
+        trace.activate()
+    try:
+        cached, embedding = await lookup_similar(question, tool_filter, mode)
+        if cached:
+            count_answer("similar")
+            async for event in cached_events(cached):
+                yield event
+            return
+
+        context, sources = await retrieve_context(question, tool_filter, mode)
+        yield sse_event("sources", {"sources": sources})
+
+        if context is None:
+            count_answer("no_context")
+            yield sse_event("token", {"text": NO_CONTEXT_ANSWER})
+            yield sse_event("done", {})
+            return
+
+        with span("prompt_build"):
+            messages = build_messages(question, context)
+            prompt_tokens = count_message_tokens(messages)
+        PROMPT_TOKENS.inc(prompt_tokens)
+        annotate(prompt_tokens=prompt_tokens)
+        llm_start = time.perf_counter()
+        stream = await llm_client().chat.completions.create(
+            model="deepseek-chat",
+            messages=messages,
+            stream=True
+        )
+        answer_parts = []
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if not answer_parts:
+                    record_stage("llm_first_token", time.perf_counter() - llm_start)
+                answer_parts.append(delta)
+                yield sse_event("token", {"text": delta})
+        record_stage("llm_total", time.perf_counter() - llm_start)
+        count_answer("llm")
+        answer_cache.put(question, tool_filter, {"answer": "".join(answer_parts), "sources": sources},
+                         embedding, mode)
+        yield sse_event("done", {})
+
     except Exception as e:
-        print(f"Error in ask endpoint: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+        if trace:
+            trace.finish("error", error=str(e))
+        log_event("ask_failed", logging.ERROR, exc_info=True, error=str(e))
+        yield sse_event("error", {"detail": f"Internal server error: {str(e)}"})
+    finally:
+        on_finish()
+
+def source_from_result(result: dict) -> Optional[dict]:
+    """Source attribution for a search result, taken from its stored metadata"""
+    metadata = result.get("metadata") or {}
+    if not metadata.get("url"):
+        # Chunks stored before metadata existed carry their source in a text header
+        return extract_source_info(result["content"])
+    snippet = next((line.strip() for line in result["content"].splitlines() if line.strip()), "")
+    return {
+        "tool": metadata.get("tool_name") or metadata.get("tool", "Unknown"),
+        "title": metadata.get("title", ""),
+        "url": metadata["url"],
+        "snippet": snippet
+    }
+
+def format_context_chunk(result: dict) -> str:
+    """Prefix a retrieved chunk with its source so the model can cite it"""
+    metadata = result.get("metadata") or {}
+    if not metadata.get("url"):
+        return result["content"]
+    header = f"Source: {metadata.get('tool_name', '')} - {metadata.get('title', '')}\nURL: {metadata['url']}"
+    if metadata.get("section"):
+        header += f"\nSection: {metadata['section']}"
+    return f"{header}\n\n{result['content']}"
 
 def extract_source_info(content: str) -> dict:
-    """Extract source information from scraped content"""
+    """Extract source information from a legacy chunk's Source:/URL: header"""
     lines = content.split('\n')
     source_info = {
         "tool": "Unknown",
@@ -157,91 +661,171 @@ def extract_source_info(content: str) -> dict:
     
     return source_info if source_info["tool"] != "Unknown" else None
 
-@app.post("/initialize")
-async def initialize():
-    """Initialize the knowledge base with all enabled tools"""
+def run_ingest_job(job: IngestJob):
+    """Scrape and embed the job's tools, reporting progress on the job.
+
+    Pages stream from the scraper into the embedding store as they are
+    parsed (see pipeline.run_ingest). They are fetched conditionally against
+    the page manifest and unchanged ones are skipped unless the job was
+    submitted with force. /ask keeps serving the existing collection
+    meanwhile: stale chunks are removed only after all new ones are stored.
+    A rebuild job instead refetches everything into a new collection and
+    swaps it in only once every tool has been stored.
+    """
+    log_event("ingest_started", job_id=job.id, tools=job.tools, force=job.force, rebuild=job.rebuild)
+    live = EmbedStore.get_instance()
+    store = live.staging_store() if job.rebuild else live
     try:
-        from scrape import UniversalScraper
-        
-        print("Initializing scraper...")
-        scraper = UniversalScraper()
-        
-        print("Scraping all documentation...")
-        all_chunks = scraper.scrape_all_tools()  # This returns a flat list
-        
-        if not all_chunks:
-            raise HTTPException(status_code=500, detail="Failed to scrape any documentation")
-        
-        print(f"Got {len(all_chunks)} total chunks from all tools")
-        print(f"First chunk preview: {all_chunks[0][:100] if all_chunks else 'No chunks'}...")
-        
-        print(f"Adding {len(all_chunks)} chunks to embedding store...")
-        embed_store.add_texts(all_chunks)
-        
-        return {"message": f"Knowledge base initialized with {len(all_chunks)} chunks from all tools"}
-        
-    except Exception as e:
-        print(f"Error initializing: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Failed to initialize: {str(e)}")
-
-@app.post("/initialize/{tool_name}")
-async def initialize_tool(tool_name: str):
-    """Initialize the knowledge base with a specific tool"""
+        stats = ingest_into(store, job)
+        if job.rebuild:
+            job.check_cancelled()
+            empty = [tool for tool, chunks in stats["tool_chunks"].items() if not chunks]
+            if stats["ok"] and empty:
+                raise RuntimeError(f"Rebuild aborted, nothing scraped for {', '.join(empty)}; "
+                                   f"the current knowledge base is unchanged")
+            if stats["ok"]:
+                live.swap_in(store)
+    finally:
+        if job.rebuild and store.collection is not live.collection:
+            live.discard(store)
+    # No answer_cache.clear() here: the writes above moved the corpus version,
+    # so the next request's sync_answer_cache() drops answers citing old chunks
+    job.check_cancelled()
+
+    skipped = stats["pages"]["not_modified"] + stats["pages"]["unchanged"]
+    if not stats["pages"]["fetched"] and not skipped:
+        raise RuntimeError("Failed to scrape any documentation")
+    if not stats["ok"]:
+        raise RuntimeError(f"Failed to update the embedding store ({stats['failed']} chunks failed)")
+    for progress in job.progress.values():
+        progress.status = "done"
+
+    if not stats["chunks_scraped"]:
+        job.message = f"Knowledge base is up to date ({skipped} unchanged pages skipped)"
+        return
+    verb = "rebuilt" if job.rebuild else "initialized"
+    message = f"Knowledge base {verb} with {stats['chunks_scraped']} chunks from {', '.join(job.tools)}"
+    job.message = f"{message} ({skipped} unchanged pages skipped)" if skipped else message
+
+def ingest_into(store: EmbedStore, job: IngestJob) -> dict:
+    """Run the scrape -> embed pipeline for a job's tools into `store`"""
+    from pipeline import run_ingest
+    from scrape import UniversalScraper
+
+    manifest = store.page_manifest()
+    configs = {tool_name: get_tool_config(tool_name) for tool_name in job.tools}
+    for tool_name in configs:
+        job.progress[tool_name].status = "scraping"
+
+    def on_write(metadatas: List[dict]):
+        job.chunks_written([metadata["tool"] for metadata in metadatas])
+
+    # A rebuild starts from an empty collection, so every page has to be fetched again
+    scraper = UniversalScraper(manifest=manifest, force=job.force or job.rebuild, on_page=job.page_done,
+                               on_discover=job.page_queued, cancel_event=job.cancel_event)
+    return run_ingest(store, scraper, configs, manifest,
+                      on_write=on_write, cancel_event=job.cancel_event)
+
+# Job state and per-tool locks live beside the store, so every uvicorn worker sees every job
+JOB_STATE_DIR = os.getenv("JOB_STATE_DIR", os.path.join("chroma_store", "jobs"))
+job_manager = JobManager(run_ingest_job, state_dir=JOB_STATE_DIR)
+
+def start_ingest_job(tools: List[str], force: bool, rebuild: bool = False) -> dict:
+    """Submit an ingestion job, mapping a running job for the same tool to 409"""
     try:
-        from scrape import UniversalScraper
-        
-        print(f"Initializing scraper for {tool_name}...")
-        scraper = UniversalScraper()
-        
-        # Check if tool exists
-        available_tools = list(get_enabled_tools().keys())
-        if tool_name not in available_tools:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Tool '{tool_name}' not found. Available tools: {', '.join(available_tools)}"
-            )
-        
-        print(f"Scraping {tool_name} documentation...")
-        chunks = scraper.scrape_tool(tool_name)
-        
-        if not chunks:
-            raise HTTPException(status_code=500, detail=f"Failed to scrape {tool_name} documentation - no content found")
-        
-        print(f"Adding {len(chunks)} chunks from {tool_name} to embedding store...")
-        embed_store.add_texts(chunks)
-        
-        return {"message": f"Knowledge base initialized with {len(chunks)} chunks from {tool_name}"}
-        
-    except HTTPException:
-        raise  # Re-raise HTTP exceptions as-is
-    except Exception as e:
-        print(f"Error initializing {tool_name}: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Failed to initialize {tool_name}: {str(e)}")
+        job = job_manager.submit(tools, force=force, rebuild=rebuild)
+    except JobConflictError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "job_id": e.job_id})
+    log_event("ingest_submitted", job_id=job.id, tools=tools)
+    return {"job_id": job.id, "status_url": f"/jobs/{job.id}", "tools": tools}
+
+@app.post("/initialize", status_code=202)
+async def initialize(force: bool = False, rebuild: bool = False):
+    """Start a background job that ingests all enabled tools.
+
+    Returns a job ID to poll at GET /jobs/{id}; pass `?force=true` to
+    refetch pages that have not changed, or `?rebuild=true` to build a
+    fresh collection and swap it in once complete.
+    """
+    return start_ingest_job(list(get_enabled_tools().keys()), force, rebuild)
+
+@app.post("/initialize/{tool_name}", status_code=202)
+async def initialize_tool(tool_name: str, force: bool = False):
+    """Start a background job that ingests one tool, replacing its old chunks"""
+    # Check if tool exists
+    available_tools = list(get_enabled_tools().keys())
+    if tool_name not in available_tools:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Tool '{tool_name}' not found. Available tools: {', '.join(available_tools)}"
+        )
+    return start_ingest_job([tool_name], force)
+
+@app.get("/jobs")
+async def list_jobs():
+    """List recent ingestion jobs, newest last"""
+    return {"jobs": job_manager.describe_all()}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Progress of an ingestion job"""
+    job = job_manager.describe(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a running ingestion job after its current page or batch"""
+    job = job_manager.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-stage latency histograms and request, answer and ingestion counters"""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/status")
 async def get_status():
     """Get the current status of the knowledge base"""
     try:
         available_tools = list(get_enabled_tools().keys())
+        store = warmup.loaded_store  # never opened here, so /status answers at once during startup
         return {
-            "status": "running",
-            "knowledge_base": "initialized" if embed_store else "not_initialized",
+            "status": "running" if warmup.ready else "starting",
+            "ready": warmup.ready,
+            "warmup": warmup.stats(),
+            "knowledge_base": "initialized" if store else "not_loaded",
+            "vector_store": os.getenv("CHROMA_SERVER_URL") or "embedded",
+            "worker_pid": os.getpid(),  # which uvicorn worker answered
+            "ask_queue": ask_limiter.stats(),
+            "answer_cache": answer_cache.stats(),
+            "query_embedding_cache": store.query_cache_stats() if store else None,
+            "embedding": store.embedding_info() if store else None,
+            "search_backend": store.search_backend_info() if store else None,
+            "active_jobs": job_manager.active(),
             "available_tools": available_tools,
             "available_endpoints": [
                 "GET /tools - List available tools",
-                "POST /initialize - Initialize all tools", 
-                "POST /initialize/{tool_name} - Initialize specific tool",
+                "POST /initialize - Start a job initializing all tools", 
+                "POST /initialize/{tool_name} - Start a job initializing a specific tool",
+                "GET /jobs - List ingestion jobs",
+                "GET /jobs/{id} - Get ingestion job progress",
+                "POST /jobs/{id}/cancel - Cancel an ingestion job",
                 "POST /ask - Ask questions",
-                "GET /status - Get API status"
+                "POST /ask/stream - Ask questions, streaming the answer over SSE",
+                "POST /ask/batch - Ask many questions, streaming answers as NDJSON",
+                "GET /status - Get API status",
+                "GET /metrics - Prometheus metrics"
             ]
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 if __name__ == "__main__":
+    import uvicorn
+
     port = int(os.environ.get("PORT", 8000))
     uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,110 @@
+"""Maintenance commands for the knowledge base.
+
+    cd backend && python manage.py compact
+    cd backend && python manage.py reindex
+    cd backend && python manage.py delete-tool stripe
+    cd backend && python manage.py snapshot
+    cd backend && python manage.py restore 20250101-120000
+
+Running app workers pick up reset, clear, delete-tool and compact on their
+next request (see EmbedStore.corpus_version). `restore` replaces the whole
+directory, so run it with the server stopped; `snapshot` only reads it.
+Both refuse to run with CHROMA_SERVER_URL set: the vectors then live on
+the Chroma server, not in --persist-dir.
+"""
+import argparse
+import json
+import os
+import sys
+
+import snapshots
+from embed_store import EmbedStore
+
+
+def compact(args):
+    """Move chunks to deterministic IDs and drop duplicate copies"""
+    store = EmbedStore(persist_dir=args.persist_dir)
+    print(json.dumps(store.compact(), indent=2))
+
+
+def reindex(args):
+    """Rebuild the BM25 index from the chunks in the collection"""
+    store = EmbedStore(persist_dir=args.persist_dir)
+    print(json.dumps({"indexed": store.rebuild_lexical_index()}, indent=2))
+
+
+def clear(args):
+    """Delete every chunk, a page at a time"""
+    store = EmbedStore(persist_dir=args.persist_dir)
+    print(json.dumps({"cleared": store.clear_collection(args.batch_size)}, indent=2))
+
+
+def reset(args):
+    """Empty the store at once by dropping and recreating the collection"""
+    store = EmbedStore(persist_dir=args.persist_dir)
+    store.reset_collection()
+    print(json.dumps(store.get_collection_info(), indent=2))
+
+
+def delete_tool(args):
+    """Delete one tool's chunks and forget its pages"""
+    store = EmbedStore(persist_dir=args.persist_dir)
+    print(json.dumps({"tool": args.tool, "deleted": store.delete_tool(args.tool, args.batch_size)}, indent=2))
+
+
+def _require_embedded_store(command: str):
+    server_url = os.getenv("CHROMA_SERVER_URL")
+    if server_url:
+        sys.exit(f"{command}: the collection lives on the Chroma server at {server_url}, so a copy of "
+                 "the local directory would not include it. Back up the server's --path instead, "
+                 "or unset CHROMA_SERVER_URL for an embedded store.")
+
+
+def snapshot(args):
+    """Copy the store into a new snapshot"""
+    _require_embedded_store("snapshot")
+    print(json.dumps({"snapshot": snapshots.create_snapshot(args.persist_dir, args.name)}, indent=2))
+
+
+def list_snapshots(args):
+    """List the store's snapshots"""
+    print(json.dumps(snapshots.list_snapshots(args.persist_dir), indent=2))
+
+
+def restore(args):
+    """Replace the store with a snapshot"""
+    _require_embedded_store("restore")
+    print(json.dumps({"restored": snapshots.restore_snapshot(args.snapshot, args.persist_dir)}, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DocuMind knowledge base maintenance")
+    parser.add_argument("--persist-dir", default="chroma_store", help="ChromaDB persistence directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("compact", help=compact.__doc__).set_defaults(func=compact)
+    commands.add_parser("reindex", help=reindex.__doc__).set_defaults(func=reindex)
+
+    command = commands.add_parser("clear", help=clear.__doc__)
+    command.add_argument("--batch-size", type=int, default=500)
+    command.set_defaults(func=clear)
+    commands.add_parser("reset", help=reset.__doc__).set_defaults(func=reset)
+    command = commands.add_parser("delete-tool", help=delete_tool.__doc__)
+    command.add_argument("tool", help="tool key, e.g. stripe")
+    command.add_argument("--batch-size", type=int, default=500)
+    command.set_defaults(func=delete_tool)
+
+    command = commands.add_parser("snapshot", help=snapshot.__doc__)
+    command.add_argument("--name", help="snapshot name (default: a timestamp)")
+    command.set_defaults(func=snapshot)
+    commands.add_parser("snapshots", help=list_snapshots.__doc__).set_defaults(func=list_snapshots)
+    command = commands.add_parser("restore", help=restore.__doc__)
+    command.add_argument("snapshot", help="snapshot name or path")
+    command.set_defaults(func=restore)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
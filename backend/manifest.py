@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+
+def content_hash(text) -> str:
+    """Stable hash of page or chunk content (str or bytes)"""
+    if isinstance(text, str):
+        text = text.strip().encode("utf-8")
+    return hashlib.sha256(text).hexdigest()
+
+
+class PageManifest:
+    """Per-URL fetch state used to skip pages that have not changed.
+
+    For every scraped URL we keep the ETag and Last-Modified validators for
+    conditional GETs, a hash of the raw page body, the hashes of the chunks
+    the page produced and the links found on it. Updates stay in memory
+    until save() is called, so a failed ingest does not mark pages as done.
+    """
+
+    _save_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pages: Dict[str, dict] = self._load()
+        self._dirty: Dict[str, Optional[dict]] = {}
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable page manifest {self.path}: {e}")
+            return {}
+
+    def get(self, url: str) -> Optional[dict]:
+        with self._lock:
+            return self._pages.get(url)
+
+    def urls(self) -> List[str]:
+        with self._lock:
+            return list(self._pages)
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since headers for a previously seen URL"""
+        entry = self.get(url)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def record(self, url: str, etag: Optional[str], last_modified: Optional[str],
+               page_hash: str, chunk_hashes: List[str], links: Optional[List[str]] = None):
+        entry = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_hash": page_hash,
+            "chunk_hashes": chunk_hashes,
+            "links": links or [],
+        }
+        with self._lock:
+            self._pages[url] = entry
+            self._dirty[url] = entry
+
+    def forget(self, url: Optional[str] = None):
+        """Drop one URL (or every URL) so the next scrape refetches it"""
+        with self._lock:
+            urls = [url] if url else list(self._pages)
+            for u in urls:
+                self._pages.pop(u, None)
+                self._dirty[u] = None
+
+    def save(self):
+        """Merge this run's updates into the manifest file on disk"""
+        with self._save_lock:
+            with self._lock:
+                pages = self._load()
+                for url, entry in self._dirty.items():
+                    if entry is None:
+                        pages.pop(url, None)
+                    else:
+                        pages[url] = entry
+                self._dirty.clear()
+
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(pages, f)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,259 @@
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets, from a cache hit to a slow LLM answer
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """A monotonically increasing count per label combination"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}_total{_label_text(self.labelnames, key)} {value}"
+
+
+class Gauge(Counter):
+    """A value per label combination that can go up and down"""
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_label_text(self.labelnames, key)} {value}"
+
+
+class Histogram(Counter):
+    """Cumulative bucket counts, sum and count of observations per label combination"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                yield f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_label_text(self.labelnames, key)} {total}"
+            yield f"{self.name}_count{_label_text(self.labelnames, key)} {count}"
+
+
+class Registry:
+    """The metrics exposed at /metrics, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Counter) -> Counter:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "documind_stage_seconds", "Time spent in one stage of answering a question or ingesting docs", ("stage",))
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "documind_http_request_seconds", "HTTP request latency by route", ("method", "route"))
+HTTP_REQUESTS = REGISTRY.counter(
+    "documind_http_requests", "HTTP requests by route and status code", ("method", "route", "status"))
+ANSWERS = REGISTRY.counter(
+    "documind_answers", "Answered questions by where the answer came from", ("source",))
+PROMPT_TOKENS = REGISTRY.counter(
+    "documind_llm_prompt_tokens", "Estimated prompt tokens sent to the LLM")
+PAGES = REGISTRY.counter(
+    "documind_scraped_pages", "Crawled pages by outcome", ("result",))
+CHUNKS = REGISTRY.counter(
+    "documind_ingested_chunks", "Chunks handled by ingestion by outcome", ("result",))
+IN_FLIGHT = REGISTRY.gauge(
+    "documind_requests_in_flight", "Requests holding a concurrency slot", ("limiter",))
+QUEUE_DEPTH = REGISTRY.gauge(
+    "documind_request_queue_depth", "Requests waiting for a concurrency slot", ("limiter",))
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, event and the record's fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Readable `event key=value ...` lines for local development"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{key}={value}" for key, value in getattr(record, "fields", {}).items())
+        text = f"{record.levelname.lower()} {record.getMessage()} {fields}".rstrip()
+        if record.exc_info:
+            text += "\n" + self.formatException(record.exc_info)
+        return text
+
+
+logger = logging.getLogger("documind")
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(TextFormatter() if os.getenv("LOG_FORMAT", "json") == "text" else JsonFormatter())
+    logger.addHandler(_handler)
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+
+# The trace of the request being handled, if any; stages record their timings on it
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("trace", default=None)
+
+
+def log_event(event: str, level: int = logging.INFO, exc_info=None, **fields):
+    """Emit a structured log line, tagged with the current request's ID"""
+    if not logger.isEnabledFor(level):
+        return
+    trace = _current_trace.get()
+    if trace is not None:
+        fields = {"request_id": trace.request_id, **fields}
+    logger.log(level, event, extra={"fields": fields}, exc_info=exc_info)
+
+
+class Trace:
+    """Stage timings of one request, logged as a single line when it finishes"""
+
+    def __init__(self, endpoint: str, **fields):
+        self.request_id = uuid.uuid4().hex[:12]
+        self.endpoint = endpoint
+        self.fields = fields
+        self.stages: Dict[str, float] = {}
+        self.start = time.perf_counter()
+        self.finished = False
+        self._lock = threading.Lock()  # stages can run on the search and lexical threads at once
+
+    def activate(self) -> "Trace":
+        """Make this the current trace in the running context (task or thread)"""
+        _current_trace.set(self)
+        return self
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage] = round(self.stages.get(stage, 0.0) + seconds * 1000, 2)
+
+    def finish(self, status: str = "ok", **fields):
+        """Log the request with its stage timings; only the first call counts"""
+        if self.finished:
+            return
+        self.finished = True
+        self.fields.update(fields)
+        log_event("request_finished", endpoint=self.endpoint, status=status,
+                  duration_ms=round((time.perf_counter() - self.start) * 1000, 2),
+                  stages_ms=self.stages, **self.fields)
+
+
+def annotate(**fields):
+    """Add fields to the current request's summary log line, if there is one"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.fields.update(fields)
+
+
+def record_stage(stage: str, seconds: float):
+    """Record a stage duration measured elsewhere (e.g. in a worker process)"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+    log_event("stage", logging.DEBUG, stage=stage, duration_ms=round(seconds * 1000, 2))
+
+
+@contextmanager
+def span(stage: str):
+    """Time a block as one stage: histogram, current trace and a debug log line"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
@@ -0,0 +1,73 @@
+from typing import Any, Dict
+
+from embed_store import EmbedStore
+from manifest import PageManifest
+from metrics import log_event, span
+from scrape import CrawlScope, UniversalScraper
+from tools import ToolConfig
+
+
+def run_ingest(store: EmbedStore, scraper: UniversalScraper, configs: Dict[str, ToolConfig],
+               manifest: PageManifest, **ingest_options) -> Dict[str, Any]:
+    """Stream pages from the scraper straight into the embedding store.
+
+    Stages run concurrently with bounded hand-offs between them: fetch
+    workers parse and chunk pages into the scraper's page queue, the
+    embedder pulls chunks from it in batches, and a writer thread upserts
+    embedded batches. Once every page has been stored, each tool's chunks
+    that no longer appear on any page of this crawl are deleted and the
+    manifest is saved. When the crawl missed pages (fetch errors or the
+    page budget), chunks of known pages it did not reach are kept too.
+    After a failed or cancelled run neither happens, so the next run picks
+    up the same pages again. `ingest_options` go to
+    EmbedStore.ingest_stream.
+    """
+    page_chunks = {tool_name: 0 for tool_name in configs}
+    crawled = {tool_name: [] for tool_name in configs}
+    pages = scraper.iter_pages(configs)
+
+    def chunks():
+        for tool_name, url, page in pages:
+            page_chunks[tool_name] += len(page)
+            crawled[tool_name].append(url)
+            yield from page
+
+    try:
+        with span("ingest_stream"):
+            stats = store.ingest_stream(chunks(), **ingest_options)
+    finally:
+        pages.close()
+
+    stats["chunks_scraped"] = sum(page_chunks.values())
+    stats["tool_chunks"] = page_chunks
+    stats["pages"] = dict(scraper.stats)
+    stats["ok"] = stats["failed"] == 0 and not stats["cancelled"]
+    log_event("ingest_stream_finished", tools=list(configs), chunks_scraped=stats["chunks_scraped"],
+              embedded=stats["embedded"], failed=stats["failed"], cancelled=stats["cancelled"],
+              seconds=stats.get("seconds"), pages=stats["pages"])
+    if not stats["ok"]:
+        return stats
+
+    for tool_name, config in configs.items():
+        urls = set(crawled[tool_name])
+        if tool_name in scraper.incomplete:
+            # A page that was not reached this time has not necessarily gone away
+            scope = CrawlScope(tool_name, config)
+            missed = [url for url in manifest.urls() if url not in urls and scope.in_scope(url)]
+            log_event("stale_removal_partial_crawl", tool=tool_name, kept_pages=len(missed))
+            urls.update(missed)
+        keep_hashes = []
+        for url in urls:
+            entry = manifest.get(url)
+            if entry:
+                keep_hashes.extend(entry.get("chunk_hashes", []))
+        if not keep_hashes:
+            # Nothing came back at all (e.g. the site is down) - keep what we have
+            print(f"No content scraped for {tool_name}, leaving its chunks untouched")
+            continue
+        if not store.remove_stale(tool_name, keep_hashes):
+            stats["ok"] = False
+            return stats
+
+    manifest.save()
+    return stats
@@ -1,19 +1,212 @@
+import heapq
+import logging
 import requests
-from bs4 import BeautifulSoup
+import queue
+import re
+import threading
 import time
-from urllib.parse import urljoin, urlparse
-from typing import List, Set, Optional
+from collections import Counter, deque
+from itertools import zip_longest
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urldefrag, urlencode, urljoin, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+from xml.etree import ElementTree
+from typing import Callable, Dict, Iterator, List, Set, Optional, Tuple
+from chunking import Chunk, chunk_page
+from extract import Extractor, get_extractor
+from manifest import PageManifest, content_hash
+from metrics import PAGES, log_event, span
 from tools import TOOLS, ToolConfig, get_tool_config, get_enabled_tools
 
-class UniversalScraper:
-    def __init__(self, delay: float = 1.0):
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# Links to these are assets, not doc pages
+SKIP_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".ico", ".pdf", ".zip",
+                   ".gz", ".tar", ".mp4", ".webm", ".css", ".js", ".json", ".xml", ".txt")
+
+# Most sitemap files (including those listed in a sitemap index) read per host
+MAX_SITEMAPS = 20
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a page URL, used as its identity while crawling.
+
+    Drops the fragment and default port, lowercases scheme and host,
+    collapses duplicate slashes, strips a trailing slash and sorts the
+    query string.
+    """
+    parts = urlsplit(urldefrag(url)[0])
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+class HostLimiter:
+    """Per-host politeness: caps requests in flight and spaces out their start times"""
+
+    def __init__(self, delay: float, max_concurrency: int):
         self.delay = delay
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        self.max_concurrency = max(1, max_concurrency)
+        self._slots = threading.Semaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def __enter__(self):
+        self._slots.acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+        return self
+
+    def __exit__(self, *exc):
+        self._slots.release()
+        return False
+
+class HostFrontier:
+    """Breadth-first queue of (tool_name, url, depth, deferred) for one host.
+
+    Shared by the host's workers. Pages come out shallowest first. Deferred
+    items (sitemap pages, which have not claimed a page budget yet) come
+    out after the linked pages of their depth, and only once no shallower
+    page is still being fetched, since those may link to more pages of that
+    depth. get() blocks while nothing can be handed out but pages are still
+    being fetched (or the host is still being seeded), and returns None
+    once the host is exhausted.
+    """
+
+    def __init__(self, limiter: HostLimiter):
+        self.limiter = limiter
+        self.robots: Optional[RobotFileParser] = None
+        self._heap: List[tuple] = []
+        self._order = 0
+        self._cond = threading.Condition()
+        self._in_flight = Counter({0: 1})  # depth -> pages being fetched; seeding counts at depth 0
+
+    def put(self, item: Tuple[str, str, int, bool]):
+        with self._cond:
+            tool_name, url, depth, deferred = item
+            heapq.heappush(self._heap, (depth, deferred, self._order, item))
+            self._order += 1
+            self._cond.notify()
+
+    def _ready(self) -> bool:
+        depth, deferred = self._heap[0][:2]
+        return not deferred or not any(count and shallower < depth
+                                       for shallower, count in self._in_flight.items())
+
+    def get(self, stopped: Callable[[], bool]) -> Optional[Tuple[str, str, int, bool]]:
+        with self._cond:
+            while not self._heap or not self._ready():
+                if stopped() or (not self._heap and not sum(self._in_flight.values())):
+                    return None
+                self._cond.wait(timeout=0.1)
+            item = heapq.heappop(self._heap)[-1]
+            self._in_flight[item[2]] += 1
+            return item
+
+    def task_done(self, depth: int = 0):
+        with self._cond:
+            self._in_flight[depth] -= 1
+            self._cond.notify_all()
+
+    def allowed(self, url: str) -> bool:
+        return self.robots is None or self.robots.can_fetch(USER_AGENT, url)
+
+class CrawlScope:
+    """The pages one tool's crawl may visit, and those it has claimed so far.
+
+    Discovered links must be on the tool's host and under one of its path
+    prefixes (by default the first segment of each scrape path, e.g.
+    /docs). At most `max_pages` URLs are claimed per crawl.
+    """
+
+    def __init__(self, tool_name: str, config: ToolConfig):
+        self.tool_name = tool_name
+        self.config = config
+        self.seeds = list(dict.fromkeys(
+            normalize_url(urljoin(config.base_url, path)) for path in config.scrape_paths
+        ))
+        self.host = urlsplit(normalize_url(config.base_url)).netloc
+        self.prefixes = config.path_prefixes or sorted({
+            "/" + path.strip("/").split("/")[0] for path in config.scrape_paths
         })
+        self.visited: Set[str] = set()
+        # Set once the page budget turns away a new URL
+        self.truncated = False
+        self._lock = threading.Lock()
+
+    @property
+    def root(self) -> str:
+        return f"{urlsplit(normalize_url(self.config.base_url)).scheme}://{self.host}"
+
+    def in_scope(self, url: str) -> bool:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or parts.netloc != self.host:
+            return False
+        if parts.path.lower().endswith(SKIP_EXTENSIONS):
+            return False
+        return any(prefix == "/" or parts.path == prefix.rstrip("/")
+                   or parts.path.startswith(prefix.rstrip("/") + "/") for prefix in self.prefixes)
+
+    def claim(self, url: str) -> bool:
+        """Mark a URL visited if it is new and the page budget allows it"""
+        with self._lock:
+            if url in self.visited:
+                return False
+            if len(self.visited) >= self.config.max_pages:
+                self.truncated = True
+                return False
+            self.visited.add(url)
+            return True
 
-    def scrape_tool(self, tool_name: str) -> List[str]:
+class UniversalScraper:
+    def __init__(self, max_workers: int = 16,
+                 manifest: Optional[PageManifest] = None,
+                 on_page: Optional[Callable[[str, str, int], None]] = None,
+                 cancel_event: Optional[threading.Event] = None,
+                 max_pending: int = 32,
+                 on_discover: Optional[Callable[[str, str], None]] = None,
+                 force: bool = False,
+                 extractor: Optional[Extractor] = None):
+        self.max_workers = max_workers
+        # Parsed pages iter_pages buffers before fetch workers wait for the consumer
+        self.max_pending = max_pending
+        # When set, pages are fetched conditionally and unchanged ones are skipped
+        self.manifest = manifest
+        # HTML parsing backend, by default the fastest one installed
+        self.extractor = extractor or get_extractor()
+        # Refetch and re-parse every page even if the manifest says it is unchanged
+        self.force = force
+        # Called as on_discover(tool_name, url) when a page is queued for crawling
+        self.on_discover = on_discover
+        # Progress hook called as on_page(tool_name, url, chunk_count) after each page
+        self.on_page = on_page
+        # Setting this event stops the crawl after the pages already in flight
+        self.cancel_event = cancel_event
+        self.stats = {"fetched": 0, "not_modified": 0, "unchanged": 0, "error": 0}
+        # Tools whose last crawl missed pages (fetch errors or the page budget)
+        self.incomplete: Set[str] = set()
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        """One requests.Session per worker thread (sessions are not thread-safe)"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({'User-Agent': USER_AGENT})
+            self._local.session = session
+        return session
+
+    def scrape_tool(self, tool_name: str) -> List[Chunk]:
         """Scrape documentation for a specific tool"""
         config = get_tool_config(tool_name)
         if not config:
@@ -23,117 +216,298 @@ class UniversalScraper:
             print(f"Tool {tool_name} is disabled")
             return []
 
-        print(f"Scraping {config.name} documentation...")
-        chunks = []
-        visited = set()
-
-        for path in config.scrape_paths:
-            url = urljoin(config.base_url, path)
-            if url in visited:
-                continue
-            
-            try:
-                content = self._scrape_page(url, config)
-                if content:
-                    chunks.extend(content)
-                visited.add(url)
-                time.sleep(config.delay)
-                
-            except Exception as e:
-                print(f"Error scraping {url}: {str(e)}")
-                continue
-
-        print(f"Scraped {len(chunks)} chunks from {config.name}")
-        return chunks
+        return self.crawl({tool_name: config})[tool_name]
 
-    def scrape_all_tools(self) -> List[str]:
+    def scrape_all_tools(self) -> List[Chunk]:
         """Scrape all enabled tools and return a flat list of chunks"""
         all_chunks = []
-        
-        for tool_name, config in get_enabled_tools().items():
-            try:
-                chunks = self.scrape_tool(tool_name)
-                all_chunks.extend(chunks)
-            except Exception as e:
-                print(f"Failed to scrape {tool_name}: {str(e)}")
-                continue
-        
+        for chunks in self.scrape_all_tools_dict().values():
+            all_chunks.extend(chunks)
         return all_chunks
 
     def scrape_all_tools_dict(self) -> dict:
         """Scrape all enabled tools and return organized chunks by tool"""
-        all_chunks = {}
-        
-        for tool_name, config in get_enabled_tools().items():
+        return self.crawl(get_enabled_tools())
+
+    def crawl(self, configs: Dict[str, ToolConfig]) -> Dict[str, List[Chunk]]:
+        """Crawl several tools concurrently and collect all their chunks.
+
+        Chunks come back grouped by tool, in the order pages finished. Use
+        iter_pages to process pages as they arrive instead of holding the
+        whole crawl in memory.
+        """
+        all_chunks = {tool_name: [] for tool_name in configs}
+        for tool_name, url, chunks in self.iter_pages(configs):
+            all_chunks[tool_name].extend(chunks)
+        for tool_name, config in configs.items():
+            print(f"Scraped {len(all_chunks[tool_name])} chunks from {config.name}")
+        return all_chunks
+
+    def iter_pages(self, configs: Dict[str, ToolConfig]) -> Iterator[Tuple[str, str, List[Chunk]]]:
+        """Yield (tool_name, url, chunks) for each page as soon as it is parsed.
+
+        Each tool is crawled breadth-first from its `scrape_paths` (plus its
+        host's sitemap), following in-scope links up to `max_depth` hops
+        and `max_pages` pages; see CrawlScope. Each host has its own
+        frontier drained by up to `max_concurrency` workers, so different
+        hosts are fetched in parallel while every host is held to its
+        tools' `delay` (or its robots.txt Crawl-delay, if longer) and its
+        robots.txt rules. Tools sharing a host get the longest delay and
+        the smallest `max_concurrency` among them. Parsed pages wait in a queue of at most
+        `max_pending` pages, so a slow consumer (e.g. the embedder) pauses
+        the crawl instead of letting memory grow. Pages arrive in completion
+        order; closing the generator stops the crawl.
+        """
+        self.incomplete = set()
+        scopes = {tool_name: CrawlScope(tool_name, config) for tool_name, config in configs.items()}
+        by_host: Dict[str, List[CrawlScope]] = {}
+        for scope in scopes.values():
+            print(f"Scraping {scope.config.name} documentation...")
+            by_host.setdefault(scope.host, []).append(scope)
+        if not by_host:
+            return
+        # Tools on one host share its limiter, held to the strictest of their settings
+        hosts: Dict[str, Tuple[HostFrontier, List[CrawlScope]]] = {}
+        for host, same_host in by_host.items():
+            limiter = HostLimiter(max(scope.config.delay for scope in same_host),
+                                  min(scope.config.max_concurrency for scope in same_host))
+            hosts[host] = (HostFrontier(limiter), same_host)
+
+        host_workers = []
+        for frontier, _ in hosts.values():
+            host_workers.append([frontier] * frontier.limiter.max_concurrency)
+        # Interleave hosts so a capped pool still starts every host right away
+        workers = [worker for round_ in zip_longest(*host_workers) for worker in round_ if worker]
+
+        pages: "queue.Queue" = queue.Queue(maxsize=max(1, self.max_pending))
+        stop = threading.Event()
+        finished = object()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def run():
+            try:
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(hosts) + len(workers)),
+                                        thread_name_prefix="scraper") as pool:
+                    # Seeding tasks go first so they get threads before the workers waiting on them
+                    futures = [pool.submit(self._seed_host, frontier, host_scopes)
+                               for frontier, host_scopes in hosts.values()]
+                    futures += [pool.submit(self._drain_host, frontier, scopes, put, stop)
+                                for frontier in workers]
+                    for future in futures:
+                        future.result()
+            finally:
+                put(finished)
+
+        threading.Thread(target=run, name="scraper-pages", daemon=True).start()
+        try:
+            while True:
+                item = pages.get()
+                if item is finished:
+                    return
+                yield item
+        finally:
+            stop.set()
+
+    def _seed_host(self, frontier: HostFrontier, scopes: List[CrawlScope]):
+        """Load robots.txt, then queue each tool's scrape paths and sitemap pages"""
+        try:
+            root = scopes[0].root
+            frontier.robots = self._load_robots(root, frontier.limiter)
+            for scope in scopes:
+                for url in scope.seeds:
+                    self._admit(frontier, scope, url, 0)
+
+            sitemap_scopes = [scope for scope in scopes if scope.config.use_sitemap and scope.config.max_depth > 0]
+            if sitemap_scopes:
+                sitemaps = (frontier.robots.site_maps() if frontier.robots else None) or [f"{root}/sitemap.xml"]
+                for url in self._sitemap_urls(sitemaps, frontier.limiter):
+                    url = normalize_url(url)
+                    for scope in sitemap_scopes:
+                        if scope.in_scope(url):
+                            # Claimed only when dequeued, after the pages linked from the seeds
+                            frontier.put((scope.tool_name, url, 1, True))
+        except Exception as e:
+            print(f"Error seeding crawl of {scopes[0].host}: {str(e)}")
+        finally:
+            frontier.task_done()
+
+    def _load_robots(self, root: str, limiter: HostLimiter) -> Optional[RobotFileParser]:
+        """Fetch a host's robots.txt; None (everything allowed) if it has none"""
+        try:
+            with limiter:
+                response = self.session.get(f"{root}/robots.txt", timeout=10)
+            if response.status_code != 200:
+                return None
+        except Exception as e:
+            print(f"Could not fetch {root}/robots.txt: {str(e)}")
+            return None
+        robots = RobotFileParser(f"{root}/robots.txt")
+        robots.parse(response.text.splitlines())
+        crawl_delay = robots.crawl_delay(USER_AGENT)
+        if crawl_delay:
+            limiter.delay = max(limiter.delay, float(crawl_delay))
+        return robots
+
+    def _sitemap_urls(self, sitemaps: List[str], limiter: HostLimiter) -> List[str]:
+        """Page URLs listed in the given sitemaps, following sitemap indexes"""
+        pending, seen, urls = deque(sitemaps), set(), []
+        while pending and len(seen) < MAX_SITEMAPS:
+            sitemap = pending.popleft()
+            if sitemap in seen:
+                continue
+            seen.add(sitemap)
             try:
-                chunks = self.scrape_tool(tool_name)
-                all_chunks[tool_name] = chunks
+                with limiter:
+                    response = self.session.get(sitemap, timeout=10)
+                if response.status_code != 200:
+                    continue
+                root = ElementTree.fromstring(response.content)
             except Exception as e:
-                print(f"Failed to scrape {tool_name}: {str(e)}")
-                all_chunks[tool_name] = []
-        
-        return all_chunks
+                print(f"Skipping sitemap {sitemap}: {str(e)}")
+                continue
+            locs = [el.text.strip() for el in root.iter() if el.tag.endswith("loc") and el.text]
+            if root.tag.endswith("sitemapindex"):
+                pending.extend(locs)
+            else:
+                urls.extend(locs)
+        return urls
+
+    def _claim(self, frontier: HostFrontier, scope: CrawlScope, url: str) -> bool:
+        """Take a URL from the tool's page budget if robots.txt allows it and it is new"""
+        if not frontier.allowed(url) or not scope.claim(url):
+            if scope.truncated:
+                self.incomplete.add(scope.tool_name)
+            return False
+        if self.on_discover:
+            self.on_discover(scope.tool_name, url)
+        return True
+
+    def _admit(self, frontier: HostFrontier, scope: CrawlScope, url: str, depth: int):
+        """Queue a URL for the tool if robots.txt and its page budget allow"""
+        if self._claim(frontier, scope, url):
+            frontier.put((scope.tool_name, url, depth, False))
 
-    def _scrape_page(self, url: str, config: ToolConfig) -> List[str]:
+    def _drain_host(self, frontier: HostFrontier, scopes: Dict[str, CrawlScope],
+                    put: Callable[[tuple], bool], stop: threading.Event):
+        """Worker loop: fetch pages from one host's frontier until it is exhausted"""
+        def stopped() -> bool:
+            return stop.is_set() or bool(self.cancel_event and self.cancel_event.is_set())
+
+        while True:
+            item = frontier.get(stopped)
+            if item is None:
+                return
+            tool_name, url, depth, deferred = item
+            scope = scopes[tool_name]
+            if deferred and not self._claim(frontier, scope, url):
+                frontier.task_done(depth)
+                continue
+            try:
+                try:
+                    with frontier.limiter:
+                        chunks, links = self._fetch_page(url, scope.config, tool_name)
+                except Exception as e:
+                    chunks, links = [], self._fetch_failed(url, tool_name, e)
+                if depth < scope.config.max_depth:
+                    for link in links:
+                        if scope.in_scope(link):
+                            self._admit(frontier, scope, link, depth + 1)
+            finally:
+                # Only after queueing the page's links, so idle workers don't quit early
+                frontier.task_done(depth)
+            if self.on_page:
+                self.on_page(tool_name, url, len(chunks))
+            if not put((tool_name, url, chunks)):
+                return
+
+    def _count(self, stat: str):
+        with self._stats_lock:
+            self.stats[stat] += 1
+        PAGES.inc(result=stat)
+
+    def _fetch_failed(self, url: str, tool_name: str, error: Exception) -> List[str]:
+        """Record a page that could not be fetched; returns the links it had last time.
+
+        A transient error on an index page would otherwise hide every page
+        reachable only through it, as the 304 path would not.
+        """
+        log_event("page_fetch_failed", logging.WARNING, tool=tool_name, url=url, error=str(error))
+        self._count("error")
+        self.incomplete.add(tool_name)
+        previous = self.manifest.get(url) if self.manifest is not None else None
+        return (previous or {}).get("links", [])
+
+    def _scrape_page(self, url: str, config: ToolConfig, tool_name: str) -> List[Chunk]:
         """Scrape a single page based on tool configuration"""
+        return self._fetch_page(url, config, tool_name)[0]
+
+    def _fetch_page(self, url: str, config: ToolConfig, tool_name: str) -> Tuple[List[Chunk], List[str]]:
+        """Fetch and parse one page, returning its chunks and the links on it.
+
+        With a manifest, the request is conditional and pages that come back
+        304 or with an unchanged body return no chunks, since their chunks
+        are already in the store; their links are taken from the manifest so
+        the crawl can still go past them.
+        """
         try:
-            response = self.session.get(url, timeout=10)
+            use_manifest = self.manifest is not None and not self.force
+            headers = self.manifest.conditional_headers(url) if use_manifest else {}
+            with span("page_fetch"):
+                response = self.session.get(url, headers=headers, timeout=10)
+            previous = self.manifest.get(url) if use_manifest else None
+            if response.status_code == 304:
+                self._count("not_modified")
+                return [], (previous or {}).get("links", [])
             response.raise_for_status()
+
+            page_hash = content_hash(response.content)
+            if previous and previous.get("content_hash") == page_hash:
+                # Server ignored the validators but the body is identical
+                self.manifest.record(url, response.headers.get("ETag"),
+                                     response.headers.get("Last-Modified"),
+                                     page_hash, previous.get("chunk_hashes", []),
+                                     previous.get("links", []))
+                self._count("unchanged")
+                return [], previous.get("links", [])
+            self._count("fetched")
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # remove excluded elements
-            if 'exclude' in config.selectors:
-                for element in soup.select(config.selectors['exclude']):
-                    element.decompose()
-            
-            # extract content
-            content_elements = soup.select(config.selectors['content'])
-            if not content_elements:
-                # fallback to common content selectors
-                content_elements = soup.select('article, main, .content, .documentation')
-            
-            chunks = []
-            for element in content_elements:
-                # get title if available
-                title_elem = element.select_one(config.selectors.get('title', 'h1, h2, h3'))
-                title = title_elem.get_text().strip() if title_elem else ""
+            with span("page_parse"):
+                page = self.extractor.extract(response.content, config.selectors)
+                
+                # links come from the whole page, nav and sidebars included, they hold most of them
+                host = urlsplit(normalize_url(response.url or url)).netloc
+                links = []
+                for href in page.links:
+                    link = normalize_url(urljoin(response.url or url, href))
+                    if link.startswith(("http://", "https://")) and urlsplit(link).netloc == host:
+                        links.append(link)
+                links = list(dict.fromkeys(links))
                 
-                # get text content
-                text = element.get_text().strip()
-                if text and len(text) > 100:  # only include substantial content
-                    # add source information
-                    chunk = f"Source: {config.name} - {title}\nURL: {url}\n\n{text}"
-                    chunks.append(chunk)
+                chunks = []
+                for title, text in page.blocks:
+                    if text and len(text) > 100:  # only include substantial content
+                        for section, body in chunk_page(text, config.chunk_tokens, config.chunk_overlap):
+                            chunks.append(Chunk(text=body, tool=tool_name, tool_name=config.name,
+                                                title=title, url=url, section=section))
+
+            if self.manifest:
+                self.manifest.record(url, response.headers.get("ETag"),
+                                     response.headers.get("Last-Modified"),
+                                     page_hash, [content_hash(chunk.text) for chunk in chunks],
+                                     links)
             
-            return chunks
+            return chunks, links
             
         except Exception as e:
-            print(f"Error scraping {url}: {str(e)}")
-            return []
-
-    def _chunk_text(self, text: str, max_chunk_size: int = 1500) -> List[str]:
-        """Split long text into smaller chunks"""
-        if len(text) <= max_chunk_size:
-            return [text]
-        
-        # split on paragraphs first
-        paragraphs = text.split('\n\n')
-        chunks = []
-        current_chunk = ""
-        
-        for para in paragraphs:
-            if len(current_chunk + para) <= max_chunk_size:
-                current_chunk += para + "\n\n"
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = para + "\n\n"
-        
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-        
-        return chunks
+            return [], self._fetch_failed(url, tool_name, e)
 
 # Legacy functions for backward compatibility
 def scrape_stripe_docs():
@@ -0,0 +1,93 @@
+import os
+import shutil
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+
+def snapshot_root(persist_dir: str) -> str:
+    """Where snapshots of a store live by default: a sibling `<persist_dir>_snapshots` directory"""
+    return f"{os.path.normpath(persist_dir)}_snapshots"
+
+
+def _copy_sqlite(source: str, dest: str):
+    # The backup API gives a consistent copy, including pages still in the WAL file
+    src = sqlite3.connect(source)
+    try:
+        dst = sqlite3.connect(dest)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+    finally:
+        src.close()
+
+
+def create_snapshot(persist_dir: str, name: Optional[str] = None, root: Optional[str] = None) -> str:
+    """Copy the persisted store (Chroma, BM25 index, page manifest) into a new snapshot directory.
+
+    SQLite files are copied with the backup API, so they are consistent even
+    while being read. Take snapshots while no ingestion job is running:
+    Chroma's vector index files are plain copies. The snapshot directory
+    only appears once the copy is complete.
+    """
+    root = root or snapshot_root(persist_dir)
+    dest = os.path.join(root, name or time.strftime("%Y%m%d-%H%M%S"))
+    if os.path.exists(dest):
+        raise FileExistsError(f"Snapshot {dest} already exists")
+    partial = f"{dest}.partial"
+    shutil.rmtree(partial, ignore_errors=True)
+
+    for dirpath, _, filenames in os.walk(persist_dir):
+        target_dir = os.path.join(partial, os.path.relpath(dirpath, persist_dir))
+        os.makedirs(target_dir, exist_ok=True)
+        for filename in filenames:
+            source = os.path.join(dirpath, filename)
+            if filename.endswith(("-wal", "-shm", "-journal", ".tmp")):
+                continue  # folded into the backup copy, or a half-written file
+            if filename.endswith((".sqlite3", ".sqlite", ".db")):
+                _copy_sqlite(source, os.path.join(target_dir, filename))
+            else:
+                shutil.copy2(source, os.path.join(target_dir, filename))
+
+    os.replace(partial, dest)
+    return dest
+
+
+def list_snapshots(persist_dir: str, root: Optional[str] = None) -> List[Dict[str, object]]:
+    """Complete snapshots of a store, oldest first"""
+    root = root or snapshot_root(persist_dir)
+    if not os.path.isdir(root):
+        return []
+    snapshots = []
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if name.endswith(".partial") or not os.path.isdir(path):
+            continue
+        size = sum(os.path.getsize(os.path.join(dirpath, filename))
+                   for dirpath, _, filenames in os.walk(path) for filename in filenames)
+        snapshots.append({"name": name, "path": path, "bytes": size})
+    return snapshots
+
+
+def restore_snapshot(snapshot: str, persist_dir: str, root: Optional[str] = None) -> str:
+    """Replace the persisted store with a snapshot (a name under the snapshot root, or a path).
+
+    The snapshot is copied next to the store first and then renamed into
+    place, so an interrupted restore leaves the old store untouched. Stop
+    the server first; it keeps the store's files open.
+    """
+    source = snapshot if os.path.isdir(snapshot) else os.path.join(root or snapshot_root(persist_dir), snapshot)
+    if not os.path.isdir(source):
+        raise FileNotFoundError(f"No snapshot at {source}")
+
+    persist_dir = os.path.normpath(persist_dir)
+    incoming, outgoing = f"{persist_dir}.restoring", f"{persist_dir}.replaced"
+    shutil.rmtree(incoming, ignore_errors=True)
+    shutil.copytree(source, incoming)
+    if os.path.exists(persist_dir):
+        shutil.rmtree(outgoing, ignore_errors=True)
+        os.rename(persist_dir, outgoing)
+    os.rename(incoming, persist_dir)
+    shutil.rmtree(outgoing, ignore_errors=True)
+    return source
@@ -0,0 +1,62 @@
+import os
+import re
+import sys
+import zlib
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embeddings import EmbeddingProvider  # noqa: E402
+
+
+class HashedBagOfWords(EmbeddingProvider):
+    """Deterministic offline embeddings: each word hashed into one of 64 dimensions"""
+    name = "test-bow"
+
+    def _embed(self, texts):
+        vectors = np.zeros((len(texts), 64), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                vectors[row, zlib.crc32(word.encode()) % 64] += 1
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+@pytest.fixture
+def provider():
+    return HashedBagOfWords()
+
+
+@pytest.fixture
+def make_store(tmp_path, provider, monkeypatch):
+    """Factory for EmbedStores on a temporary directory, embedding with HashedBagOfWords"""
+    from embed_store import EmbedStore
+
+    monkeypatch.delenv("CHROMA_SERVER_URL", raising=False)
+    monkeypatch.setenv("SEARCH_BACKEND", "chroma")
+    monkeypatch.setenv("EMBED_WORKERS", "1")
+    persist_dir = str(tmp_path / "chroma_store")
+
+    def make(**kwargs):
+        kwargs.setdefault("embedding_provider", provider)
+        return EmbedStore(persist_dir, **kwargs)
+
+    return make
+
+
+def init_test_embed_worker(provider_spec):
+    """Pool initializer that registers HashedBagOfWords before building the provider"""
+    import embed_store
+    import embeddings
+
+    embeddings.PROVIDERS[HashedBagOfWords.name] = HashedBagOfWords
+    embed_store._init_embed_worker(provider_spec)
+
+
+@pytest.fixture
+def embed_pool(monkeypatch):
+    """Lets bulk-ingest worker processes (spawned, so they import afresh) embed with HashedBagOfWords"""
+    import embed_store
+
+    monkeypatch.setattr(embed_store, "_init_embed_worker", init_test_embed_worker)
@@ -0,0 +1,100 @@
+import threading
+
+import numpy as np
+import pytest
+
+import answer_cache as answer_cache_module
+from answer_cache import AnswerCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic for the cache's TTL checks"""
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_exact_hits_ignore_case_whitespace_and_trailing_punctuation():
+    cache = AnswerCache()
+    cache.put("How do  refunds work?", ["stripe"], {"answer": "refunds"}, mode="hybrid")
+    assert cache.get("how do refunds work", ["stripe"], "hybrid") == {"answer": "refunds"}
+    assert cache.get("How do refunds work?", ["react"], "hybrid") is None
+    assert cache.get("How do refunds work?", ["stripe"], "vector") is None
+    assert cache.stats()["exact_hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = AnswerCache(ttl=60, similarity_threshold=0.9)
+    cache.put("question", None, {"answer": "a"}, embedding=[1.0, 0.0])
+    clock[0] += 59
+    assert cache.get("question") == {"answer": "a"}
+    clock[0] += 2
+    assert cache.get("question") is None
+    assert cache.get_similar([1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnswerCache(max_entries=2)
+    cache.put("first", None, {"answer": 1})
+    cache.put("second", None, {"answer": 2})
+    cache.get("first")
+    cache.put("third", None, {"answer": 3})
+    assert cache.get("second") is None
+    assert cache.get("first") == {"answer": 1}
+
+
+def test_similar_questions_hit_above_the_threshold_only():
+    cache = AnswerCache(similarity_threshold=0.95)
+    cache.put("how do I refund a charge", ["stripe"], {"answer": "refund"}, embedding=[3.0, 4.0, 0.0], mode="hybrid")
+
+    close = np.array([3.0, 4.0, 0.5])  # cosine ~0.995 with the cached question
+    far = np.array([4.0, 3.0, 2.0])    # cosine ~0.89
+    assert cache.get_similar(close * 10, ["stripe"], "hybrid") == {"answer": "refund"}
+    assert cache.get_similar(close, ["react"], "hybrid") is None
+    assert cache.get_similar(close, ["stripe"], "lexical") is None
+    assert cache.get_similar(far, ["stripe"], "hybrid") is None
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_semantic_layer_is_off_without_a_threshold():
+    cache = AnswerCache()
+    cache.put("question", None, {"answer": "a"}, embedding=[1.0, 0.0])
+    assert not cache.semantic_enabled
+    assert cache.get_similar([1.0, 0.0]) is None
+
+
+def test_sync_drops_entries_when_the_corpus_version_changes():
+    cache = AnswerCache()
+    assert cache.sync((1, 100))
+    cache.put("question", None, {"answer": "a"})
+    assert not cache.sync((1, 100))
+    assert cache.get("question") == {"answer": "a"}
+    assert cache.sync((1, 200))
+    assert cache.get("question") is None
+
+
+def test_concurrent_readers_writers_and_clears():
+    cache = AnswerCache(max_entries=16, similarity_threshold=0.9)
+    errors = []
+
+    def work(worker):
+        try:
+            for i in range(300):
+                cache.put(f"q{worker}-{i}", None, {"answer": i}, embedding=[1.0, float(i % 7)])
+                cache.get(f"q{worker}-{i - 1}")
+                cache.get_similar([1.0, float(i % 7)])
+                if i % 50 == 0:
+                    cache.clear()
+        except Exception as e:  # e.g. "OrderedDict mutated during iteration"
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert cache.stats()["entries"] <= 16
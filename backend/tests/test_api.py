@@ -0,0 +1,205 @@
+import asyncio
+import json
+import re
+import types
+
+import httpx
+import pytest
+
+import main
+from answer_cache import AnswerCache
+from chunking import Chunk
+from concurrency import RequestLimiter
+from metrics import REGISTRY
+
+
+def post(path: str, **kwargs) -> httpx.Response:
+    async def send():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, **kwargs)
+    return asyncio.run(send())
+
+
+@pytest.mark.parametrize("body", [
+    {"question": 42},
+    {"question": ["how", "do", "hooks", "work"]},
+    {"question": None},
+    {"question": "   "},
+    {},
+    ["not", "an", "object"],
+])
+def test_ask_rejects_invalid_questions(body):
+    response = post("/ask", json=body)
+    assert response.status_code == 400
+
+
+def test_ask_rejects_malformed_json():
+    response = post("/ask", content=b"{not json", headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+
+
+def test_ask_batch_rejects_non_object_body():
+    assert post("/ask/batch", json=["what is a hook?"]).status_code == 400
+
+
+class StubCompletions:
+    """Stands in for DeepSeek: answers after a per-question delay, or fails for listed questions.
+
+    Streamed answers come a word at a time, and a failing question fails after its first word.
+    """
+
+    def __init__(self, delays=None, failing=()):
+        self.delays = delays or {}
+        self.failing = set(failing)
+
+    async def create(self, model, messages, stream=False, **kwargs):
+        question = re.search(r"^Question: (.*)$", messages[-1]["content"], re.M).group(1)
+        await asyncio.sleep(self.delays.get(question, 0))
+        if stream:
+            return self._stream(question)
+        if question in self.failing:
+            raise RuntimeError(f"LLM unavailable for {question!r}")
+        message = types.SimpleNamespace(content=f"Answer to {question}")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+
+    async def _stream(self, question):
+        for word in f"Answer to {question}".split(" "):
+            delta = types.SimpleNamespace(content=word + " ")
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)])
+            if question in self.failing:
+                raise RuntimeError("connection reset mid-answer")
+
+
+@pytest.fixture
+def llm(make_store, monkeypatch):
+    """The app answering from a small store, with DeepSeek replaced by a StubCompletions"""
+    store = make_store()
+    store.add_chunks([
+        Chunk(text="Webhooks are signed with an endpoint secret in the Stripe-Signature header.", tool="stripe",
+              tool_name="Stripe", title="Webhooks", url="https://docs.example/stripe/webhooks"),
+        Chunk(text="Refunds are issued to the original payment method within ten days.", tool="stripe",
+              tool_name="Stripe", title="Refunds", url="https://docs.example/stripe/refunds"),
+        Chunk(text="Components re-render when their state or props change.", tool="react",
+              tool_name="React", title="Rendering", url="https://docs.example/react/render"),
+    ])
+    monkeypatch.setattr(main.warmup, "_store", store)
+    monkeypatch.setattr(main, "answer_cache", AnswerCache())
+    completions = StubCompletions()
+    monkeypatch.setattr(main, "client", types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions)))
+    return completions
+
+
+def ndjson(response: httpx.Response) -> list:
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_ask_batch_streams_answers_in_completion_order(llm):
+    questions = ["How are webhooks signed?", "How do refunds work?", "When do components re-render?"]
+    llm.delays = {questions[0]: 0.3, questions[1]: 0.15}
+
+    response = post("/ask/batch", json={"questions": questions})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = ndjson(response)
+    assert [line["index"] for line in lines[:-1]] == [2, 1, 0]
+    for line in lines[:-1]:
+        assert line["question"] == questions[line["index"]]
+        assert line["answer"] == f"Answer to {line['question']}"
+        assert line["sources"]
+    assert lines[-1] == {"done": True, "questions": 3, "answered": 3, "failed": 0, "cached": 0}
+
+
+def test_ask_batch_reports_a_failed_question_and_carries_on(llm):
+    questions = ["How are webhooks signed?", "How do refunds work?"]
+    llm.failing = {questions[0]}
+
+    lines = ndjson(post("/ask/batch", json={"questions": questions}))
+    by_index = {line["index"]: line for line in lines[:-1]}
+    assert "LLM unavailable" in by_index[0]["error"] and "answer" not in by_index[0]
+    assert by_index[1]["answer"] == "Answer to How do refunds work?"
+    assert lines[-1]["done"] and (lines[-1]["answered"], lines[-1]["failed"]) == (1, 1)
+
+    # Answered questions are cached, so a second batch only asks the LLM again for the failed one
+    llm.failing = set()
+    lines = ndjson(post("/ask/batch", json={"questions": questions}))
+    assert (lines[-1]["answered"], lines[-1]["cached"]) == (1, 1)
+    assert lines[0]["index"] == 1  # cached answers come first
+
+
+def test_ask_batch_rejects_too_many_questions(llm, monkeypatch):
+    monkeypatch.setattr(main, "ASK_BATCH_MAX_QUESTIONS", 2)
+    response = post("/ask/batch", json={"questions": ["one?", "two?", "three?"]})
+    assert response.status_code == 400
+    assert "At most 2 questions" in response.json()["detail"]
+    assert post("/ask/batch", json={"questions": ["How do refunds work?", "How are webhooks signed?"]}) \
+        .status_code == 200
+
+
+def sse(response: httpx.Response) -> list:
+    """(event, data) pairs of a text/event-stream body"""
+    events = []
+    for block in response.text.split("\n\n"):
+        if block.strip():
+            fields = dict(line.split(": ", 1) for line in block.splitlines())
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_ask_stream_sends_sources_tokens_and_done(llm):
+    response = post("/ask/stream", json={"question": "How are webhooks signed?", "tools": ["stripe"]})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = sse(response)
+
+    assert events[0][0] == "sources"
+    assert events[0][1]["sources"][0]["url"] == "https://docs.example/stripe/webhooks"
+    assert {name for name, _ in events[1:-1]} == {"token"}
+    assert "".join(data["text"] for _, data in events[1:-1]) == "Answer to How are webhooks signed? "
+    assert events[-1] == ("done", {})
+
+    # The streamed answer was cached: a repeat is replayed without the LLM
+    llm.failing = {"How are webhooks signed?"}
+    replay = sse(post("/ask/stream", json={"question": "How are webhooks signed?", "tools": ["stripe"]}))
+    assert [name for name, _ in replay][0] == "sources" and replay[-1] == ("done", {})
+
+
+def test_ask_stream_reports_a_mid_stream_failure(llm):
+    llm.failing = {"How do refunds work?"}
+    events = sse(post("/ask/stream", json={"question": "How do refunds work?"}))
+    assert [name for name, _ in events] == ["sources", "token", "error"]
+    assert "connection reset" in events[-1][1]["detail"]
+    # A failed answer is not cached
+    llm.failing = set()
+    assert sse(post("/ask/stream", json={"question": "How do refunds work?"}))[-1] == ("done", {})
+
+
+def test_ask_reports_an_embedding_model_mismatch_as_conflict(make_store, provider, monkeypatch):
+    make_store().add_chunks([Chunk(text="Webhooks are signed with an endpoint secret.", tool="stripe",
+                                   tool_name="Stripe", title="Webhooks", url="https://docs.example/webhooks")])
+    store = make_store(embedding_provider=type(provider)(dimensions=32))
+    monkeypatch.setattr(main.warmup, "_store", store)
+
+    response = post("/ask", json={"question": "How are webhooks signed?"})
+    assert response.status_code == 409
+    assert "rebuild" in response.json()["detail"]
+
+
+def test_limiter_saturation_is_exported_as_gauges():
+    limiter = RequestLimiter(max_concurrent=1, max_queue=4, name="test")
+
+    async def saturate():
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        rendered = REGISTRY.render()
+        limiter.release()
+        await waiter
+        return rendered
+
+    rendered = asyncio.run(saturate())
+    assert 'documind_requests_in_flight{limiter="test"} 1' in rendered
+    assert 'documind_request_queue_depth{limiter="test"} 1' in rendered
+    assert "# TYPE documind_request_queue_depth gauge" in rendered
+    limiter.release()
+    assert 'documind_requests_in_flight{limiter="test"} 0' in REGISTRY.render()
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from chunking import HEADING_MARKER, chunk_page, count_tokens
+
+WORDS = "payment intent webhook refund customer invoice session component state render".split()
+
+
+def page(sections, seed=0):
+    """Marked-up page text with a heading per (title, body words, sentence length) section"""
+    rng = random.Random(seed)
+    parts = []
+    for title, words, sentence in sections:
+        body = " ".join(f"{rng.choice(WORDS)}{'.' if (i + 1) % sentence == 0 else ''}" for i in range(words))
+        parts.append(f"{HEADING_MARKER}{title}\n{body}")
+    return "\n".join(parts)
+
+
+@pytest.mark.parametrize("max_tokens", [50, 120, 200])
+@pytest.mark.parametrize("sections", [
+    [("Overview", 900, 12)],                                   # one long section, windowed
+    [(f"Step {i} of the guide", 12, 6) for i in range(40)],    # many short ones, merged
+    [("Intro", 30, 10), ("Reference", 700, 1000), ("Tips", 25, 5), ("Errors", 8, 4)],  # no sentence breaks
+])
+def test_chunk_bodies_stay_within_the_token_budget(sections, max_tokens):
+    pieces = chunk_page(page(sections), max_tokens, overlap=20)
+    assert pieces
+    assert all(count_tokens(body) <= max_tokens for _, body in pieces)
+
+
+def test_long_sections_are_windowed_with_overlap_under_their_heading():
+    pieces = chunk_page(page([("Overview", 600, 10)]), 100, overlap=20)
+    assert len(pieces) > 5
+    assert {heading for heading, _ in pieces} == {"Overview"}
+    for (_, previous), (_, current) in zip(pieces, pieces[1:]):
+        assert current.split()[0] in previous.split()[-25:]
+
+
+def test_small_sections_merge_and_keep_the_first_heading():
+    pieces = chunk_page(page([("Install", 15, 5), ("Configure", 15, 5), ("Deploy", 15, 5)]), 200, overlap=0)
+    assert len(pieces) == 1
+    heading, body = pieces[0]
+    assert heading == "Install"
+    assert "Configure\n" in body and "Deploy\n" in body
+
+
+def test_budget_has_a_floor_and_debris_is_dropped():
+    pieces = chunk_page(page([("Long", 300, 10)]) + f"{HEADING_MARKER}Footer\nCopyright", 10, overlap=0)
+    assert all(count_tokens(body) <= 50 for _, body in pieces)
+    assert max(count_tokens(body) for _, body in pieces) > 10
+    assert "Footer" not in {heading for heading, _ in pieces}
@@ -0,0 +1,73 @@
+import random
+
+from chunking import count_tokens
+from context import _shingles, assemble_context, dedupe, rerank
+from main import CONTEXT_DUPLICATE_THRESHOLD
+
+
+def result(content, title="", section="", rank=0):
+    return {"id": f"chunk-{rank}", "content": content, "metadata": {"title": title, "section": section}}
+
+
+def plain(item):
+    return item["content"]
+
+
+def jaccard(a, b):
+    first, second = _shingles(a), _shingles(b)
+    return len(first & second) / len(first | second)
+
+
+def test_rerank_orders_by_query_term_overlap():
+    results = [
+        result("Components re-render when their state changes.", rank=0),
+        result("A refund goes back to the original payment method.", rank=1),
+        result("A refund of a charge returns the payment; partial refunds of a charge are allowed.", rank=2),
+    ]
+    ranked = rerank("how do I refund a charge", results)
+    assert [item["id"] for item in ranked] == ["chunk-2", "chunk-1", "chunk-0"]
+    assert ranked[0]["rerank_score"] > ranked[1]["rerank_score"] > ranked[2]["rerank_score"]
+
+
+def test_rerank_keeps_retrieval_order_when_overlap_ties():
+    same = "Configure the client before sending requests."
+    results = [result(same, rank=rank) for rank in range(3)]
+    assert [item["id"] for item in rerank("client requests", results)] == ["chunk-0", "chunk-1", "chunk-2"]
+    # Nothing to rerank by: the retrieval order stands
+    assert rerank("", results) == results
+
+
+def test_near_duplicates_are_dropped_at_the_configured_threshold():
+    base = ("Webhook endpoints must verify the signature header of every event they receive "
+            "before trusting its payload or acting on it in any way")
+    near = base + " at all"
+    distinct = "Webhook endpoints must verify the signature header, then return 2xx quickly and process later"
+    assert jaccard(base, near) >= CONTEXT_DUPLICATE_THRESHOLD > jaccard(base, distinct)
+
+    results = [result(base, rank=0), result(near, rank=1), result(distinct, rank=2)]
+    assert [item["id"] for item in dedupe(results, CONTEXT_DUPLICATE_THRESHOLD)] == ["chunk-0", "chunk-2"]
+    packed = assemble_context("verify webhook signature", results, 1000, plain, CONTEXT_DUPLICATE_THRESHOLD)
+    assert packed.duplicates == 1
+    assert near not in packed.text.split("\n\n")
+
+
+def test_packing_respects_the_token_budget():
+    rng = random.Random(7)
+    words = [f"word{i}" for i in range(200)]
+    results = [result("payment webhook " + " ".join(rng.choice(words) for _ in range(38)), rank=rank)
+               for rank in range(6)]
+    results.append(result("payment intent webhook", rank=6))  # small enough to fill the gap
+
+    packed = assemble_context("payment webhook", results, 100, plain, CONTEXT_DUPLICATE_THRESHOLD)
+    assert packed.tokens <= 100
+    assert count_tokens(packed.text) <= packed.tokens
+    assert packed.over_budget > 0
+    assert "chunk-6" in [item["id"] for item in packed.results]
+    assert packed.candidates == len(results)
+
+
+def test_oversized_best_chunk_is_cut_to_the_budget():
+    packed = assemble_context("refunds", [result("refunds " * 500)], 50, plain)
+    assert len(packed.results) == 1
+    assert packed.tokens <= 50
+    assert packed.text.endswith(" ...")
@@ -0,0 +1,94 @@
+import random
+
+import numpy as np
+import pytest
+
+from chunking import Chunk
+from dense import DenseIndex
+
+WORDS = ("payment intent checkout session webhook customer invoice subscription refund charge component state "
+         "effect hook render props context router layout deploy function edge cache build preview domain").split()
+QUERIES = ["refund a charge", "webhook session", "render props context", "deploy edge function", "cache layout"]
+
+
+@pytest.fixture
+def corpus():
+    rng = random.Random(3)
+    return [Chunk(text=" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 30))), tool=tool,
+                  tool_name=tool.title(), title=f"Page {i}", url=f"https://docs.example/{tool}/{i}")
+            for i, tool in enumerate(["stripe", "react", "vercel"] * 20)]
+
+
+def by_distance(results):
+    """IDs per distance, leaving out the farthest: ties at the cutoff may be cut either way"""
+    groups = {}
+    for item in results:
+        groups.setdefault(round(item["distance"], 4), set()).add(item["id"])
+    return {distance: ids for distance, ids in groups.items() if distance < max(groups)}
+
+
+@pytest.mark.parametrize("tools", [None, ["react"], ["stripe", "vercel"]])
+def test_numpy_backend_matches_chroma(make_store, corpus, monkeypatch, tools):
+    chroma = make_store()
+    chroma.add_chunks(corpus)
+    monkeypatch.setenv("SEARCH_BACKEND", "numpy")
+    numpy = make_store()
+    assert numpy.dense.count() == chroma.collection.count()
+
+    for query in QUERIES:
+        expected = chroma.search_with_metadata(query, 8, tools)
+        found = numpy.search_with_metadata(query, 8, tools)
+        # Bag-of-words vectors tie often, and the backends order ties differently
+        assert by_distance(found) == by_distance(expected)
+        assert [item["distance"] for item in found] == pytest.approx([item["distance"] for item in expected],
+                                                                      abs=1e-4)
+        rows = {item["id"]: (item["content"], item["metadata"]) for item in expected}
+        assert all(rows[item["id"]] == (item["content"], item["metadata"]) for item in found if item["id"] in rows)
+
+
+def test_float16_index_keeps_the_ranking(make_store, corpus, monkeypatch):
+    chroma = make_store()
+    chroma.add_chunks(corpus)
+    monkeypatch.setenv("SEARCH_BACKEND", "numpy")
+    monkeypatch.setenv("DENSE_INDEX_DTYPE", "float16")
+    half = make_store()
+    assert half.dense.info["dtype"] == "float16"
+    for query in QUERIES:
+        expected = {item["id"] for item in chroma.search_with_metadata(query, 5)}
+        assert len(expected & {item["id"] for item in half.search_with_metadata(query, 5)}) >= 4
+
+
+def test_numpy_index_follows_writes(make_store, corpus, monkeypatch):
+    monkeypatch.setenv("SEARCH_BACKEND", "numpy")
+    store = make_store()
+    store.add_chunks(corpus[:30])
+    other = make_store()  # another worker on the same directory
+    assert store.replace_tool("stripe", [corpus[0]])
+    assert store.dense.count() == store.collection.count()
+    assert {item["metadata"]["url"] for item in other.search_with_metadata("payment", 30, ["stripe"])} == \
+        {corpus[0].url}
+
+
+@pytest.mark.parametrize("space", ["l2", "cosine", "ip"])
+def test_distances_match_brute_force(tmp_path, space):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(200, 16)).astype(np.float32)
+    queries = rng.normal(size=(3, 16)).astype(np.float32)
+    index = DenseIndex(str(tmp_path / "dense"))
+    index.build([([f"row-{i}" for i in range(200)], [f"text {i}" for i in range(200)],
+                  [{"tool": "a" if i % 2 else "b"} for i in range(200)], vectors)], space=space)
+
+    if space == "l2":
+        exact = ((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+    elif space == "cosine":
+        exact = 1 - (queries @ vectors.T) / np.outer(np.linalg.norm(queries, axis=1), np.linalg.norm(vectors, axis=1))
+    else:
+        exact = 1 - queries @ vectors.T
+    results = index.search(queries, 5, ["a"])
+    for q, found in enumerate(results):
+        rows = [i for i in np.argsort(exact[q], kind="stable") if i % 2][:5]
+        assert [item["id"] for item in found] == [f"row-{i}" for i in rows]
+        assert [item["distance"] for item in found] == pytest.approx(exact[q][rows], rel=1e-4, abs=1e-4)
+        assert all(item["metadata"] == {"tool": "a"} for item in found)
+    # A second index on the same directory loads the current build
+    assert DenseIndex(str(tmp_path / "dense")).count() == 200
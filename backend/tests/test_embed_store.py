@@ -0,0 +1,323 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from chunking import Chunk
+from embed_store import EmbedStore, EmbeddingMismatchError
+from manifest import content_hash
+
+
+def chunk(text, tool="stripe"):
+    return Chunk(text=text, tool=tool, tool_name=tool.title(), title="Guide", url=f"https://docs.example/{tool}")
+
+
+def stored_ids(store):
+    return set(store.collection.get(include=[])["ids"])
+
+
+def test_chunk_ids_come_from_content_and_tool(make_store):
+    store = make_store()
+    text = "Refunds are issued to the original payment method."
+    store.add_chunks([chunk(text), chunk(text, tool="react")])
+    assert stored_ids(store) == {EmbedStore.chunk_id(content_hash(text), "stripe"),
+                                 EmbedStore.chunk_id(content_hash(text), "react")}
+    assert store.collection.get(ids=[EmbedStore.chunk_id(content_hash(text), "stripe")])["metadatas"][0]["hash"] \
+        == content_hash(text)
+
+
+def test_re_adding_a_chunk_is_a_no_op(make_store, provider, monkeypatch):
+    store = make_store()
+    chunks = [chunk("Webhooks are signed with an endpoint secret."), chunk("Payouts arrive in two business days.")]
+    store.add_chunks(chunks)
+
+    embedded = []
+    embed = provider._embed
+    monkeypatch.setattr(provider, "_embed", lambda texts: embedded.extend(texts) or embed(texts))
+    store.add_chunks(chunks + [chunk("  Webhooks are signed with an endpoint secret.  ")])
+    assert embedded == []
+    assert store.collection.count() == store.lexical.count() == 2
+
+
+def test_replace_tool_removes_stale_chunks_and_keeps_listed_hashes(make_store):
+    store = make_store()
+    kept = "Checkout sessions expire after 24 hours."
+    store.add_chunks([chunk("The old charges API is deprecated."), chunk(kept),
+                      chunk("Components re-render when state changes.", tool="react")])
+
+    assert store.replace_tool("stripe", [chunk("PaymentIntents track a payment's lifecycle.")],
+                              keep_hashes=[content_hash(kept)])
+
+    stripe = store.collection.get(where={"tool": "stripe"}, include=["documents"])["documents"]
+    assert sorted(stripe) == [kept, "PaymentIntents track a payment's lifecycle."]
+    assert store.collection.get(where={"tool": "react"}, include=[])["ids"]
+    assert store.lexical.count() == store.collection.count()
+    assert not store.search_with_metadata("deprecated charges", 5, ["stripe"], "lexical")
+
+
+def result(chunk_id):
+    return {"content": chunk_id, "id": chunk_id, "distance": 0.5, "metadata": {}}
+
+
+def test_fuse_ranks_by_reciprocal_rank_sum(make_store):
+    store = make_store()
+    fused = store._fuse([result("a"), result("b"), result("c")], [("c", 7.0), ("a", 3.0)], 2)
+    # a: 1/61 + 1/62, c: 1/63 + 1/61, b: 1/62 alone
+    assert [item["id"] for item in fused] == ["a", "c"]
+    assert fused[0]["rrf_score"] == pytest.approx(1 / 61 + 1 / 62)
+    assert [item["bm25_score"] for item in fused] == [3.0, 7.0]
+    assert fused[0]["distance"] == 0.5
+
+
+def test_fuse_loads_lexical_only_hits_and_skips_deleted_ones(make_store):
+    store = make_store()
+    text = "Idempotency keys make retried POST requests safe."
+    store.add_chunks([chunk(text)])
+    stored = EmbedStore.chunk_id(content_hash(text), "stripe")
+
+    fused = store._fuse([result("a")], [("stripe-gone", 9.0), (stored, 4.0)], 3)
+    assert [item["id"] for item in fused] == ["a", stored]
+    assert fused[1]["content"] == text
+    assert fused[1]["distance"] is None
+    assert fused[1]["metadata"]["tool"] == "stripe"
+
+
+def test_hybrid_search_returns_fused_results(make_store):
+    store = make_store()
+    store.add_chunks([chunk("Idempotency keys make retried POST requests safe."),
+                      chunk("Refunds are issued to the original payment method."),
+                      chunk("Components re-render when state changes.", tool="react")])
+    results = store.search_with_metadata("idempotency keys", 2, mode="hybrid")
+    assert results[0]["content"].startswith("Idempotency")
+    assert all("rrf_score" in item for item in results)
+    assert store.search_with_metadata("idempotency keys", 2, ["react"], "hybrid")[0]["metadata"]["tool"] == "react"
+
+
+def collection_names(store):
+    return {getattr(collection, "name", collection) for collection in store.client.list_collections()}
+
+
+def test_rebuild_swaps_in_a_complete_collection(make_store):
+    live = make_store()
+    live.add_chunks([chunk("The old charges API is deprecated.")])
+    original = live.collection.name
+
+    staging = live.staging_store()
+    assert staging.collection.count() == 0
+    staging.add_chunks([chunk("PaymentIntents track a payment's lifecycle.")])
+    # Searches keep using the live collection until the swap
+    assert live.search_with_metadata("charges deprecated", 1)[0]["content"].startswith("The old charges")
+
+    live.swap_in(staging)
+    assert live.collection.name == staging.collection.name
+    assert [item["content"] for item in live.search_with_metadata("payment lifecycle", 5, mode="hybrid")] == \
+        ["PaymentIntents track a payment's lifecycle."]
+    assert live._read_pointer() == {"active": staging.collection.name, "previous": original}
+    # A restart opens the swapped-in collection
+    assert make_store().collection.name == staging.collection.name
+
+    # The replaced collection is kept for one swap, then dropped
+    second = live.staging_store()
+    second.add_chunks([chunk("Payouts arrive in two business days.")])
+    live.swap_in(second)
+    assert original not in collection_names(live)
+    assert staging.collection.name in collection_names(live)
+
+
+def test_discarded_and_unfinished_builds_are_dropped(make_store):
+    live = make_store()
+    live.add_chunks([chunk("Webhooks are signed with an endpoint secret.")])
+
+    failed = live.staging_store()
+    failed.add_chunks([chunk("Half of a rebuild that failed.")])
+    live.discard(failed)
+    assert failed.collection.name not in collection_names(live)
+
+    abandoned = live.staging_store()  # e.g. the process died mid-build
+    fresh = live.staging_store()
+    assert abandoned.collection.name not in collection_names(live)
+    assert fresh.collection.name in collection_names(live)
+    assert live.collection.count() == 1
+
+
+def test_store_refuses_another_embedding_model(make_store, provider):
+    make_store().add_chunks([chunk("Webhooks are signed with an endpoint secret.")])
+    truncated = type(provider)(dimensions=32)  # spec test-bow@32
+    store = make_store(embedding_provider=truncated)
+
+    assert "test-bow" in store.embedding_mismatch and "test-bow@32" in store.embedding_mismatch
+    assert store.embedding_info()["collection_model"] == "test-bow"
+    with pytest.raises(EmbeddingMismatchError):
+        store.search_with_metadata("webhooks", 1)
+    assert not store.add_chunks([chunk("Payouts arrive in two business days.")])
+    assert store.collection.count() == 1
+
+    # A rebuild with the new model replaces the collection, and the store accepts it again
+    staging = store.staging_store()
+    staging.add_chunks([chunk("Payouts arrive in two business days.")])
+    store.swap_in(staging)
+    assert store.embedding_mismatch is None
+    assert store.search_with_metadata("payouts", 1)[0]["content"].startswith("Payouts")
+
+
+def test_query_embeddings_of_the_wrong_size_are_refused(make_store, provider):
+    store = make_store(embedding_provider=type(provider)(dimensions=32))
+    store.add_chunks([chunk("Webhooks are signed with an endpoint secret.")])
+    truncated = store.embedding_function(["webhooks"])
+    assert store.search_many_with_metadata(["webhooks"], 1, None, "vector", truncated)[0]
+    with pytest.raises(EmbeddingMismatchError):
+        store.search_many_with_metadata(["webhooks"], 1, None, "vector", provider(["webhooks"]))
+
+
+def test_moved_page_updates_metadata_without_re_embedding(make_store, provider, monkeypatch):
+    store = make_store()
+    text = "Webhooks are signed with an endpoint secret."
+    store.add_chunks([chunk(text), chunk("Payouts arrive in two business days.")])
+
+    embedded = []
+    embed = provider._embed
+    monkeypatch.setattr(provider, "_embed", lambda texts: embedded.extend(texts) or embed(texts))
+    moved = Chunk(text=text, tool="stripe", tool_name="Stripe", title="Signing webhooks",
+                  url="https://docs.example/stripe/webhooks", section="Signatures")
+    stats = store.ingest_stream(iter([moved, chunk("Payouts arrive in two business days.")]))
+
+    assert embedded == []
+    assert (stats["skipped"], stats["metadata_updated"]) == (2, 1)
+    metadata = store.collection.get(ids=[EmbedStore.chunk_id(content_hash(text), "stripe")])["metadatas"][0]
+    assert (metadata["title"], metadata["url"], metadata["section"]) == \
+        ("Signing webhooks", "https://docs.example/stripe/webhooks", "Signatures")
+    assert store.search_with_metadata("webhooks endpoint secret", 1)[0]["metadata"]["url"] == moved.url
+
+    # add_chunks takes the same path
+    embedded.clear()  # the search embedded its query
+    store.add_chunks([chunk(text)])
+    assert store.collection.get(ids=[EmbedStore.chunk_id(content_hash(text), "stripe")])["metadatas"][0]["url"] \
+        == "https://docs.example/stripe"
+    assert embedded == []
+
+
+def test_ingest_stream_pauses_the_source_while_writes_are_backed_up(make_store):
+    store = make_store()
+    pulled = [0]
+    writes_blocked = threading.Event()
+    release = threading.Event()
+    upsert = store.collection.upsert
+
+    def slow_upsert(**kwargs):
+        writes_blocked.set()
+        release.wait(5)
+        return upsert(**kwargs)
+
+    store.collection.upsert = slow_upsert
+
+    def source():
+        for i in range(400):
+            pulled[0] += 1
+            yield chunk(f"Chunk number {i} about payments and refunds.")
+
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(store.ingest_stream(source(), batch_size=4)))
+    thread.start()
+    assert writes_blocked.wait(5)
+    time.sleep(0.3)
+    # One batch in the writer, two in the bounded queue, one waiting to be queued, one being collected
+    assert pulled[0] <= 5 * 4
+    release.set()
+    thread.join(10)
+    assert pulled[0] == 400
+    assert result["embedded"] == store.collection.count() == 400
+
+
+@pytest.mark.parametrize("backend", ["chroma", "numpy"])
+@pytest.mark.parametrize("mode", ["vector", "lexical", "hybrid"])
+def test_filtered_search_returns_only_the_requested_tools(make_store, monkeypatch, backend, mode):
+    monkeypatch.setenv("SEARCH_BACKEND", backend)
+    store = make_store()
+    store.add_chunks([chunk(f"Deploy {topic} configuration with environment variables, step {i}.", tool=tool)
+                      for tool in ("stripe", "react", "vercel") for i, topic in enumerate(["build", "cache", "edge"])])
+    query = "deploy configuration environment variables"
+
+    assert {item["metadata"]["tool"] for item in store.search_with_metadata(query, 9, mode=mode)} == \
+        {"stripe", "react", "vercel"}
+    for tools in (["react"], ["stripe", "vercel"]):
+        results = store.search_with_metadata(query, 9, tools, mode)
+        assert len(results) == 3 * len(tools)
+        assert {item["metadata"]["tool"] for item in results} == set(tools)
+    assert store.search_with_metadata(query, 9, ["not-a-tool"], mode) == []
+
+    batched = store.search_many_with_metadata([query, "edge cache"], 9, ["vercel"], mode)
+    assert all(item["metadata"]["tool"] == "vercel" for results in batched for item in results)
+
+
+def counting(provider, monkeypatch):
+    """Record every batch of texts the provider's model embeds"""
+    calls = []
+    embed = provider._embed
+    monkeypatch.setattr(provider, "_embed", lambda texts: calls.append(list(texts)) or embed(texts))
+    return calls
+
+
+def test_query_embeddings_are_cached(make_store, provider, monkeypatch):
+    store = make_store()
+    calls = counting(provider, monkeypatch)
+
+    first = store.embed_queries(["How do refunds work?", "webhook signing", "How  do refunds work?"])
+    # Queries are normalized, and one model call covers all the misses
+    assert calls == [["How do refunds work?", "webhook signing"]]
+    assert first[0] is first[2]
+    second = store.embed_queries(["webhook signing", "payouts"])
+    assert calls[1:] == [["payouts"]]
+    assert second[0] is first[1]
+    assert store.query_cache_stats() == {"entries": 3, "hits": 1, "misses": 3}
+
+
+def test_least_recently_used_query_is_evicted(make_store, provider, monkeypatch):
+    store = make_store()
+    store.query_cache_size = 2
+    calls = counting(provider, monkeypatch)
+    store.embed_queries(["first"])
+    store.embed_queries(["second"])
+    store.embed_queries(["first"])  # now the most recently used
+    store.embed_queries(["third"])
+    assert store.query_cache_stats()["entries"] == 2
+
+    calls.clear()
+    store.embed_queries(["first", "third"])
+    assert calls == []
+    store.embed_queries(["second"])
+    assert calls == [["second"]]
+
+
+def test_query_cache_is_not_shared_across_providers(make_store, provider, monkeypatch):
+    store = make_store()
+    original = store.embed_query("webhooks")
+    assert len(original) == 64
+
+    store.embedding_function = type(provider)(dimensions=32)
+    swapped = store.embed_query("webhooks")
+    assert len(swapped) == 32
+    assert store.query_cache_stats()["misses"] == 2
+
+    store.embedding_function = provider
+    assert store.embed_query("webhooks") is original
+
+
+def test_process_pool_matches_in_process_embedding(make_store, provider, embed_pool, tmp_path, monkeypatch):
+    chunks = [chunk(f"Guide section {i}: webhooks, refunds and payouts number {i} in detail.") for i in range(12)]
+    inline = EmbedStore(str(tmp_path / "inline"), embedding_provider=provider)
+    assert inline.add_chunks(chunks, batch_size=4)
+
+    embedded = []
+    embed = provider._embed
+    monkeypatch.setattr(provider, "_embed", lambda texts: embedded.extend(texts) or embed(texts))
+    monkeypatch.setenv("EMBED_WORKERS", "2")
+    pooled = EmbedStore(str(tmp_path / "pooled"), embedding_provider=provider)
+    stats = pooled.ingest_stream(chunks, batch_size=4)
+    assert (stats["embedded"], stats["failed"], stats["batches"]) == (12, 0, 3)
+    assert embedded == []  # every batch went to a worker process
+
+    expected = inline.collection.get(include=["embeddings"])
+    actual = pooled.collection.get(ids=expected["ids"], include=["embeddings"])
+    assert stored_ids(pooled) == set(expected["ids"])
+    np.testing.assert_allclose(np.array(actual["embeddings"]), np.array(expected["embeddings"]), rtol=1e-6)
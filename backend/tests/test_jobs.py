@@ -0,0 +1,185 @@
+import asyncio
+import os
+import threading
+import time
+
+import httpx
+import pytest
+
+import main
+from jobs import IngestJob, JobCancelled, JobConflictError, JobManager
+from tools import get_enabled_tools
+
+
+def wait_until_finished(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.finished, job.status
+
+
+@pytest.fixture
+def release():
+    """Set to let the blocking runner's jobs finish"""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def blocking_runner(release):
+    def run(job):
+        job.progress[job.tools[0]].status = "scraping"
+        while not release.is_set():
+            job.check_cancelled()
+            time.sleep(0.01)
+        job.message = "done"
+    return run
+
+
+def test_job_runs_to_completion(release):
+    manager = JobManager(blocking_runner(release))
+    job = manager.submit(["stripe", "react"], force=True)
+    assert manager.active() == {"stripe": job.id, "react": job.id}
+    release.set()
+    wait_until_finished(job)
+
+    state = job.to_dict()
+    assert state["status"] == "completed"
+    assert state["message"] == "done"
+    assert state["force"] is True
+    assert state["progress"]["stripe"]["status"] == "scraping"
+    assert manager.active() == {}
+    assert manager.describe(job.id) == state
+
+
+def test_failed_job_records_its_error():
+    def fail(job):
+        raise RuntimeError("Failed to scrape any documentation")
+
+    manager = JobManager(fail)
+    job = manager.submit(["stripe"])
+    wait_until_finished(job)
+    assert job.status == "failed"
+    assert job.error == "Failed to scrape any documentation"
+    assert manager.active() == {}
+
+
+def test_cancelled_job_stops_and_frees_its_tools(release):
+    manager = JobManager(blocking_runner(release))
+    job = manager.submit(["stripe"])
+    assert manager.cancel(job.id)["id"] == job.id
+    wait_until_finished(job)
+    assert job.status == "cancelled"
+    assert manager.cancel("missing") is None
+    with pytest.raises(JobCancelled):
+        job.check_cancelled()
+    manager.submit(["stripe"])
+
+
+def test_one_job_per_tool(release):
+    manager = JobManager(blocking_runner(release))
+    job = manager.submit(["stripe"])
+    with pytest.raises(JobConflictError) as conflict:
+        manager.submit(["react", "stripe"])
+    assert (conflict.value.tool, conflict.value.job_id) == ("stripe", job.id)
+    # The rejected job claimed nothing, so its other tool is still free
+    assert manager.active() == {"stripe": job.id}
+    manager.submit(["react"])
+
+
+def test_history_keeps_running_jobs(release):
+    manager = JobManager(blocking_runner(release), max_history=2)
+    running = manager.submit(["stripe"])
+    finished = []
+    for _ in range(3):
+        job = manager.submit(["react"])
+        job.cancel_event.set()
+        wait_until_finished(job)
+        finished.append(job)
+    manager.submit(["vercel"])
+    assert manager.get(running.id) is running
+    assert manager.get(finished[0].id) is None
+
+
+def request(method: str, path: str) -> httpx.Response:
+    async def send():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, path)
+    return asyncio.run(send())
+
+
+def test_job_endpoints(release, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "job_manager", JobManager(blocking_runner(release), state_dir=str(tmp_path)))
+    tool = next(iter(get_enabled_tools()))
+
+    started = request("POST", f"/initialize/{tool}")
+    assert started.status_code == 202
+    job_id = started.json()["job_id"]
+    assert started.json()["status_url"] == f"/jobs/{job_id}"
+
+    conflict = request("POST", f"/initialize/{tool}")
+    assert conflict.status_code == 409
+    assert conflict.json()["detail"]["job_id"] == job_id
+
+    assert request("GET", f"/jobs/{job_id}").json()["tools"] == [tool]
+    assert [job["id"] for job in request("GET", "/jobs").json()["jobs"]] == [job_id]
+    assert request("GET", "/jobs/unknown").status_code == 404
+    assert request("POST", f"/jobs/{job_id}/cancel").status_code == 200
+    wait_until_finished(main.job_manager.get(job_id))
+    assert request("GET", f"/jobs/{job_id}").json()["status"] == "cancelled"
+    assert request("POST", "/initialize/not-a-tool").status_code == 400
+
+
+def test_concurrent_saves_of_one_job(tmp_path):
+    manager = JobManager(lambda job: None, state_dir=str(tmp_path))
+    job = manager.submit(["stripe"])
+    wait_until_finished(job)
+    errors = []
+
+    def save():
+        try:
+            for _ in range(50):
+                manager._save(job)
+        except OSError as e:  # e.g. another thread renamed a shared temp file away
+            errors.append(e)
+
+    threads = [threading.Thread(target=save) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert manager._load(job.id)["status"] == "completed"
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_final_state_is_saved_last(tmp_path):
+    manager = JobManager(lambda job: time.sleep(0.05), state_dir=str(tmp_path), heartbeat=0.001)
+    for _ in range(20):
+        job = manager.submit(["stripe"])
+        wait_until_finished(job)
+        deadline = time.monotonic() + 5
+        while manager._load(job.id)["status"] != "completed" and time.monotonic() < deadline:
+            time.sleep(0.001)  # the final save follows the in-memory status
+        time.sleep(0.01)  # long enough for a late heartbeat save to land
+        assert manager._load(job.id)["status"] == "completed"
+
+
+def test_progress_updates_from_many_threads():
+    job = IngestJob(tools=["stripe"])
+
+    def crawl():
+        for i in range(500):
+            job.page_queued("stripe", f"page-{i}")
+            job.page_done("stripe", f"page-{i}", 2)
+            job.chunks_written(["stripe", "stripe"])
+
+    threads = [threading.Thread(target=crawl) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    progress = job.to_dict()["progress"]["stripe"]
+    assert (progress["pages_total"], progress["pages_fetched"]) == (2000, 2000)
+    assert progress["chunks_scraped"] == progress["chunks_embedded"] == 4000
@@ -0,0 +1,226 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from manifest import PageManifest
+from pipeline import run_ingest
+from scrape import UniversalScraper
+from tools import ToolConfig, ToolType
+
+SITEMAP_PAGES = 50
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+class DocsSite(BaseHTTPRequestHandler):
+    """/docs/start links to five pages; the sitemap lists many others.
+
+    The start page is slow, so the sitemap is always read before its links.
+    Docs pages carry an ETag and Last-Modified and answer 304 to a matching
+    If-None-Match, unless `validators` is off.
+    """
+
+    failing = set()  # paths that answer 500
+    revisions = {}  # path -> revision, bumped to change a page
+    validators = True
+    conditional = {}  # path -> (If-None-Match, If-Modified-Since) of its last request
+    started = []  # monotonic start time of every request
+    in_flight = max_in_flight = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.started.append(time.monotonic())
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            self.respond()
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def respond(self):
+        if self.path in self.failing:
+            self.send_response(500)
+            self.end_headers()
+            return
+        if self.path == "/docs/start":
+            time.sleep(0.3)
+        if self.path == "/sitemap.xml":
+            urls = "".join(f"<url><loc>http://{self.headers['Host']}/docs/listed-{i}</loc></url>"
+                           for i in range(SITEMAP_PAGES))
+            body = f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+            content_type = "application/xml"
+        elif self.path.startswith("/docs/"):
+            links = "".join(f'<a href="/docs/linked-{i}">Linked {i}</a>' for i in range(5)) \
+                if self.path == "/docs/start" else ""
+            revision = self.revisions.get(self.path, 0)
+            body = (f"<html><body><nav>{links}</nav><article><h1>{self.path}</h1>"
+                    f"<p>Documentation for {self.path} with enough words to make a chunk. It explains the options, "
+                    f"the defaults and a worked example.</p><p>Revision {revision}.</p></article></body></html>")
+            content_type = "text/html"
+            etag = f'"{self.path}@{revision}"'
+            self.conditional[self.path] = (self.headers.get("If-None-Match"), self.headers.get("If-Modified-Since"))
+            if self.validators and self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if content_type == "text/html":
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DocsSite)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    DocsSite.failing.clear()
+    DocsSite.revisions.clear()
+    DocsSite.validators = True
+    DocsSite.conditional.clear()
+    DocsSite.started.clear()
+    DocsSite.max_in_flight = 0
+
+
+def docs_tool(base_url: str, **config) -> ToolConfig:
+    return ToolConfig(name="Docs", tool_type=ToolType.JS_FRAMEWORK, base_url=base_url, scrape_paths=["/docs/start"],
+                      selectors={"content": "article", "title": "h1"}, delay=0.0, **config)
+
+
+def crawl_urls(base_url: str, scraper: UniversalScraper = None, **config) -> list:
+    scraper = scraper or UniversalScraper()
+    return [url for _, url, _ in scraper.iter_pages({"docs": docs_tool(base_url, **config)})]
+
+
+def test_sitemap_does_not_crowd_out_linked_pages(site):
+    urls = crawl_urls(site, max_pages=8, max_depth=2)
+    assert len(urls) == 8
+    assert {f"{site}/docs/start"} | {f"{site}/docs/linked-{i}" for i in range(5)} <= set(urls)
+
+
+def test_sitemap_pages_fill_the_remaining_budget(site):
+    urls = crawl_urls(site, max_pages=200, max_depth=2)
+    assert len(urls) == 1 + 5 + SITEMAP_PAGES
+
+
+def test_sitemap_can_be_skipped(site):
+    urls = crawl_urls(site, max_pages=200, max_depth=2, use_sitemap=False)
+    assert len(urls) == 6
+
+
+def test_tools_on_one_host_share_its_strictest_limits(site):
+    fast = docs_tool(site, max_depth=1, use_sitemap=False, max_concurrency=8)
+    polite = ToolConfig(name="Guides", tool_type=ToolType.JS_FRAMEWORK, base_url=site, scrape_paths=["/docs/start"],
+                        path_prefixes=["/docs/linked-"], selectors={"content": "article", "title": "h1"},
+                        delay=0.05, max_concurrency=1, max_depth=1, use_sitemap=False)
+    urls = [url for _, url, _ in UniversalScraper().iter_pages({"docs": fast, "guides": polite})]
+    assert f"{site}/docs/linked-4" in urls
+
+    page_starts = sorted(DocsSite.started)[-len(urls):]  # after robots.txt and sitemap lookups
+    assert DocsSite.max_in_flight == 1
+    assert min(later - earlier for earlier, later in zip(page_starts, page_starts[1:])) >= 0.04
+
+
+def crawl_pages(site, manifest_path):
+    """Crawl /docs/start and its links with a manifest; returns the scraper and url -> chunks"""
+    scraper = UniversalScraper(manifest=PageManifest(manifest_path))
+    pages = {url: chunks for _, url, chunks in
+             scraper.iter_pages({"docs": docs_tool(site, max_depth=1, use_sitemap=False)})}
+    scraper.manifest.save()
+    return scraper, pages
+
+
+def test_conditional_requests_skip_unchanged_pages(site, tmp_path):
+    manifest_path = str(tmp_path / "manifest.json")
+    first, pages = crawl_pages(site, manifest_path)
+    assert first.stats["fetched"] == 6 and all(pages.values())
+    assert DocsSite.conditional["/docs/start"] == (None, None)
+
+    DocsSite.revisions["/docs/linked-2"] = 1
+    second, pages = crawl_pages(site, manifest_path)
+    # Every page was asked for with the validators it was served with
+    assert DocsSite.conditional["/docs/start"] == ('"/docs/start@0"', LAST_MODIFIED)
+    assert DocsSite.conditional["/docs/linked-2"] == ('"/docs/linked-2@0"', LAST_MODIFIED)
+    assert (second.stats["not_modified"], second.stats["fetched"]) == (5, 1)
+    # 304s yield no chunks, but the crawl still follows the start page's links from the manifest
+    assert len(pages) == 6
+    assert [url for url, chunks in pages.items() if chunks] == [f"{site}/docs/linked-2"]
+    assert "Revision 1" in pages[f"{site}/docs/linked-2"][0].text
+    assert PageManifest(manifest_path).get(f"{site}/docs/linked-2")["etag"] == '"/docs/linked-2@1"'
+
+
+def test_identical_body_is_skipped_when_the_server_ignores_validators(site, tmp_path):
+    manifest_path = str(tmp_path / "manifest.json")
+    crawl_pages(site, manifest_path)
+    DocsSite.validators = False
+    scraper, pages = crawl_pages(site, manifest_path)
+    assert (scraper.stats["unchanged"], scraper.stats["fetched"], scraper.stats["not_modified"]) == (6, 0, 0)
+    assert not any(pages.values())
+
+    # force refetches and re-parses everything
+    forced = UniversalScraper(manifest=PageManifest(manifest_path), force=True)
+    list(forced.iter_pages({"docs": docs_tool(site, max_depth=1, use_sitemap=False)}))
+    assert forced.stats["fetched"] == 6
+    assert DocsSite.conditional["/docs/start"] == (None, None)
+
+
+def test_failed_page_still_leads_to_its_known_links(site, tmp_path):
+    manifest = PageManifest(str(tmp_path / "manifest.json"))
+    first = crawl_urls(site, UniversalScraper(manifest=manifest), max_depth=2, use_sitemap=False)
+    manifest.save()
+
+    DocsSite.failing.add("/docs/start")
+    scraper = UniversalScraper(manifest=PageManifest(str(tmp_path / "manifest.json")))
+    second = crawl_urls(site, scraper, max_depth=2, use_sitemap=False)
+    assert sorted(second) == sorted(first)
+    assert scraper.stats["error"] == 1
+
+
+def ingest(site, tmp_path, store, **config):
+    manifest = PageManifest(str(tmp_path / "manifest.json"))
+    scraper = UniversalScraper(manifest=manifest)
+    stats = run_ingest(store, scraper, {"docs": docs_tool(site, use_sitemap=False, **config)}, manifest)
+    assert stats["ok"]
+    return scraper
+
+
+def stored_urls(store):
+    return {metadata["url"] for metadata in store.collection.get(include=["metadatas"])["metadatas"]}
+
+
+def test_failed_parent_page_keeps_its_childrens_chunks(site, tmp_path, make_store):
+    store = make_store()
+    ingest(site, tmp_path, store, max_depth=2)
+    before = stored_urls(store)
+    assert f"{site}/docs/linked-0" in before
+
+    DocsSite.failing.add("/docs/start")
+    assert ingest(site, tmp_path, store, max_depth=2).incomplete == {"docs"}
+    assert stored_urls(store) == before
+
+
+def test_smaller_page_budget_keeps_unvisited_pages(site, tmp_path, make_store):
+    store = make_store()
+    ingest(site, tmp_path, store, max_depth=2)
+    before = stored_urls(store)
+
+    assert ingest(site, tmp_path, store, max_depth=2, max_pages=2).incomplete == {"docs"}
+    assert stored_urls(store) == before
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+import main
+from warmup import Warmup
+
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolExecutor(max_workers=2)
+    yield pool
+    pool.shutdown(wait=False)
+
+
+@pytest.fixture
+def gate():
+    """Set to let the store finish opening"""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+@pytest.fixture
+def open_store(make_store, gate):
+    opened = []
+
+    def open_store():
+        assert gate.wait(5)
+        opened.append(make_store())
+        return opened[-1]
+
+    open_store.opened = opened
+    return open_store
+
+
+def test_background_warmup_serves_before_it_is_ready(open_store, executor, gate):
+    async def scenario():
+        warmup = Warmup(open_store, executor, mode="background")
+        await warmup.start()  # returns at once
+        await asyncio.sleep(0.05)
+        assert (warmup.state, warmup.ready, warmup.loaded_store) == ("running", False, None)
+
+        gate.set()
+        await warmup._task
+        assert (warmup.state, warmup.ready) == ("ready", True)
+        assert set(warmup.stats()["steps_seconds"]) == {"open_store", "model_load", "dummy_query"}
+        assert await warmup.store() is warmup.loaded_store is open_store.opened[0]
+
+    asyncio.run(scenario())
+    assert len(open_store.opened) == 1
+
+
+def test_blocking_warmup_is_ready_once_started(open_store, executor, gate):
+    gate.set()
+
+    async def scenario():
+        warmup = Warmup(open_store, executor, mode="blocking")
+        await warmup.start()
+        assert warmup.ready
+        assert warmup.stats()["seconds"] is not None
+
+    asyncio.run(scenario())
+
+
+def test_warmup_off_opens_the_store_on_first_use(open_store, executor, gate, provider, monkeypatch):
+    gate.set()
+    loaded = []
+    embed = provider._embed
+    monkeypatch.setattr(provider, "_embed", lambda texts: loaded.append(texts) or embed(texts))
+
+    async def scenario():
+        warmup = Warmup(open_store, executor, mode="off")
+        await warmup.start()
+        assert (warmup.state, warmup.ready, open_store.opened) == ("off", False, [])
+
+        # Concurrent first requests share one open
+        first, second = await asyncio.gather(warmup.store(), warmup.store())
+        assert first is second
+        assert warmup.ready and warmup.state == "off"
+        assert loaded == []  # the model waits for the first query
+
+    asyncio.run(scenario())
+    assert len(open_store.opened) == 1
+
+
+def test_failed_warmup_keeps_serving_and_retries_on_demand(make_store, executor):
+    attempts = []
+
+    def flaky_open():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("store unavailable")
+        return make_store()
+
+    async def scenario():
+        warmup = Warmup(flaky_open, executor, mode="blocking")
+        await warmup.start()
+        assert (warmup.state, warmup.ready) == ("failed", False)
+        assert warmup.stats()["error"] == "store unavailable"
+        assert await warmup.store() is not None
+
+    asyncio.run(scenario())
+    assert len(attempts) == 2
+
+
+def test_unknown_mode_is_refused(executor):
+    with pytest.raises(ValueError):
+        Warmup(lambda: None, executor, mode="eager")
+
+
+def test_status_reports_not_ready_until_warmup_finishes(open_store, executor, gate, monkeypatch):
+    warmup = Warmup(open_store, executor, mode="background")
+    monkeypatch.setattr(main, "warmup", warmup)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await warmup.start()
+            starting = (await client.get("/status")).json()
+            gate.set()
+            await warmup._task
+            ready = (await client.get("/status")).json()
+        return starting, ready
+
+    starting, ready = asyncio.run(scenario())
+    assert (starting["status"], starting["ready"], starting["knowledge_base"]) == ("starting", False, "not_loaded")
+    assert starting["warmup"]["state"] == "running"
+    assert (ready["status"], ready["ready"], ready["knowledge_base"]) == ("running", True, "initialized")
+    assert ready["warmup"]["state"] == "ready"
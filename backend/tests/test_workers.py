@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from answer_cache import AnswerCache
+from chunking import Chunk
+from jobs import JobConflictError, JobManager
+
+
+def chunk(text, tool="stripe"):
+    return Chunk(text=text, tool=tool, tool_name=tool.title(), title=text, url=f"https://docs.example/{tool}")
+
+
+def test_other_worker_sees_writes_and_resets(make_store):
+    # Two stores on one directory stand in for two uvicorn workers
+    writer, reader = make_store(), make_store()
+    cache = AnswerCache()
+    cache.sync(reader.corpus_version())
+    cache.put("how do refunds work", None, {"answer": "old"})
+
+    writer.add_chunks([chunk("refunds are issued to the original payment method")])
+    assert cache.sync(reader.corpus_version())
+    assert cache.get("how do refunds work") is None
+    assert reader.search_with_metadata("refunds payment method", 1)[0]["content"].startswith("refunds")
+
+    writer.reset_collection()
+    assert reader.search_with_metadata("refunds payment method", 1) == []
+    assert reader.collection.id == writer.collection.id
+
+    writer.add_chunks([chunk("webhooks are signed with a secret")])
+    assert [result["content"] for result in reader.search_with_metadata("webhooks secret", 1)] == \
+        ["webhooks are signed with a secret"]
+
+
+def test_answer_cache_sync_only_clears_on_change():
+    cache = AnswerCache()
+    cache.sync((1, 1))
+    cache.put("question", None, {"answer": "kept"})
+    assert not cache.sync((1, 1))
+    assert cache.get("question") == {"answer": "kept"}
+    assert cache.sync((2, 1))
+    assert cache.get("question") is None
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two job managers sharing a state directory, with a runner that waits to be released or cancelled"""
+    release = threading.Event()
+
+    def runner(job):
+        while not release.is_set():
+            job.check_cancelled()
+            time.sleep(0.01)
+
+    managers = [JobManager(runner, state_dir=str(tmp_path / "jobs"), heartbeat=0.05) for _ in range(2)]
+    yield managers
+    release.set()
+
+
+def wait_for(describe, status, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        state = describe()
+        if state and state["status"] == status:
+            return state
+        time.sleep(0.02)
+    raise AssertionError(f"job never reached {status}: {describe()}")
+
+
+def test_tool_lock_and_job_state_are_shared(workers):
+    first, second = workers
+    job = first.submit(["stripe"])
+
+    with pytest.raises(JobConflictError) as conflict:
+        second.submit(["stripe", "react"])
+    assert conflict.value.job_id == job.id
+    assert second.active() == {"stripe": job.id}
+    # A failed submit takes none of its tools' locks
+    other = second.submit(["react"])
+
+    assert wait_for(lambda: second.describe(job.id), "running")["tools"] == ["stripe"]
+    assert {state["id"] for state in second.describe_all()} == {job.id, other.id}
+
+    second.cancel(job.id)
+    wait_for(lambda: second.describe(job.id), "cancelled")
+    assert job.status == "cancelled"
+    # The lock went with the job, so any worker can start the tool again
+    second.submit(["stripe"])
+
+
+def test_job_of_a_dead_worker_is_reported_failed(workers):
+    first, second = workers
+    job = first.submit(["stripe"])
+    wait_for(lambda: second.describe(job.id), "running")
+
+    # Pretend the worker died: its state stops being saved
+    first.heartbeat = second.heartbeat = 60
+    time.sleep(0.3)
+    second.heartbeat = 0.01
+    state = second.describe(job.id)
+    assert state["status"] == "failed"
+    assert second.describe("0123456789ab") is None
@@ -17,8 +17,14 @@ class ToolConfig:
     base_url: str
     scrape_paths: List[str]
     selectors: Dict[str, str]  # CSS selectors for content extraction
-    max_depth: int = 2
-    delay: float = 1.0
+    max_depth: int = 2  # link hops followed from scrape_paths (0 = only scrape_paths)
+    max_pages: int = 200  # page budget per crawl of this tool
+    path_prefixes: Optional[List[str]] = None  # paths links must stay under; default: first segment of each scrape path
+    use_sitemap: bool = True  # also seed the crawl from the host's sitemap.xml
+    delay: float = 1.0  # minimum seconds between requests to this tool's host
+    max_concurrency: int = 2  # requests in flight at once against this tool's host
+    chunk_tokens: int = 200  # max body tokens per chunk; the section heading is metadata and not counted (MiniLM truncates at 256)
+    chunk_overlap: int = 40  # tokens repeated between consecutive chunks of a section
     enabled: bool = True
 
 # Tool configurations
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Optional
+
+from metrics import log_event, record_stage
+
+WARMUP_MODES = ("background", "blocking", "off")
+
+
+class Warmup:
+    """Opens the knowledge base off the event loop and warms it up before the app reports ready.
+
+    In "background" mode the app starts serving at once and the store is
+    opened and queried in a task; requests that need it wait for it. In
+    "blocking" mode startup waits for the warmup, so the server only accepts
+    connections once it is ready. With "off" the store is opened by the
+    first request that needs it, and the model loads on the first query.
+    """
+
+    def __init__(self, open_store: Callable[[], Any], executor: Executor, mode: str = "background"):
+        if mode not in WARMUP_MODES:
+            raise ValueError(f"Unknown warmup mode '{mode}'. Choose from: {', '.join(WARMUP_MODES)}")
+        self.open_store = open_store
+        self.executor = executor
+        self.mode = mode
+        self.state = "off" if mode == "off" else "pending"  # pending, running, ready, failed, off
+        self.error: Optional[str] = None
+        self.steps: Dict[str, float] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._store = None
+        self._opening: Optional[asyncio.Future] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether requests are served without paying for the store or model first"""
+        return self.state == "ready" or (self.state == "off" and self._store is not None)
+
+    @property
+    def loaded_store(self):
+        """The store if it has been opened, without opening it"""
+        return self._store
+
+    async def store(self):
+        """The store, opening it in the executor first if needed; concurrent callers share one open"""
+        if self._store is not None:
+            return self._store
+        opening = self._opening
+        if opening is None or (opening.done() and (opening.cancelled() or opening.exception())):
+            # Nothing opened yet, or the last attempt failed: try again
+            self._opening = asyncio.get_running_loop().run_in_executor(self.executor, self._open)
+        return await asyncio.shield(self._opening)
+
+    def _open(self):
+        start = time.perf_counter()
+        store = self.open_store()
+        self.steps.setdefault("open_store", round(time.perf_counter() - start, 3))
+        self._store = store
+        return store
+
+    async def start(self):
+        """Begin warming up as configured; called from the app's lifespan"""
+        if self.mode == "off":
+            return
+        self._task = asyncio.create_task(self.run())
+        if self.mode == "blocking":
+            await self._task
+
+    async def run(self):
+        """Open the store, load the embedding model and run a dummy query"""
+        self.state = "running"
+        self.started_at = time.time()
+        log_event("warmup_started", mode=self.mode)
+        try:
+            store = await self.store()
+            timings = await asyncio.get_running_loop().run_in_executor(self.executor, store.warmup)
+            for step, seconds in timings.items():
+                self.steps[step] = round(seconds, 3)
+            self.state = "ready"
+        except Exception as e:
+            # The app keeps serving; the first requests open the store or load the model themselves
+            log_event("warmup_failed", logging.ERROR, exc_info=True, error=str(e))
+            self.state = "failed"
+            self.error = str(e)
+        finally:
+            self.finished_at = time.time()
+            record_stage("warmup", self.finished_at - self.started_at)
+        log_event("warmup_finished", state=self.state, seconds=round(self.finished_at - self.started_at, 3),
+                  steps=self.steps)
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "state": self.state,
+            "ready": self.ready,
+            "steps_seconds": dict(self.steps),
+            "seconds": round(self.finished_at - self.started_at, 3) if self.finished_at else None,
+            "error": self.error,
+        }
@@ -19,6 +19,9 @@ const ChatInterface = () => {
   ]);
   const [isLoading, setIsLoading] = useState(false);
   const chatRef = useRef<HTMLDivElement>(null);
+  // Message ids come from a counter, since `messages` is stale inside an in-flight send
+  const nextId = useRef(2);
+  const newMessageId = () => nextId.current++;
 
   const scrollToBottom = () => {
     if (chatRef.current) {
@@ -44,7 +47,7 @@ const ChatInterface = () => {
 
   const handleSendMessage = async (messageText: string): Promise<void> => {
     const newMessage: ChatMessage = {
-      id: messages.length + 1,
+      id: newMessageId(),
       text: messageText,
       isBot: false,
     };
@@ -64,7 +67,7 @@ const ChatInterface = () => {
         });
       }
 
-      const response = await fetch(`${API_URL}/ask`, {
+      const response = await fetch(`${API_URL}/ask/stream`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -72,28 +75,80 @@ const ChatInterface = () => {
         body: JSON.stringify({ question: messageText }),
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      const data = await response.json();
-
-      // Create sources from the context chunks (if available)
-      const sources = data.sources || [];
+      // Render the answer progressively as Server-Sent Events arrive
+      const botId = newMessageId();
+      let botText = "";
+      let botSources: ChatMessage["sources"] = [];
+      let started = false;
+
+      const updateBotMessage = () => {
+        const botResponse: ChatMessage = {
+          id: botId,
+          text: botText,
+          isBot: true,
+          sources: botSources,
+        };
+        if (!started) {
+          started = true;
+          setIsLoading(false);
+          setMessages((prev: ChatMessage[]) => [...prev, botResponse]);
+        } else {
+          setMessages((prev: ChatMessage[]) =>
+            prev.map((msg) => (msg.id === botId ? botResponse : msg))
+          );
+        }
+      };
 
-      const botResponse: ChatMessage = {
-        id: messages.length + 2,
-        text: data.answer || "Sorry, I couldn't get a response right now.",
-        isBot: true,
-        sources: sources,
+      const handleEvent = (event: string, data: string) => {
+        const payload = JSON.parse(data);
+        if (event === "sources") {
+          botSources = payload.sources || [];
+        } else if (event === "token") {
+          botText += payload.text;
+          updateBotMessage();
+        } else if (event === "error") {
+          throw new Error(payload.detail);
+        }
       };
 
-      setMessages((prev: ChatMessage[]) => [...prev, botResponse]);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary = buffer.indexOf("\n\n");
+        while (boundary !== -1) {
+          const rawEvent = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          boundary = buffer.indexOf("\n\n");
+
+          let event = "message";
+          let data = "";
+          for (const line of rawEvent.split("\n")) {
+            if (line.startsWith("event:")) event = line.slice(6).trim();
+            else if (line.startsWith("data:")) data += line.slice(5).trim();
+          }
+          if (data) handleEvent(event, data);
+        }
+      }
+
+      if (!started) {
+        botText = "Sorry, I couldn't get a response right now.";
+        updateBotMessage();
+      }
     } catch (error) {
       console.error("Error calling backend:", error);
 
       const errorResponse: ChatMessage = {
-        id: messages.length + 2,
+        id: newMessageId(),
         text: "Sorry, I'm having trouble connecting to the server. Please make sure the backend is running and try again.",
         isBot: true,
       };